@@ -0,0 +1,161 @@
+import calendar
+import threading
+import weakref
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .constants import BASIC_BLOCKING_CODES
+from .models import ConstraintEntry
+
+VACATION_CODE = "FERIAS"
+HOLIDAY_WORKED_CODE = "FERIADO_TRAB"
+
+
+@dataclass(frozen=True)
+class NurseCalendarSummary:
+    """What one nurse's constraint calendar says about a month."""
+
+    business_days: int
+    code_counts: Dict[str, int] = field(default_factory=dict)
+    blocked_days: FrozenSet[int] = frozenset()
+
+    @property
+    def vacation_days(self) -> int:
+        return self.code_counts.get(VACATION_CODE, 0)
+
+    @property
+    def holiday_worked_days(self) -> int:
+        return self.code_counts.get(HOLIDAY_WORKED_CODE, 0)
+
+
+MonthSummaries = Dict[int, NurseCalendarSummary]
+
+
+def business_days(year: int, month: int) -> int:
+    days = calendar.monthrange(year, month)[1]
+    return sum(1 for day in range(1, days + 1) if date(year, month, day).weekday() < 5)
+
+
+def build_calendar_summaries(
+    year: int, month: int, constraints: Iterable[Tuple[Tuple[int, int], str]]
+) -> MonthSummaries:
+    """Summarise ``((nurse_id, day), code)`` items in one pass over the month."""
+    counts: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    blocked: Dict[int, set] = defaultdict(set)
+    for (nurse_id, day), code in constraints:
+        counts[nurse_id][code] += 1
+        if code in BASIC_BLOCKING_CODES:
+            blocked[nurse_id].add(day)
+    month_business_days = business_days(year, month)
+    return {
+        nurse_id: NurseCalendarSummary(
+            business_days=month_business_days,
+            code_counts=dict(codes),
+            blocked_days=frozenset(blocked.get(nurse_id, ())),
+        )
+        for nurse_id, codes in counts.items()
+    }
+
+
+def empty_calendar_summary(year: int, month: int) -> NurseCalendarSummary:
+    return NurseCalendarSummary(business_days=business_days(year, month))
+
+
+# Summaries per database engine and (year, month), dropped when a constraint changes.
+_cache_lock = threading.Lock()
+_cache: "weakref.WeakKeyDictionary[object, Dict[Tuple[int, int], MonthSummaries]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def month_calendar_summaries(
+    session: Session, year: int, month: int
+) -> MonthSummaries:
+    bind = session.get_bind()
+    with _cache_lock:
+        cached = _cache.get(bind, {}).get((year, month))
+    if cached is not None:
+        return cached
+    rows = session.execute(
+        select(
+            ConstraintEntry.nurse_id, ConstraintEntry.day, ConstraintEntry.code
+        ).where(ConstraintEntry.year == year, ConstraintEntry.month == month)
+    )
+    summaries = build_calendar_summaries(
+        year, month, (((nurse_id, day), code) for nurse_id, day, code in rows)
+    )
+    # Unflushed constraint changes would leave the summary out of date.
+    if not _has_pending_constraints(session):
+        with _cache_lock:
+            _cache.setdefault(bind, {})[(year, month)] = summaries
+    return summaries
+
+
+def nurse_calendar_summary(
+    session: Session, nurse_id: int, year: int, month: int
+) -> NurseCalendarSummary:
+    summary = month_calendar_summaries(session, year, month).get(nurse_id)
+    return summary or empty_calendar_summary(year, month)
+
+
+def invalidate_calendar_summaries(
+    year: Optional[int] = None, month: Optional[int] = None
+) -> None:
+    with _cache_lock:
+        for months in _cache.values():
+            if year is None or month is None:
+                months.clear()
+            else:
+                months.pop((year, month), None)
+
+
+def _has_pending_constraints(session: Session) -> bool:
+    return any(
+        isinstance(item, ConstraintEntry)
+        for item in (*session.new, *session.dirty, *session.deleted)
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _constraints_flushed(session: Session, _flush_context) -> None:
+    changed = {
+        (item.year, item.month)
+        for item in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(item, ConstraintEntry)
+    }
+    if changed and session.info.get("calendar_months", set()) is not None:
+        session.info["calendar_months"] = (
+            session.info.get("calendar_months", set()) | changed
+        )
+    for year, month in changed:
+        invalidate_calendar_summaries(year, month)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _constraints_bulk_changed(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not ConstraintEntry:
+        return
+    orm_execute_state.session.info["calendar_months"] = None
+    invalidate_calendar_summaries()
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _constraints_settled(session: Session) -> None:
+    # Another session may have cached the old rows while this one was still open.
+    if "calendar_months" not in session.info:
+        return
+    changed = session.info.pop("calendar_months")
+    if changed is None:
+        invalidate_calendar_summaries()
+        return
+    for year, month in changed:
+        invalidate_calendar_summaries(year, month)
@@ -31,6 +31,16 @@ JWT_SECRET = os.getenv("SHIFTFLOW_JWT_SECRET", "shiftflow-secret")
 HOST = os.getenv("SHIFTFLOW_HOST", "0.0.0.0")
 PORT = int(os.getenv("SHIFTFLOW_PORT", "8000"))
 SEED_MODE = os.getenv("SHIFTFLOW_SEED_MODE", "default").lower()
+SOLVER_JOB_WORKERS = int(os.getenv("SHIFTFLOW_SOLVER_JOB_WORKERS", "2"))
+SOLVER_DECOMPOSE = os.getenv("SHIFTFLOW_SOLVER_DECOMPOSE", "auto").lower()
+SOLVER_FORMULATION = os.getenv("SHIFTFLOW_SOLVER_FORMULATION", "slots").lower()
+SOLVER_OBJECTIVE = os.getenv("SHIFTFLOW_SOLVER_OBJECTIVE", "weighted").lower()
+SOLUTION_POOL_SIZE = int(os.getenv("SHIFTFLOW_SOLUTION_POOL_SIZE", "3"))
+SOLVER_CACHE_SIZE = int(os.getenv("SHIFTFLOW_SOLVER_CACHE_SIZE", "16"))
+SOLVER_DUMP_MODELS = (
+    os.getenv("SHIFTFLOW_SOLVER_DUMP_MODELS", "false").lower() == "true"
+)
+MODEL_DUMP_DIR = Path(os.getenv("SHIFTFLOW_MODEL_DUMP_DIR") or DATA_DIR / "models")
 
 def load_settings_override():
     settings_path = os.getenv("SHIFTFLOW_SETTINGS_PATH")
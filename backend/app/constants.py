@@ -100,13 +100,6 @@ def build_service_shifts(overrides: Optional[Dict[str, Tuple[int, int]]] = None)
 
 
 SERVICE_SHIFTS: List[ServiceShift] = build_service_shifts()
-SHIFT_LOOKUP: Dict[str, ServiceShift] = {item.code: item for item in SERVICE_SHIFTS}
-
-
-def apply_shift_overrides(overrides: Dict[str, Tuple[int, int]]) -> None:
-    global SERVICE_SHIFTS, SHIFT_LOOKUP
-    SERVICE_SHIFTS = build_service_shifts(overrides)
-    SHIFT_LOOKUP = {item.code: item for item in SERVICE_SHIFTS}
 
 CATEGORY_SORT_ORDER = {
     "COORDENADOR": 0,
@@ -140,6 +133,8 @@ BASE_CONSTRAINT_CODES = {
     "FERIADO_TRAB": "Feriado trabalhado",
 }
 
+BASIC_BLOCKING_CODES = {"FERIAS", "DISPENSA", "FERIADO"}
+
 CONSTRAINT_CODES = dict(BASE_CONSTRAINT_CODES)
 CONSTRAINT_COMBOS = [
     "M",
@@ -162,6 +157,35 @@ for combo in CONSTRAINT_COMBOS:
     CONSTRAINT_CODES[f"DISPONIVEL_{combo}"] = f"Disponível ({combo})"
     CONSTRAINT_CODES[f"INDISPONIVEL_{combo}"] = f"Indisponível ({combo})"
 
+# Solver budgets per month; a missing "num_workers" means every available core.
+SOLVER_PROFILES = {
+    "fast": {
+        "time_limit_seconds": 5,
+        "relative_gap": 0.05,
+        "no_improvement_seconds": 2,
+    },
+    "balanced": {
+        "time_limit_seconds": 20,
+        "relative_gap": 0.005,
+        "no_improvement_seconds": 10,
+    },
+    "thorough": {
+        "time_limit_seconds": 120,
+        "relative_gap": 0.0,
+        "no_improvement_seconds": 0,
+    },
+}
+CUSTOM_SOLVER_PROFILE = "custom"
+DEFAULT_SOLVER_PROFILE = "balanced"
+SOLVER_PROFILE_FIELDS = (
+    "time_limit_seconds",
+    "num_workers",
+    "relative_gap",
+    "no_improvement_seconds",
+)
+# Floor for stored time limits that predate validation of solver_settings.
+MIN_SOLVER_TIME_LIMIT_SECONDS = 0.1
+
 DEFAULT_PENALTIES = {
     "unfilled": 5000,
     "pedido": 300,
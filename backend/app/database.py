@@ -95,11 +95,29 @@ def run_migrations():
                         "ALTER TABLE month_config ADD COLUMN prefer_folga_after_nd INTEGER DEFAULT 0"
                     )
                 )
+            if "solver_profile" not in columns:
+                conn.execute(
+                    text(
+                        "ALTER TABLE month_config ADD COLUMN solver_profile TEXT DEFAULT 'balanced'"
+                    )
+                )
+            if "solver_settings" not in columns:
+                conn.execute(
+                    text(
+                        "ALTER TABLE month_config ADD COLUMN solver_settings JSON DEFAULT '{}'"
+                    )
+                )
             conn.execute(
                 text(
                     "UPDATE month_config SET prefer_folga_after_nd = COALESCE(prefer_folga_after_nd, 0)"
                 )
             )
+            conn.execute(
+                text(
+                    "UPDATE month_config SET solver_profile = COALESCE(solver_profile, 'balanced'), "
+                    "solver_settings = COALESCE(solver_settings, '{}')"
+                )
+            )
 
         service_exists = conn.execute(
             text(
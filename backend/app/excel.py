@@ -12,7 +12,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from .config import TEMPLATE_PATH
-from .constants import SHIFT_LOOKUP, WEEKDAY_EN, WEEKDAY_PT
+from .constants import WEEKDAY_EN, WEEKDAY_PT
 from .models import (
     ConstraintEntry,
     ManualHoliday,
@@ -27,6 +27,7 @@ from .models import (
     SwapRequest,
     User,
 )
+from .shift_catalogue import ShiftCatalogue, shift_catalogue
 from .solver import collect_nurse_stats
 from .utils import sort_nurses_by_category
 from .holidays import month_holidays
@@ -227,8 +228,15 @@ def _group_categories(session: Session, group: str | None) -> list[str]:
 
 
 def export_schedule(
-    session: Session, year: int, month: int, group: str | None = None, lang: str | None = None
+    session: Session,
+    year: int,
+    month: int,
+    group: str | None = None,
+    lang: str | None = None,
+    shifts: ShiftCatalogue | None = None,
 ) -> io.BytesIO:
+    if shifts is None:
+        shifts = shift_catalogue(session)
     workbook = _load_template_workbook()
     sheet_name = "SETEMBRO final 2025"
     sheet = workbook[sheet_name] if sheet_name in workbook.sheetnames else workbook.active
@@ -325,7 +333,7 @@ def export_schedule(
     for entry in schedule_entries:
         key = (entry.nurse_id, entry.day)
         day_assignments.setdefault(key, []).append(entry.shift_code)
-        shift_meta = SHIFT_LOOKUP.get(entry.shift_code)
+        shift_meta = shifts.get(entry.shift_code)
         if shift_meta:
             assignment_minutes[entry.nurse_id] += shift_meta.minutes
 
@@ -383,9 +391,7 @@ def export_schedule(
                 assignments_sorted = sorted(
                     assignments,
                     key=lambda code: (
-                        SHIFT_LOOKUP.get(code).start_minute
-                        if SHIFT_LOOKUP.get(code)
-                        else 9999,
+                        shifts[code].start_minute if code in shifts else 9999,
                         code,
                     ),
                 )
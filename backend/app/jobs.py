@@ -0,0 +1,284 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, ContextManager, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from .config import SOLVER_JOB_WORKERS
+from .database import get_session
+from .schemas import MonthScheduleResponse, ScheduleResponse, SimulationResultRead
+from .solver import (
+    SOLVER_TIME_LIMIT_SECONDS,
+    SolveProfiler,
+    _add_months,
+    generate_horizon,
+    generate_schedule,
+    solver_time_budget,
+)
+
+JOB_PENDING = "PENDING"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_FAILED = "FAILED"
+ACTIVE_JOB_STATUSES = {JOB_PENDING, JOB_RUNNING}
+JOB_GENERATE = "generate"
+JOB_SIMULATE = "simulate"
+# (running, done, failed) messages per job kind.
+JOB_MESSAGES = {
+    JOB_GENERATE: ("A gerar horário", "Horário gerado", "Falha ao gerar horário"),
+    JOB_SIMULATE: ("A simular cenários", "Simulação concluída", "Falha ao simular"),
+}
+MAX_FINISHED_JOBS = 50
+MAX_PROGRESS_EVENTS = 500
+
+
+@dataclass
+class SolveJob:
+    id: str
+    year: int
+    month: int
+    group: Optional[str]
+    months: int = 1
+    status: str = JOB_PENDING
+    message: str = ""
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[ScheduleResponse] = None
+    horizon: List[MonthScheduleResponse] = field(default_factory=list)
+    error: Optional[str] = None
+    events: List[Dict[str, float]] = field(default_factory=list)
+    stop_event: threading.Event = field(default_factory=threading.Event)
+    kind: str = JOB_GENERATE
+    simulation: List[SimulationResultRead] = field(default_factory=list)
+    # Seconds the solver may use, from the months' profiles once the job starts.
+    time_budget: Optional[float] = None
+
+    @property
+    def key(self) -> Tuple[int, int, str, int]:
+        return job_key(self.year, self.month, self.group, self.months)
+
+    @property
+    def covered_months(self) -> Set[Tuple[int, int]]:
+        return {
+            _add_months(self.year, self.month, offset) for offset in range(self.months)
+        }
+
+    def overlaps(self, other: "SolveJob") -> bool:
+        """Whether both jobs would rewrite the entries of a common month."""
+        group, other_group = self.key[2], other.key[2]
+        # A job without a group rewrites every nurse, so it clashes with any group.
+        if group and other_group and group != other_group:
+            return False
+        return bool(self.covered_months & other.covered_months)
+
+    @property
+    def progress(self) -> float:
+        if self.status in {JOB_DONE, JOB_FAILED}:
+            return 1.0
+        if self.status != JOB_RUNNING or not self.started_at:
+            return 0.0
+        elapsed = (datetime.utcnow() - self.started_at).total_seconds()
+        # The solver runs until its time budget, so elapsed time is the best estimate.
+        budget = self.time_budget or SOLVER_TIME_LIMIT_SECONDS * self.months
+        return round(min(0.99, elapsed / budget), 2)
+
+    @property
+    def last_progress(self) -> Optional[Dict[str, float]]:
+        return self.events[-1] if self.events else None
+
+    def record_progress(self, event: Dict[str, float]) -> None:
+        self.events.append(event)
+        if len(self.events) > MAX_PROGRESS_EVENTS:
+            del self.events[0]
+
+
+class SolveJobConflict(Exception):
+    """Raised when a new job would write months an active job is generating."""
+
+    def __init__(self, job: SolveJob):
+        super().__init__(job.id)
+        self.job = job
+
+
+def job_key(
+    year: int, month: int, group: Optional[str], months: int = 1
+) -> Tuple[int, int, str, int]:
+    return (year, month, (group or "").strip().lower(), months)
+
+
+def _run_horizon(session: Session, job: SolveJob) -> ScheduleResponse:
+    months = generate_horizon(
+        session,
+        job.year,
+        job.month,
+        job.months,
+        job.group,
+        progress=job.record_progress,
+        stop_event=job.stop_event,
+        time_budget=job.time_budget,
+    )
+    job.horizon = [
+        MonthScheduleResponse(
+            year=item.year,
+            month=item.month,
+            entries=item.assignments,
+            unfilled=item.unfilled,
+            violations=item.violations,
+            stats=item.stats,
+            diagnostics=item.profiler.summary(),
+        )
+        for item in months
+    ]
+    return job.horizon[0]
+
+
+def _run_generate(session: Session, job: SolveJob):
+    job.time_budget = solver_time_budget(session, job.year, job.month, job.months)
+    if job.months > 1:
+        return _run_horizon(session, job)
+    profiler = SolveProfiler()
+    assignments, unfilled, violations, stats = generate_schedule(
+        session,
+        job.year,
+        job.month,
+        job.group,
+        progress=job.record_progress,
+        stop_event=job.stop_event,
+        profiler=profiler,
+    )
+    return ScheduleResponse(
+        entries=assignments,
+        unfilled=unfilled,
+        violations=violations,
+        stats=stats,
+        diagnostics=profiler.summary(),
+    )
+
+
+class SolveJobManager:
+    def __init__(
+        self,
+        session_factory: Callable[[], ContextManager[Session]] = get_session,
+        max_workers: int = SOLVER_JOB_WORKERS,
+        runner: Callable[..., ScheduleResponse] = _run_generate,
+    ):
+        self._session_factory = session_factory
+        self._runner = runner
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="solve-job"
+        )
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, SolveJob]" = OrderedDict()
+        self._active: Dict[Tuple[int, int, str, int], str] = {}
+
+    def submit(
+        self, year: int, month: int, group: Optional[str] = None, months: int = 1
+    ) -> SolveJob:
+        key = job_key(year, month, group, months)
+        job = SolveJob(
+            id=uuid.uuid4().hex, year=year, month=month, group=group, months=months
+        )
+        with self._lock:
+            for active_id in self._active.values():
+                active = self._jobs.get(active_id)
+                if not active or active.status not in ACTIVE_JOB_STATUSES:
+                    continue
+                if active.key == key:
+                    return active
+                if active.overlaps(job):
+                    raise SolveJobConflict(active)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+            self._prune_finished()
+        self._executor.submit(self._run, job)
+        return job
+
+    def submit_simulation(
+        self,
+        year: int,
+        month: int,
+        group: Optional[str],
+        runner: Callable[[Session, SolveJob], List[SimulationResultRead]],
+    ) -> SolveJob:
+        """Run a what-if simulation as a job; it only reads, so it never conflicts."""
+        job = SolveJob(
+            id=uuid.uuid4().hex,
+            year=year,
+            month=month,
+            group=group,
+            kind=JOB_SIMULATE,
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_finished()
+        self._executor.submit(self._run, job, runner)
+        return job
+
+    def get(self, job_id: str) -> Optional[SolveJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[SolveJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def stop(self, job_id: str) -> Optional[SolveJob]:
+        job = self.get(job_id)
+        if job and job.status in ACTIVE_JOB_STATUSES:
+            job.stop_event.set()
+            job.message = "A terminar com a melhor solução encontrada"
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[SolveJob]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if not job or job.status not in ACTIVE_JOB_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(0.05)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: SolveJob, runner: Optional[Callable] = None) -> None:
+        running, done, failed = JOB_MESSAGES[job.kind]
+        job.status = JOB_RUNNING
+        job.started_at = datetime.utcnow()
+        job.message = running
+        try:
+            with self._session_factory() as session:
+                if job.kind == JOB_SIMULATE:
+                    job.simulation = runner(session, job)
+                else:
+                    job.result = (runner or self._runner)(session, job)
+            job.status = JOB_DONE
+            job.message = done
+        except Exception as exc:  # noqa: BLE001 - reported back through the job
+            job.status = JOB_FAILED
+            job.error = str(exc) or exc.__class__.__name__
+            job.message = failed
+        finally:
+            job.finished_at = datetime.utcnow()
+            with self._lock:
+                if self._active.get(job.key) == job.id:
+                    del self._active[job.key]
+
+    def _prune_finished(self) -> None:
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status not in ACTIVE_JOB_STATUSES
+        ]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+solve_jobs = SolveJobManager()
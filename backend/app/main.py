@@ -1,3 +1,6 @@
+import asyncio
+import json
+import time
 from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
@@ -9,6 +12,7 @@ from fastapi.staticfiles import StaticFiles
 from sqlalchemy import delete, func, select, and_, or_
 from sqlmodel import SQLModel, Session
 
+from .calendar_summary import nurse_calendar_summary
 from .config import (
     ACCENT_COLOR,
     APP_NAME,
@@ -27,9 +31,12 @@ from .config import (
 )
 from .constants import (
     CONSTRAINT_CODES,
+    CUSTOM_SOLVER_PROFILE,
     DEFAULT_PENALTIES,
     MINUTES_PER_DAY,
     NURSE_CATEGORIES,
+    SOLVER_PROFILE_FIELDS,
+    SOLVER_PROFILES,
 )
 from .database import engine, get_session, run_migrations
 from .defaults import (
@@ -47,6 +54,15 @@ from .defaults import (
 from .excel import export_constraints, export_schedule, export_swaps
 from .pdf import export_constraints_pdf, export_schedule_pdf, export_swap_pdf
 from .holidays import month_holidays
+from .jobs import (
+    ACTIVE_JOB_STATUSES,
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_SIMULATE,
+    SolveJob,
+    SolveJobConflict,
+    solve_jobs,
+)
 from .models import (
     ChatMessage,
     ChatThreadState,
@@ -57,6 +73,7 @@ from .models import (
     NurseMonthAdjustment,
     NurseMonthStat,
     ProfessionalCategory,
+    ScheduleDraft,
     ScheduleEntry,
     ScheduleRelease,
     Service,
@@ -75,6 +92,7 @@ from .schemas import (
     AdjustmentBulkRequest,
     AdjustmentRead,
     AvailabilityBulkRequest,
+    CapacityRow,
     AvailabilityDecision,
     AvailabilityPendingRead,
     AvailabilityRequestRead,
@@ -92,8 +110,16 @@ from .schemas import (
     RequirementBulkRequest,
     RequirementRead,
     ScheduleCellUpdate,
+    ScheduleDraftCell,
+    ScheduleDraftDiff,
+    ScheduleDraftRead,
     ScheduleEntrySchema,
+    ScheduleRepairRequest,
     ScheduleResponse,
+    ScheduleVariantRequest,
+    SimulationRequest,
+    SimulationResultRead,
+    SolveJobRead,
     NurseStat,
     StatUpdateRequest,
     ShiftSchema,
@@ -129,12 +155,21 @@ from .schemas import (
     SettingsUpdate,
 )
 from .solver import (
+    ScheduleVariant,
     _allows_double_shift,
     _contracted_target_minutes,
+    _revert_month_stats,
     collect_nurse_stats,
-    generate_schedule,
     get_or_create_month_config,
+    invalid_solver_settings,
+    prepare_schedule,
+    promote_schedule_draft,
+    repair_schedule,
+    schedule_draft_diff,
+    simulate_schedule,
+    solver_time_budget,
 )
+from .shift_catalogue import shift_catalogue
 from .shift_settings import refresh_shift_settings
 from .utils import sort_nurses_by_category
 from .auth import create_access_token, get_current_user, hash_password, require_roles, verify_password
@@ -165,6 +200,11 @@ def on_startup():
             ensure_default_users(session)
 
 
+@app.on_event("shutdown")
+def on_shutdown():
+    solve_jobs.shutdown()
+
+
 app.mount(
     "/static/uploads",
     StaticFiles(directory=str(UPLOADS_PATH)),
@@ -917,18 +957,8 @@ def _recalculate_nurse_stat(session: Session, nurse_id: int, year: int, month: i
     if adjustment:
         actual_minutes += adjustment.extra_minutes
         actual_minutes -= adjustment.reduced_minutes
-    constraint_map = {
-        (item.nurse_id, item.day): item.code
-        for item in session.scalars(
-            select(ConstraintEntry).where(
-                ConstraintEntry.year == year,
-                ConstraintEntry.month == month,
-                ConstraintEntry.nurse_id == nurse_id,
-            )
-        )
-    }
     target_minutes = _contracted_target_minutes(
-        nurse, year, month, constraint_map, adjustment
+        nurse, nurse_calendar_summary(session, nurse_id, year, month), adjustment
     )
     if target_minutes is None:
         target_minutes = 0
@@ -1204,6 +1234,7 @@ def create_shift_catalog(
     )
     session.add(shift)
     session.flush()
+    refresh_shift_settings(session)
     session.refresh(shift)
     return shift
 
@@ -1234,6 +1265,7 @@ def update_shift_catalog(
     shift.end_minute = end_minute
     session.add(shift)
     session.flush()
+    refresh_shift_settings(session)
     session.refresh(shift)
     return shift
 
@@ -1250,6 +1282,7 @@ def delete_shift_catalog(
     session.execute(delete(ServiceShift).where(ServiceShift.shift_code == code))
     session.delete(shift)
     session.flush()
+    refresh_shift_settings(session)
     return Response(status_code=204)
 
 
@@ -2000,6 +2033,24 @@ def update_month_config(
     config.prefer_folga_after_nd = payload.prefer_folga_after_nd
     config.min_rest_hours = payload.min_rest_hours
     config.penalty_weights = payload.penalty_weights
+    if payload.solver_profile is not None:
+        if payload.solver_profile not in {*SOLVER_PROFILES, CUSTOM_SOLVER_PROFILE}:
+            raise HTTPException(status_code=400, detail="Perfil de solver inválido")
+        config.solver_profile = payload.solver_profile
+    if payload.solver_settings is not None:
+        unknown = set(payload.solver_settings) - set(SOLVER_PROFILE_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Parâmetros de solver desconhecidos: {', '.join(sorted(unknown))}",
+            )
+        invalid = invalid_solver_settings(payload.solver_settings)
+        if invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Parâmetros de solver inválidos: {', '.join(invalid)}",
+            )
+        config.solver_settings = payload.solver_settings
     session.add(config)
     session.flush()
     session.refresh(config)
@@ -2370,6 +2421,171 @@ def update_schedule_cell(
     return created_entries[0]
 
 
+@app.post("/api/schedule/repair", response_model=ScheduleResponse)
+def repair_schedule_endpoint(
+    payload: ScheduleRepairRequest,
+    year: int = Query(..., ge=2020),
+    month: int = Query(..., ge=1, le=12),
+    session: Session = Depends(get_db_session),
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    if not session.get(Nurse, payload.nurse_id):
+        raise HTTPException(status_code=404, detail="Profissional não encontrado")
+    assignments, unfilled, violations, stats = repair_schedule(
+        session,
+        year,
+        month,
+        payload.nurse_id,
+        payload.day,
+        extra_nurse_ids=payload.nurse_ids,
+        window_days=payload.window_days,
+    )
+    return ScheduleResponse(
+        entries=assignments, unfilled=unfilled, violations=violations, stats=stats
+    )
+
+
+def _draft_to_schema(draft: ScheduleDraft) -> ScheduleDraftRead:
+    return ScheduleDraftRead(
+        id=draft.id,
+        year=draft.year,
+        month=draft.month,
+        group=draft.group,
+        rank=draft.rank,
+        objective=draft.objective,
+        entry_count=len(draft.entries),
+        unfilled_count=len(draft.unfilled),
+        created_at=draft.created_at.isoformat(),
+    )
+
+
+def _draft_cells(cells) -> List[ScheduleDraftCell]:
+    return [
+        ScheduleDraftCell(
+            nurse_id=nurse_id, day=day, service_code=service_code, shift_code=shift_code
+        )
+        for nurse_id, day, service_code, shift_code in cells
+    ]
+
+
+def _draft_or_404(session: Session, draft_id: int) -> ScheduleDraft:
+    draft = session.get(ScheduleDraft, draft_id)
+    if not draft:
+        raise HTTPException(status_code=404, detail="Rascunho não encontrado")
+    return draft
+
+
+@app.get("/api/schedule/drafts", response_model=List[ScheduleDraftRead])
+def list_schedule_drafts(
+    year: int = Query(..., ge=2020),
+    month: int = Query(..., ge=1, le=12),
+    session: Session = Depends(get_db_session),
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    drafts = session.scalars(
+        select(ScheduleDraft)
+        .where(ScheduleDraft.year == year, ScheduleDraft.month == month)
+        .order_by(ScheduleDraft.group, ScheduleDraft.rank)
+    )
+    return [_draft_to_schema(draft) for draft in drafts]
+
+
+@app.get("/api/schedule/drafts/{draft_id}/diff", response_model=ScheduleDraftDiff)
+def diff_schedule_draft(
+    draft_id: int,
+    against: int | None = Query(None),
+    session: Session = Depends(get_db_session),
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    draft = _draft_or_404(session, draft_id)
+    other = _draft_or_404(session, against) if against is not None else None
+    added, removed = schedule_draft_diff(session, draft, other)
+    return ScheduleDraftDiff(
+        draft_id=draft.id,
+        against_id=against,
+        added=_draft_cells(added),
+        removed=_draft_cells(removed),
+    )
+
+
+@app.post("/api/schedule/drafts/{draft_id}/promote", response_model=ScheduleResponse)
+def promote_schedule_draft_endpoint(
+    draft_id: int,
+    session: Session = Depends(get_db_session),
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    draft = _draft_or_404(session, draft_id)
+    assignments, unfilled, violations, stats = promote_schedule_draft(session, draft)
+    return ScheduleResponse(
+        entries=assignments, unfilled=unfilled, violations=violations, stats=stats
+    )
+
+
+@app.get("/api/schedule/capacity", response_model=List[CapacityRow])
+def schedule_capacity(
+    year: int = Query(..., ge=2020),
+    month: int = Query(..., ge=1, le=12),
+    group: str | None = Query(None),
+    session: Session = Depends(get_db_session),
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    prepared = prepare_schedule(
+        session, year, month, group, warm_start=False, read_only=True
+    )
+    return prepared.capacity
+
+
+def _variant_from_schema(payload: ScheduleVariantRequest) -> ScheduleVariant:
+    return ScheduleVariant(
+        name=payload.name,
+        add_nurses=[Nurse(**item.model_dump()) for item in payload.add_nurses],
+        remove_nurse_ids=payload.remove_nurse_ids,
+        requirement_counts={
+            (item.day, item.service_code, item.shift_code): item.required_count
+            for item in payload.requirements
+        },
+        constraints={(item.nurse_id, item.day): item.code for item in payload.constraints},
+    )
+
+
+@app.post("/api/schedule/simulate", response_model=SolveJobRead, status_code=202)
+def simulate_schedule_endpoint(
+    payload: SimulationRequest,
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    variants = [_variant_from_schema(item) for item in payload.variants]
+
+    def run(session: Session, job: SolveJob) -> List[SimulationResultRead]:
+        # Variants are solved side by side, so they share one month's budget.
+        job.time_budget = payload.time_limit_seconds or solver_time_budget(
+            session, payload.year, payload.month
+        )
+        results = simulate_schedule(
+            session,
+            payload.year,
+            payload.month,
+            payload.group,
+            variants,
+            payload.time_limit_seconds,
+        )
+        return [
+            SimulationResultRead(
+                name=result.name,
+                status=result.status,
+                entries=result.entries,
+                unfilled=result.unfilled,
+                violations=result.violations,
+                stats=result.stats,
+                added=_draft_cells(result.added),
+                removed=_draft_cells(result.removed),
+            )
+            for result in results
+        ]
+
+    job = solve_jobs.submit_simulation(payload.year, payload.month, payload.group, run)
+    return _job_to_schema(job)
+
+
 @app.put("/api/schedule/stat", response_model=NurseStat)
 def update_stat_target(
     payload: StatUpdateRequest,
@@ -2413,21 +2629,149 @@ def update_stat_target(
     )
 
 
-@app.post("/api/schedule/generate", response_model=ScheduleResponse)
+def _job_to_schema(job: SolveJob, include_result: bool = True) -> SolveJobRead:
+    return SolveJobRead(
+        id=job.id,
+        year=job.year,
+        month=job.month,
+        group=job.group,
+        status=job.status,
+        progress=job.progress,
+        message=job.message,
+        created_at=job.created_at.isoformat(),
+        started_at=job.started_at.isoformat() if job.started_at else None,
+        finished_at=job.finished_at.isoformat() if job.finished_at else None,
+        error=job.error,
+        last_progress=job.last_progress,
+        result=job.result if include_result else None,
+        months=job.months,
+        horizon=job.horizon if include_result else [],
+        kind=job.kind,
+        simulation=job.simulation if include_result else [],
+    )
+
+
+def _job_or_404(job_id: str) -> SolveJob:
+    job = solve_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Geração não encontrada")
+    return job
+
+
+@app.post("/api/schedule/generate", response_model=SolveJobRead, status_code=202)
 def generate_endpoint(
     payload: GenerateRequest,
     group: str | None = Query(None),
-    session: Session = Depends(get_db_session),
     _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
 ):
-    assignments, unfilled, violations, stats = generate_schedule(
-        session, payload.year, payload.month, group
-    )
-    return ScheduleResponse(
-        entries=assignments, unfilled=unfilled, violations=violations, stats=stats
+    try:
+        job = solve_jobs.submit(payload.year, payload.month, group, payload.months)
+    except SolveJobConflict as exc:
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f"Já existe uma geração em curso para {exc.job.month:02d}/"
+                f"{exc.job.year} que inclui estes meses"
+            ),
+        ) from exc
+    return _job_to_schema(job)
+
+
+@app.get("/api/schedule/jobs", response_model=List[SolveJobRead])
+def list_generate_jobs(
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    return [_job_to_schema(job, include_result=False) for job in solve_jobs.list()]
+
+
+@app.get("/api/schedule/jobs/{job_id}", response_model=SolveJobRead)
+def get_generate_job(
+    job_id: str,
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    return _job_to_schema(_job_or_404(job_id))
+
+
+@app.post("/api/schedule/jobs/{job_id}/stop", response_model=SolveJobRead)
+def stop_generate_job(
+    job_id: str,
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    _job_or_404(job_id)
+    return _job_to_schema(solve_jobs.stop(job_id), include_result=False)
+
+
+def _sse_message(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _job_event_stream(job: SolveJob):
+    last_solution = 0
+    last_sent = time.monotonic()
+    while True:
+        active = job.status in ACTIVE_JOB_STATUSES
+        for event in list(job.events):
+            if event["solution"] <= last_solution:
+                continue
+            last_solution = event["solution"]
+            last_sent = time.monotonic()
+            yield _sse_message("progress", event)
+        if not active:
+            break
+        if time.monotonic() - last_sent > 15:
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(0.25)
+    yield _sse_message(
+        "status",
+        _job_to_schema(job, include_result=False).model_dump(mode="json"),
+    )
+
+
+@app.get("/api/schedule/jobs/{job_id}/events")
+def stream_generate_job_events(
+    job_id: str,
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    job = _job_or_404(job_id)
+    return StreamingResponse(
+        _job_event_stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.get("/api/schedule/jobs/{job_id}/result", response_model=ScheduleResponse)
+def get_generate_job_result(
+    job_id: str,
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    job = _job_or_404(job_id)
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=job.error or "Falha ao gerar horário")
+    if job.status != JOB_DONE or job.result is None:
+        raise HTTPException(status_code=409, detail="Geração ainda em curso")
+    return job.result
+
+
+@app.get(
+    "/api/schedule/jobs/{job_id}/simulation",
+    response_model=List[SimulationResultRead],
+)
+def get_simulation_job_result(
+    job_id: str,
+    _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
+):
+    job = _job_or_404(job_id)
+    if job.kind != JOB_SIMULATE:
+        raise HTTPException(status_code=404, detail="Simulação não encontrada")
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=job.error or "Falha ao simular")
+    if job.status != JOB_DONE:
+        raise HTTPException(status_code=409, detail="Simulação ainda em curso")
+    return job.simulation
+
+
 @app.delete("/api/schedule", status_code=204)
 def clear_schedule_endpoint(
     year: int = Query(..., ge=2020),
@@ -2437,23 +2781,7 @@ def clear_schedule_endpoint(
     _user: User = Depends(require_roles("ADMIN", "COORDENADOR")),
 ):
     nurse_ids = _nurse_ids_for_group(session, group)
-    stat_lookup: Dict[int, NurseMonthStat] = {}
-    stat_query = select(NurseMonthStat).where(
-        NurseMonthStat.year == year,
-        NurseMonthStat.month == month,
-    )
-    if nurse_ids:
-        stat_query = stat_query.where(NurseMonthStat.nurse_id.in_(nurse_ids))
-    for stat in session.scalars(stat_query):
-        stat_lookup[stat.nurse_id] = stat
-    for nurse_id, stat in stat_lookup.items():
-        nurse = session.get(Nurse, nurse_id)
-        if not nurse:
-            continue
-        nurse.hour_balance_minutes = (nurse.hour_balance_minutes or 0) - (
-            stat.delta_minutes or 0
-        )
-        session.add(nurse)
+    _revert_month_stats(session, year, month, nurse_ids or None)
     entry_query = delete(ScheduleEntry).where(
         ScheduleEntry.year == year,
         ScheduleEntry.month == month,
@@ -2869,6 +3197,7 @@ def download_schedule(
             info_text=pdf_info_text,
             group=group,
             lang=lang_key,
+            shifts=shift_catalogue(session),
         )
         filename = (
             f"shiftflow_schedule_{year}_{month:02d}.pdf"
@@ -2879,7 +3208,9 @@ def download_schedule(
         return StreamingResponse(stream, media_type="application/pdf", headers=headers)
     if normalized != "xlsx":
         raise HTTPException(status_code=400, detail="Formato inválido")
-    stream = export_schedule(session, year, month, group, lang=lang_key)
+    stream = export_schedule(
+        session, year, month, group, lang=lang_key, shifts=shift_catalogue(session)
+    )
     filename = (
         f"shiftflow_schedule_{year}_{month:02d}.xlsx"
         if lang_key == "en"
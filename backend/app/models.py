@@ -4,7 +4,7 @@ from typing import List, Optional
 from sqlalchemy import Column, DateTime, Integer, JSON, UniqueConstraint
 from sqlmodel import Field, SQLModel
 
-from .constants import DEFAULT_PENALTIES
+from .constants import DEFAULT_PENALTIES, DEFAULT_SOLVER_PROFILE
 
 
 class Nurse(SQLModel, table=True):
@@ -169,6 +169,27 @@ class ScheduleEntry(SQLModel, table=True):
     source: str = Field(default="auto")
 
 
+class ScheduleDraft(SQLModel, table=True):
+    """A roster kept from a solver run; rank 0 is the one that was persisted."""
+
+    __tablename__ = "schedule_draft"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    year: int = Field(index=True)
+    month: int = Field(index=True)
+    group: Optional[str] = Field(default=None)
+    rank: int = Field(default=0)
+    objective: float = Field(default=0)
+    nurse_ids: List[int] = Field(sa_column=Column(JSON, nullable=False, default=list))
+    # [nurse_id, day, service_code, shift_code] for each solver assignment.
+    entries: List[List] = Field(sa_column=Column(JSON, nullable=False, default=list))
+    unfilled: List[dict] = Field(sa_column=Column(JSON, nullable=False, default=list))
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime, nullable=False, default=datetime.utcnow),
+    )
+
+
 class MonthConfig(SQLModel, table=True):
     __tablename__ = "month_config"
     __table_args__ = (UniqueConstraint("year", "month", name="uq_month_config"),)
@@ -185,6 +206,11 @@ class MonthConfig(SQLModel, table=True):
         default_factory=lambda: DEFAULT_PENALTIES,
         sa_column=Column(JSON, nullable=False, default=DEFAULT_PENALTIES),
     )
+    solver_profile: str = Field(default=DEFAULT_SOLVER_PROFILE)
+    # Overrides of SOLVER_PROFILE_FIELDS, used when solver_profile is "custom".
+    solver_settings: dict = Field(
+        default_factory=dict, sa_column=Column(JSON, nullable=False, default=dict)
+    )
 
 
 class ProfessionalCategory(SQLModel, table=True):
@@ -2,7 +2,7 @@ import io
 import calendar
 import re
 from datetime import datetime
-from typing import Dict, Tuple
+from typing import Dict, Mapping, Tuple
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
@@ -40,6 +40,7 @@ from .models import (
     SwapRequest,
     User,
 )
+from .shift_catalogue import ShiftCatalogue, ShiftMeta, shift_catalogue
 
 
 APP_LOGO_SIZE = (60 * mm, 22 * mm)
@@ -548,6 +549,7 @@ def _requirements_summary_table(
     leading_widths: list[float],
     trailing_widths: list[float],
     lang: str | None,
+    shifts: Mapping[str, ShiftMeta],
 ):
     service_codes = None
     role = _role_from_group(session, group)
@@ -567,7 +569,6 @@ def _requirements_summary_table(
     service_names = {
         service.code: service.name for service in session.scalars(select(Service))
     }
-    shifts = {shift.code: shift for shift in session.scalars(select(Shift))}
     required_map: Dict[Tuple[str, str, int], int] = {}
     rows_set = []
     for req in requirements:
@@ -655,7 +656,10 @@ def export_schedule_pdf(
     info_text: str | None = None,
     group: str | None = None,
     lang: str | None = None,
+    shifts: ShiftCatalogue | None = None,
 ) -> io.BytesIO:
+    if shifts is None:
+        shifts = shift_catalogue(session)
     data = []
     day_headers = _day_headers(year, month)
     weekend_set = _weekend_set(year, month)
@@ -695,8 +699,6 @@ def export_schedule_pdf(
             .join(Service, Service.code == ServiceShift.service_code)
         ).all()
     }
-    shifts = {shift.code: shift for shift in session.scalars(select(Shift))}
-    shift_types = {shift.code: shift.shift_type for shift in session.scalars(select(Shift))}
     day_assignments: Dict[Tuple[int, int], list[str]] = {}
     for entry in schedule_entries:
         key = (entry.nurse_id, entry.day)
@@ -820,7 +822,7 @@ def export_schedule_pdf(
     info_block = Paragraph(_tiny_text_block(info_text), small_style)
     signature = _signature_table(doc.width, lang)
     requirements_table = _requirements_summary_table(
-        session, year, month, group, day_width, [80, 40], summary_widths, lang
+        session, year, month, group, day_width, [80, 40], summary_widths, lang, shifts
     )
     elements = [header_table, table]
     if requirements_table:
@@ -140,16 +140,78 @@ class NurseStat(BaseModel):
     previous_bank_minutes: int
 
 
+class SolvePhaseTiming(BaseModel):
+    phase: str
+    seconds: float
+    variables: Optional[int] = None
+    constraints: Optional[int] = None
+
+
+class SolverProfileRead(BaseModel):
+    name: str
+    time_limit_seconds: float
+    num_workers: int
+    relative_gap: float
+    no_improvement_seconds: float
+
+
+class SolveDiagnostics(BaseModel):
+    total_seconds: float
+    phases: List[SolvePhaseTiming] = Field(default_factory=list)
+    response_stats: List[str] = Field(default_factory=list)
+    profile: Optional[SolverProfileRead] = None
+    slots: Optional[int] = None
+
+
 class ScheduleResponse(BaseModel):
     entries: List[ScheduleEntrySchema]
     unfilled: List[UnfilledSlot]
     violations: List[str] = Field(default_factory=list)
     stats: List[NurseStat] = Field(default_factory=list)
+    diagnostics: Optional[SolveDiagnostics] = None
+
+
+class MonthScheduleResponse(ScheduleResponse):
+    year: int
+    month: int
 
 
 class GenerateRequest(BaseModel):
     year: int
     month: int
+    # More than one month generates them in order as a single job.
+    months: int = Field(1, ge=1, le=12)
+
+
+class SolveProgressEvent(BaseModel):
+    solution: int
+    objective: float
+    best_bound: float
+    unfilled: int
+    elapsed_seconds: float
+    year: Optional[int] = None
+    month: Optional[int] = None
+    stage: Optional[int] = None
+
+
+class SolveJobRead(BaseModel):
+    id: str
+    year: int
+    month: int
+    group: Optional[str] = None
+    status: str
+    progress: float
+    message: str
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    last_progress: Optional[SolveProgressEvent] = None
+    result: Optional[ScheduleResponse] = None
+    months: int = 1
+    horizon: List[MonthScheduleResponse] = Field(default_factory=list)
+    kind: str = "generate"
+    simulation: List["SimulationResultRead"] = Field(default_factory=list)
 
 
 class ScheduleCellUpdate(BaseModel):
@@ -161,6 +223,110 @@ class ScheduleCellUpdate(BaseModel):
     locked: Optional[bool] = None
 
 
+class ScheduleRepairRequest(BaseModel):
+    nurse_id: int
+    day: int
+    nurse_ids: List[int] = Field(default_factory=list)
+    window_days: int = Field(default=7, ge=1, le=31)
+
+
+class ScheduleDraftRead(BaseModel):
+    id: int
+    year: int
+    month: int
+    group: Optional[str] = None
+    rank: int
+    objective: float
+    entry_count: int
+    unfilled_count: int
+    created_at: str
+
+
+class ScheduleDraftCell(BaseModel):
+    nurse_id: int
+    day: int
+    service_code: str
+    shift_code: str
+
+
+class ScheduleDraftDiff(BaseModel):
+    draft_id: int
+    against_id: Optional[int] = None
+    added: List[ScheduleDraftCell] = Field(default_factory=list)
+    removed: List[ScheduleDraftCell] = Field(default_factory=list)
+
+
+class SimulationNurse(BaseModel):
+    name: str
+    category: str
+    services_permitted: List[str] = Field(default_factory=list)
+    can_work_night: bool = True
+    max_noites_mes: Optional[int] = None
+    weekly_hours: int = 40
+
+
+class RequirementOverride(BaseModel):
+    day: int
+    service_code: str
+    shift_code: str
+    required_count: int = Field(ge=0)
+
+
+class ConstraintOverride(BaseModel):
+    # Added nurses are referred to as -1, -2, ... in the order they are listed.
+    nurse_id: int
+    day: int
+    code: Optional[str] = None
+
+
+class ScheduleVariantRequest(BaseModel):
+    name: str
+    add_nurses: List[SimulationNurse] = Field(default_factory=list)
+    remove_nurse_ids: List[int] = Field(default_factory=list)
+    requirements: List[RequirementOverride] = Field(default_factory=list)
+    constraints: List[ConstraintOverride] = Field(default_factory=list)
+
+
+class SimulationRequest(BaseModel):
+    year: int
+    month: int
+    group: Optional[str] = None
+    # No variants simulates the month as it stands.
+    variants: List[ScheduleVariantRequest] = Field(default_factory=list, max_length=8)
+    time_limit_seconds: Optional[float] = Field(None, gt=0, le=120)
+
+
+class SimulatedEntry(BaseModel):
+    nurse_id: int
+    day: int
+    service_code: str
+    shift_code: str
+    locked: bool
+    source: str
+
+
+class SimulationResultRead(BaseModel):
+    name: str
+    status: str
+    entries: List[SimulatedEntry]
+    unfilled: List[UnfilledSlot]
+    violations: List[str] = Field(default_factory=list)
+    stats: List[NurseStat] = Field(default_factory=list)
+    added: List[ScheduleDraftCell] = Field(default_factory=list)
+    removed: List[ScheduleDraftCell] = Field(default_factory=list)
+
+
+class CapacityRow(BaseModel):
+    day: int
+    shift_type: str
+    service_code: str
+    # Open slots after locked entries, and the nurses still able to take one.
+    demand: int
+    locked: int
+    supply: int
+    shortfall: int
+
+
 class MonthConfigSchema(BaseModel):
     year: int
     month: int
@@ -170,6 +336,9 @@ class MonthConfigSchema(BaseModel):
     prefer_folga_after_nd: bool
     min_rest_hours: int
     penalty_weights: Dict[str, int]
+    # Left out of an update, the stored solver settings stay as they are.
+    solver_profile: Optional[str] = None
+    solver_settings: Optional[Dict[str, float]] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -0,0 +1,140 @@
+import threading
+import weakref
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Iterable, Iterator, Mapping, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .constants import MINUTES_PER_DAY
+from .models import Shift
+
+
+@dataclass(frozen=True)
+class ShiftMeta:
+    code: str
+    shift_type: str
+    start_minute: int
+    end_minute: int
+    minutes: int
+
+
+def shift_meta(shift: Shift) -> ShiftMeta:
+    start = shift.start_minute
+    end = shift.end_minute
+    return ShiftMeta(
+        code=shift.code,
+        shift_type=shift.shift_type,
+        start_minute=start,
+        end_minute=end,
+        minutes=end - start if end > start else MINUTES_PER_DAY - start + end,
+    )
+
+
+@dataclass(frozen=True, eq=False)
+class ShiftCatalogue(Mapping[str, ShiftMeta]):
+    """Read-only snapshot of the ``Shift`` table, keyed by shift code.
+
+    ``version`` grows every time the table changes, so two catalogues with the
+    same version hold the same shifts. ``shifts`` is sorted by code and doubles
+    as a hashable cache key.
+    """
+
+    version: int
+    shifts: Tuple[ShiftMeta, ...]
+    _lookup: Mapping[str, ShiftMeta] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(
+            self, "_lookup", MappingProxyType({meta.code: meta for meta in self.shifts})
+        )
+
+    def __getitem__(self, code: str) -> ShiftMeta:
+        return self._lookup[code]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._lookup)
+
+    def __len__(self) -> int:
+        return len(self._lookup)
+
+    def __reduce__(self):
+        # Sent as is to the solver worker processes.
+        return ShiftCatalogue, (self.version, self.shifts)
+
+
+def build_shift_catalogue(
+    shifts: Iterable[ShiftMeta], version: int = 0
+) -> ShiftCatalogue:
+    return ShiftCatalogue(version, tuple(sorted(shifts, key=lambda meta: meta.code)))
+
+
+# One catalogue per database engine, replaced whenever a shift is written.
+_cache_lock = threading.Lock()
+_version = 0
+_cache: "weakref.WeakKeyDictionary[object, ShiftCatalogue]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def shift_catalogue(session: Session) -> ShiftCatalogue:
+    bind = session.get_bind()
+    with _cache_lock:
+        cached = _cache.get(bind)
+        version = _version
+    if cached is not None:
+        return cached
+    catalogue = build_shift_catalogue(
+        (shift_meta(shift) for shift in session.scalars(select(Shift))), version
+    )
+    # A shift written while the table was read would make this snapshot stale.
+    if not _has_pending_shifts(session):
+        with _cache_lock:
+            if _version == version:
+                catalogue = _cache.setdefault(bind, catalogue)
+    return catalogue
+
+
+def invalidate_shift_catalogue() -> None:
+    global _version
+    with _cache_lock:
+        _version += 1
+        _cache.clear()
+
+
+def _has_pending_shifts(session: Session) -> bool:
+    return any(
+        isinstance(item, Shift)
+        for item in (*session.new, *session.dirty, *session.deleted)
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _shifts_flushed(session: Session, _flush_context) -> None:
+    if _has_pending_shifts(session):
+        session.info["shifts_changed"] = True
+        invalidate_shift_catalogue()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _shifts_bulk_changed(orm_execute_state) -> None:
+    if not (
+        orm_execute_state.is_update
+        or orm_execute_state.is_delete
+        or orm_execute_state.is_insert
+    ):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Shift:
+        return
+    orm_execute_state.session.info["shifts_changed"] = True
+    invalidate_shift_catalogue()
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _shifts_settled(session: Session) -> None:
+    # Another session may have cached the old rows while this one was still open.
+    if session.info.pop("shifts_changed", False):
+        invalidate_shift_catalogue()
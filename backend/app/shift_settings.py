@@ -1,11 +1,11 @@
 from sqlalchemy.orm import Session
 
-from .solver import refresh_shift_lookup
+from .shift_catalogue import invalidate_shift_catalogue, shift_catalogue
 
 
 def ensure_shift_settings(session: Session) -> None:
-    refresh_shift_lookup(session)
+    shift_catalogue(session)
 
 
 def refresh_shift_settings(session: Session) -> None:
-    refresh_shift_lookup(session)
+    invalidate_shift_catalogue()
@@ -0,0 +1,49 @@
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+
+class SolveCache(Generic[T]):
+    """Least recently used solver results per database, keyed by input fingerprint.
+
+    Keys describe the inputs completely, so entries never go stale; they only
+    make room for newer ones. ``max_entries`` of 0 turns the cache off.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "weakref.WeakKeyDictionary[object, OrderedDict[Hashable, T]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get(self, session: Session, key: Hashable) -> Optional[T]:
+        with self._lock:
+            entries = self._entries.get(session.get_bind())
+            if not entries or key not in entries:
+                return None
+            entries.move_to_end(key)
+            return entries[key]
+
+    def put(self, session: Session, key: Hashable, value: T) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            entries = self._entries.setdefault(session.get_bind(), OrderedDict())
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
@@ -1,14 +1,63 @@
 import calendar
+import functools
+import hashlib
+import heapq
+import json
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
 from collections import defaultdict
-from dataclasses import dataclass
-from datetime import date
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field, replace
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
+import numpy as np
 from ortools.sat.python import cp_model
-from sqlalchemy import delete, select
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-
-from .constants import DEFAULT_PENALTIES, MINUTES_PER_DAY
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .config import (
+    MODEL_DUMP_DIR,
+    SOLUTION_POOL_SIZE,
+    SOLVER_CACHE_SIZE,
+    SOLVER_DECOMPOSE,
+    SOLVER_DUMP_MODELS,
+    SOLVER_FORMULATION,
+    SOLVER_OBJECTIVE,
+)
+from .calendar_summary import (
+    NurseCalendarSummary,
+    build_calendar_summaries,
+    empty_calendar_summary,
+    month_calendar_summaries,
+)
+from .constants import (
+    BASIC_BLOCKING_CODES,
+    CUSTOM_SOLVER_PROFILE,
+    DEFAULT_PENALTIES,
+    DEFAULT_SOLVER_PROFILE,
+    MINUTES_PER_DAY,
+    MIN_SOLVER_TIME_LIMIT_SECONDS,
+    SOLVER_PROFILE_FIELDS,
+    SOLVER_PROFILES,
+)
 from .models import (
     ConstraintEntry,
     MonthConfig,
@@ -17,12 +66,16 @@ from .models import (
     NurseMonthAdjustment,
     NurseMonthStat,
     ProfessionalCategory,
+    ScheduleDraft,
     ScheduleEntry,
     Service,
-    Shift,
 )
+from .shift_catalogue import ShiftCatalogue, ShiftMeta, shift_catalogue
+from .solve_cache import SolveCache
 from .utils import sort_nurses_by_category
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class Slot:
@@ -32,14 +85,42 @@ class Slot:
     shift_code: str
     minutes: int
     week_id: int
+    count: int = 1
 
 
-BASIC_BLOCKING_CODES = {"FERIAS", "DISPENSA", "FERIADO"}
 SHIFT_LETTER_MAP = {}
 MAX_CONSECUTIVE_WORK_DAYS = 6
 MINIMUM_DAILY_REST_MINUTES = 11 * 60
 FERIADO_REDUCTION_MINUTES = 8 * 60
 PARTIAL_CATEGORIES = {"RV_TEMPO_PARCIAL", "CONTRATADO_TEMPO_PARCIAL"}
+SOLVER_TIME_LIMIT_SECONDS = 20
+SOLVER_NUM_WORKERS = 8
+DECOMPOSE_MIN_SLOTS = 200
+REPAIR_WINDOW_DAYS = 7
+REPAIR_TIME_LIMIT_SECONDS = 1
+# Alternative schedules stay within this share of the best objective and move at
+# least this share of the assignments in the week they rework.
+POOL_OBJECTIVE_GAP = 0.05
+POOL_MIN_CHANGES = 0.1
+POOL_SEARCH_SECONDS = 2
+# Most of a solve's time limit the alternative searches may set aside.
+POOL_BUDGET_SHARE = 0.25
+EXPLAIN_TIME_LIMIT_SECONDS = 5
+# Lexicographic order of the objective stages and each one's share of the budget.
+OBJECTIVE_STAGES = {"coverage": 0.4, "preferences": 0.3, "fairness": 0.3}
+CONFLICT_RULE_LABELS = {
+    "rest": "descanso mínimo entre turnos",
+    "daily": "turnos incompatíveis no mesmo dia",
+    "night_rest": "trabalho no dia seguinte a uma noite",
+    "folga_nd": "folga após sequência N+D",
+    "night_cap": "máximo de noites no mês",
+    "consecutive": "máximo de dias consecutivos",
+    "weekend_off": "fim de semana de folga",
+    "weekly_max": "máximo de horas semanais",
+}
+
+# Outcomes of recent solves, so a repeat generate with the same inputs skips the solver.
+solve_cache: "SolveCache[SolveOutcome]" = SolveCache(SOLVER_CACHE_SIZE)
 
 
 def _role_from_group(session: Session, group: str | None) -> str | None:
@@ -65,33 +146,13 @@ def _categories_for_role(session: Session, role: str) -> List[str]:
             )
         )
     )
-@dataclass(frozen=True)
-class ShiftMeta:
-    code: str
-    shift_type: str
-    start_minute: int
-    end_minute: int
-    minutes: int
-
-
-SHIFT_LOOKUP: Dict[str, ShiftMeta] = {}
-
-
 def _days_in_month(year: int, month: int) -> int:
     return calendar.monthrange(year, month)[1]
 
 
 def _week_id(year: int, month: int, day: int) -> int:
-    return date(year, month, day).isocalendar()[1]
-
-
-def _business_days(year: int, month: int) -> int:
-    days = _days_in_month(year, month)
-    count = 0
-    for day in range(1, days + 1):
-        if date(year, month, day).weekday() < 5:
-            count += 1
-    return count
+    # Days before the 1st (0, -1, ...) fall in the previous month.
+    return (date(year, month, 1) + timedelta(days=day - 1)).isocalendar()[1]
 
 
 def get_or_create_month_config(session: Session, year: int, month: int) -> MonthConfig:
@@ -116,6 +177,23 @@ def get_or_create_month_config(session: Session, year: int, month: int) -> Month
     return config
 
 
+def _month_config_snapshot(session: Session, year: int, month: int) -> MonthConfig:
+    """The month's settings as a detached copy, without creating the row."""
+    config = session.scalar(
+        select(MonthConfig).where(
+            MonthConfig.year == year,
+            MonthConfig.month == month,
+        )
+    )
+    values = config.model_dump(exclude={"id"}) if config else {}
+    values.update(
+        year=year,
+        month=month,
+        penalty_weights={**DEFAULT_PENALTIES, **values.get("penalty_weights", {})},
+    )
+    return MonthConfig(**values)
+
+
 def _default_penalty(config: MonthConfig, key: str, fallback: int) -> int:
     return int(config.penalty_weights.get(key, fallback))
 
@@ -157,19 +235,21 @@ def _blocks_shift(constraint: str, shift_letter: str) -> bool:
     return False
 
 
-def _resolve_constraint(nurse: Nurse, constraint: str) -> str:
+def _resolve_category_constraint(category: str, constraint: str) -> str:
     if constraint:
         return constraint
-    if nurse.category in PARTIAL_CATEGORIES:
+    if category in PARTIAL_CATEGORIES:
         return "INDISPONIVEL_MTLN"
-    if nurse.category == "COORDENADOR":
+    if category == "COORDENADOR":
         return "INDISPONIVEL"
     return "DISPONIVEL_MTLN"
 
 
-def _rest_interval_minutes(prev_code: str, next_code: str) -> int:
-    prev = SHIFT_LOOKUP.get(prev_code)
-    nxt = SHIFT_LOOKUP.get(next_code)
+def _rest_interval_minutes(
+    prev_code: str, next_code: str, shifts: Mapping[str, ShiftMeta]
+) -> int:
+    prev = shifts.get(prev_code)
+    nxt = shifts.get(next_code)
     if not prev or not nxt:
         return MINUTES_PER_DAY
     prev_end_mod = prev.end_minute % MINUTES_PER_DAY
@@ -178,121 +258,96 @@ def _rest_interval_minutes(prev_code: str, next_code: str) -> int:
     return interval
 
 
-def refresh_shift_lookup(session: Session) -> None:
-    global SHIFT_LOOKUP
-    shift_map: Dict[str, ShiftMeta] = {}
-    for shift in session.scalars(select(Shift)):
-        end = shift.end_minute
-        start = shift.start_minute
-        minutes = end - start if end > start else MINUTES_PER_DAY - start + end
-        shift_map[shift.code] = ShiftMeta(
-            code=shift.code,
-            shift_type=shift.shift_type,
-            start_minute=start,
-            end_minute=end,
-            minutes=minutes,
-        )
-    SHIFT_LOOKUP = shift_map
-
-
-def _has_minimum_rest(prev_code: str, next_code: str, minimum: int) -> bool:
+def _has_minimum_rest(
+    prev_code: str, next_code: str, minimum: int, shifts: Mapping[str, ShiftMeta]
+) -> bool:
     if not prev_code or not next_code:
         return True
-    return _rest_interval_minutes(prev_code, next_code) >= minimum
+    return _rest_interval_minutes(prev_code, next_code, shifts) >= minimum
 
 
 def _contracted_target_minutes(
     nurse: Nurse,
-    year: int,
-    month: int,
-    constraint_map: Dict[Tuple[int, int], str],
+    summary: NurseCalendarSummary,
     adjustment: Optional[NurseMonthAdjustment],
 ) -> Optional[int]:
     if not nurse.weekly_hours:
         return None
     weekly_hours = nurse.weekly_hours
     daily_minutes = (weekly_hours / 5) * 60
-    base_minutes = int(_business_days(year, month) * daily_minutes)
-    vacation_days = sum(
-        1
-        for (nurse_id, day), code in constraint_map.items()
-        if nurse_id == nurse.id and code == "FERIAS"
-    )
-    vacation_minutes = int(vacation_days * daily_minutes)
-    legacy_holiday_days = sum(
-        1
-        for (nurse_id, day), code in constraint_map.items()
-        if nurse_id == nurse.id and code == "FERIADO_TRAB"
-    )
-    holiday_worked_minutes = int(legacy_holiday_days * daily_minutes)
+    base_minutes = int(summary.business_days * daily_minutes)
+    vacation_minutes = int(summary.vacation_days * daily_minutes)
+    holiday_worked_minutes = int(summary.holiday_worked_days * daily_minutes)
     if adjustment:
         holiday_worked_minutes += adjustment.feriados_trabalhados * FERIADO_REDUCTION_MINUTES
     target = max(0, base_minutes - vacation_minutes - holiday_worked_minutes)
     return target
 
 
-def _static_eligibility(
-    nurse: Nurse,
-    slot: Slot,
+def _constraint_reason(
+    category: str,
+    can_work_night: bool,
     constraint: str,
-    locked_days: Dict[Tuple[int, int], bool],
-    pedidos_hard: bool,
-) -> Tuple[bool, str, bool]:
-    """
-    Returns tuple (eligible, reason_when_false, pedido_penalty).
-    pedido_penalty -> True if assignment violates pedido (soft).
-    """
-    if nurse.category == "COORDENADOR":
-        return False, "Coordenador fora do solver", False
-    if locked_days.get((nurse.id, slot.day)):
-        return False, "Célula bloqueada/lock", False
-    if nurse.services_permitted and slot.shift_code not in nurse.services_permitted:
-        return False, "Serviço/turno não permitido", False
-
-    constraint = _resolve_constraint(nurse, constraint)
+    shift_code: str,
+    shifts: Mapping[str, ShiftMeta],
+) -> str:
+    constraint = _resolve_category_constraint(category, constraint)
 
     if constraint in BASIC_BLOCKING_CODES:
-        return False, f"Restrição {constraint}", False
+        return f"Restrição {constraint}"
 
-    if slot.shift_code not in SHIFT_LOOKUP:
-        return False, "Turno desconhecido", False
+    if shift_code not in shifts:
+        return "Turno desconhecido"
 
-    shift_meta = SHIFT_LOOKUP[slot.shift_code]
+    shift_meta = shifts[shift_code]
     shift_letter = _normalize_shift_letter(shift_meta.shift_type)
-    if shift_meta.shift_type == "N" and not nurse.can_work_night:
-        return False, "Não autorizado para noites", False
+    if shift_meta.shift_type == "N" and not can_work_night:
+        return "Não autorizado para noites"
 
     if _blocks_shift(constraint, shift_letter):
-        return False, "Indisponível para este turno", False
+        return "Indisponível para este turno"
 
     if constraint.startswith("DISPONIVEL_") and not _allows_shift(
         constraint, shift_letter
     ):
-        return False, "Disponível para outro turno", False
+        return "Disponível para outro turno"
 
-    if nurse.category in PARTIAL_CATEGORIES:
+    if category in PARTIAL_CATEGORIES:
         if not _allows_shift(constraint, shift_letter):
-            return False, "Parcial sem disponibilidade", False
-    elif nurse.category == "RV_TEMPO_INTEIRO":
+            return "Parcial sem disponibilidade"
+    elif category == "RV_TEMPO_INTEIRO":
         if _blocks_shift(constraint, shift_letter):
-            return False, "Indisponível", False
+            return "Indisponível"
 
     if constraint in {"PEDIDO_FOLGA", "PEDIDO_DESCANSO", "PEDIDO_DESCANSO_FOLGA"}:
-        return False, "Pedido (hard)", False
+        return "Pedido (hard)"
 
-    return True, "", False
+    return ""
 
 
 def _allows_double_shift(nurse: Nurse, first_type: str, second_type: str) -> bool:
+    return _class_allows_double_shift(
+        _double_shift_class(nurse.category), first_type, second_type
+    )
+
+
+def _double_shift_class(category: str) -> str:
+    if category in {"ASSISTENTE_OPERACIONAL", "CONTRATADO"} or (
+        category and category.startswith("CONTRATADO")
+    ):
+        return "MT"
+    return "ANY"
+
+
+def _class_allows_double_shift(
+    double_class: str, first_type: str, second_type: str
+) -> bool:
     if not first_type or not second_type:
         return False
     if first_type == second_type:
         return False
-    pair = {first_type, second_type}
-    if nurse.category in {"ASSISTENTE_OPERACIONAL", "CONTRATADO"} or (
-        nurse.category and nurse.category.startswith("CONTRATADO")
-    ):
-        return pair == {"M", "T"}
+    if double_class == "MT":
+        return {first_type, second_type} == {"M", "T"}
     return True
 
 
@@ -310,38 +365,118 @@ def _shifts_overlap(first: ShiftMeta, second: ShiftMeta) -> bool:
     return False
 
 
-def _insert_rest_entries(
-    session: Session, assignments: List[ScheduleEntry], year: int, month: int
-) -> None:
+@dataclass(frozen=True)
+class ShiftPairTable:
+    """Rest, overlap and double-shift flags for every ordered pair of shift codes."""
+
+    rest_conflicts: Dict[str, FrozenSet[str]]
+    overlaps: FrozenSet[Tuple[str, str]]
+    double_blocked: Dict[str, FrozenSet[Tuple[str, str]]]
+
+
+@functools.lru_cache(maxsize=16)
+def _shift_pair_table(
+    catalogue: Tuple[ShiftMeta, ...], min_rest_minutes: int
+) -> ShiftPairTable:
+    codes = [meta.code for meta in catalogue]
+    lookup = {meta.code: meta for meta in catalogue}
+    rest_conflicts: Dict[str, FrozenSet[str]] = {}
+    overlaps: Set[Tuple[str, str]] = set()
+    double_blocked: Dict[str, Set[Tuple[str, str]]] = {"MT": set(), "ANY": set()}
+    for first in catalogue:
+        rest_conflicts[first.code] = frozenset(
+            code
+            for code in codes
+            if not _has_minimum_rest(first.code, code, min_rest_minutes, lookup)
+        )
+        for second in catalogue:
+            pair = (first.code, second.code)
+            if _shifts_overlap(first, second):
+                overlaps.add(pair)
+            for double_class, blocked in double_blocked.items():
+                if not _class_allows_double_shift(
+                    double_class, first.shift_type, second.shift_type
+                ):
+                    blocked.add(pair)
+    return ShiftPairTable(
+        rest_conflicts=rest_conflicts,
+        overlaps=frozenset(overlaps),
+        double_blocked={
+            double_class: frozenset(pairs)
+            for double_class, pairs in double_blocked.items()
+        },
+    )
+
+
+def _entry_row(
+    nurse_id: int,
+    year: int,
+    month: int,
+    day: int,
+    service_code: str,
+    shift_code: str,
+    source: str = "auto",
+) -> Dict[str, object]:
+    return {
+        "nurse_id": nurse_id,
+        "year": year,
+        "month": month,
+        "day": day,
+        "service_code": service_code,
+        "shift_code": shift_code,
+        "locked": False,
+        "source": source,
+    }
+
+
+def _rest_entry_rows(
+    nights: Iterable[Tuple[int, int, str]],
+    occupied: Set[Tuple[int, int]],
+    year: int,
+    month: int,
+    shifts: Mapping[str, ShiftMeta],
+) -> List[Dict[str, object]]:
+    """Rest placeholders for the day after each (nurse_id, day, shift_code) night.
+
+    ``occupied`` holds every (nurse_id, day) that already has an entry; days
+    taken by a placeholder are added to it.
+    """
     days = _days_in_month(year, month)
-    for entry in assignments:
-        shift_meta = SHIFT_LOOKUP.get(entry.shift_code)
+    rows: List[Dict[str, object]] = []
+    for nurse_id, day, shift_code in nights:
+        shift_meta = shifts.get(shift_code)
         if not shift_meta or shift_meta.shift_type != "N":
             continue
-        next_day = entry.day + 1
-        if next_day > days:
-            continue
-        existing = session.scalar(
-            select(ScheduleEntry).where(
-                ScheduleEntry.year == year,
-                ScheduleEntry.month == month,
-                ScheduleEntry.day == next_day,
-                ScheduleEntry.nurse_id == entry.nurse_id,
-            )
-        )
-        if existing:
+        next_day = day + 1
+        if next_day > days or (nurse_id, next_day) in occupied:
             continue
-        rest_entry = ScheduleEntry(
-            nurse_id=entry.nurse_id,
-            year=year,
-            month=month,
-            day=next_day,
-            service_code="REST",
-            shift_code="D",
-            locked=False,
-            source="auto_rest",
+        occupied.add((nurse_id, next_day))
+        rows.append(
+            _entry_row(nurse_id, year, month, next_day, "REST", "D", "auto_rest")
         )
-        session.add(rest_entry)
+    return rows
+
+
+def _persist_entries(
+    session: Session,
+    rows: List[Dict[str, object]],
+    occupied: Set[Tuple[int, int]],
+    year: int,
+    month: int,
+    rest_sources: Iterable[Tuple[int, int, str]] = (),
+    shifts: Optional[ShiftCatalogue] = None,
+) -> List[ScheduleEntry]:
+    """Insert new entries and their rest placeholders with a single statement."""
+    if shifts is None:
+        shifts = shift_catalogue(session)
+    occupied = occupied | {(row["nurse_id"], row["day"]) for row in rows}
+    nights = [(row["nurse_id"], row["day"], row["shift_code"]) for row in rows]
+    rows = rows + _rest_entry_rows(
+        [*nights, *rest_sources], occupied, year, month, shifts
+    )
+    if not rows:
+        return []
+    return list(session.scalars(insert(ScheduleEntry).returning(ScheduleEntry), rows))
 
 
 def _folga_after_nd_violations(
@@ -349,6 +484,7 @@ def _folga_after_nd_violations(
     nurses: List[Nurse],
     year: int,
     month: int,
+    shifts: Mapping[str, ShiftMeta],
 ) -> List[str]:
     days_in_month = _days_in_month(year, month)
     by_nurse_day: Dict[Tuple[int, int], ScheduleEntry] = {
@@ -357,7 +493,7 @@ def _folga_after_nd_violations(
     nurse_names = {nurse.id: nurse.name for nurse in nurses}
     warnings: List[str] = []
     for entry in assignments:
-        shift_meta = SHIFT_LOOKUP.get(entry.shift_code)
+        shift_meta = shifts.get(entry.shift_code)
         if not shift_meta or shift_meta.shift_type != "N":
             continue
         check_day = entry.day + 2
@@ -372,261 +508,1064 @@ def _folga_after_nd_violations(
     return warnings
 
 
-def generate_schedule(session: Session, year: int, month: int, group: str | None = None):
-    refresh_shift_lookup(session)
-    config = get_or_create_month_config(session, year, month)
-    service_roles = {
-        service.code: service.role for service in session.scalars(select(Service))
-    }
-    nurse_query = select(Nurse)
-    role = _role_from_group(session, group)
-    if role:
-        categories = _categories_for_role(session, role)
-        if categories:
-            nurse_query = nurse_query.where(Nurse.category.in_(categories))
-        else:
-            nurse_query = nurse_query.where(Nurse.category == role)
-    nurses: List[Nurse] = sort_nurses_by_category(list(session.scalars(nurse_query)))
-    nurse_ids = [nurse.id for nurse in nurses]
-    service_codes = []
-    if role:
-        service_codes = list(
-            session.scalars(select(Service.code).where(Service.role == role))
+class SolveProgressCallback(cp_model.CpSolverSolutionCallback):
+    """Reports every improving solution found by CP-SAT."""
+
+    def __init__(
+        self,
+        unfilled_vars: List[cp_model.IntVar],
+        on_progress: Optional[Callable[[Dict[str, float]], None]] = None,
+    ):
+        super().__init__()
+        self._unfilled_vars = unfilled_vars
+        self._on_progress = on_progress
+        self.solutions = 0
+        self.best_objective: Optional[float] = None
+        self.last_improvement: Optional[float] = None
+        # Seconds spent before the current Solve when one callback spans several.
+        self.offset = 0.0
+
+    def on_solution_callback(self) -> None:
+        objective = self.ObjectiveValue()
+        if self.best_objective is not None and objective >= self.best_objective:
+            return
+        self.best_objective = objective
+        self.last_improvement = time.monotonic()
+        self.solutions += 1
+        if not self._on_progress:
+            return
+        self._on_progress(
+            {
+                "solution": self.solutions,
+                "objective": objective,
+                "best_bound": self.BestObjectiveBound(),
+                "unfilled": sum(self.Value(var) for var in self._unfilled_vars),
+                "elapsed_seconds": round(self.offset + self.WallTime(), 3),
+            }
         )
-    requirements_query = select(MonthlyRequirement).where(
-        MonthlyRequirement.year == year,
-        MonthlyRequirement.month == month,
-    )
-    if service_codes:
-        requirements_query = requirements_query.where(
-            MonthlyRequirement.service_code.in_(service_codes)
+
+
+def _watch_stop_request(
+    stop_event, finished: threading.Event, on_stop: Callable[[], None]
+) -> None:
+    while not finished.is_set():
+        if stop_event.wait(0.2):
+            on_stop()
+            return
+
+
+def _watch_stagnation(
+    callback: SolveProgressCallback,
+    finished: threading.Event,
+    window: float,
+    on_stop: Callable[[], None],
+) -> None:
+    # Only counts from the first solution, so a slow start is never cut short.
+    while not finished.wait(0.2):
+        last = callback.last_improvement
+        if last is not None and time.monotonic() - last >= window:
+            on_stop()
+            return
+
+
+@dataclass
+class NurseSnapshot:
+    id: int
+    name: str
+    category: str
+    services_permitted: List[str]
+    can_work_night: bool
+    max_noites_mes: Optional[int]
+    weekly_hours: int
+    hour_balance_minutes: int
+
+    @classmethod
+    def from_nurse(cls, nurse: Nurse) -> "NurseSnapshot":
+        return cls(
+            id=nurse.id,
+            name=nurse.name,
+            category=nurse.category,
+            services_permitted=list(nurse.services_permitted or []),
+            can_work_night=nurse.can_work_night,
+            max_noites_mes=nurse.max_noites_mes,
+            weekly_hours=nurse.weekly_hours,
+            hour_balance_minutes=nurse.hour_balance_minutes or 0,
         )
-    requirements_query = requirements_query.order_by(
-        MonthlyRequirement.day,
-        MonthlyRequirement.service_code,
-        MonthlyRequirement.shift_code,
+
+
+@dataclass
+class AdjustmentSnapshot:
+    feriados_trabalhados: int = 0
+    extra_minutes: int = 0
+    reduced_minutes: int = 0
+
+    @classmethod
+    def from_adjustment(cls, adjustment: NurseMonthAdjustment) -> "AdjustmentSnapshot":
+        return cls(
+            feriados_trabalhados=adjustment.feriados_trabalhados,
+            extra_minutes=adjustment.extra_minutes,
+            reduced_minutes=adjustment.reduced_minutes,
+        )
+
+
+@dataclass
+class SolveSettings:
+    penalty_weights: Dict[str, int]
+    pedidos_folga_hard: bool
+    prefer_folga_after_nd: bool
+    min_rest_hours: int
+    target_hours_week: int
+    max_hours_week_contratado: int
+
+    @classmethod
+    def from_config(cls, config: MonthConfig) -> "SolveSettings":
+        return cls(
+            penalty_weights=dict(config.penalty_weights),
+            pedidos_folga_hard=config.pedidos_folga_hard,
+            prefer_folga_after_nd=config.prefer_folga_after_nd,
+            min_rest_hours=config.min_rest_hours,
+            target_hours_week=config.target_hours_week,
+            max_hours_week_contratado=config.max_hours_week_contratado,
+        )
+
+
+@dataclass
+class Eligibility:
+    candidates: Dict[int, List[int]]
+    reason_counts: Dict[int, Dict[str, int]]
+    pedido_pairs: Set[Tuple[int, int]]
+
+
+@dataclass
+class EligibilityMatrix:
+    """Reason code per (nurse, day/shift column); code 0 means eligible."""
+
+    nurse_ids: List[int]
+    columns: Dict[Tuple[int, str], int]
+    reasons: np.ndarray
+    reason_labels: List[str]
+
+    def eligible_ids(self, day: int, shift_code: str) -> List[int]:
+        column = self.columns.get((day, shift_code))
+        if column is None:
+            return []
+        return [
+            self.nurse_ids[row] for row in np.flatnonzero(self.reasons[:, column] == 0)
+        ]
+
+    def reason_counts(self) -> np.ndarray:
+        """Count of each reason code per column, shaped (columns, reasons)."""
+        column_count = self.reasons.shape[1]
+        label_count = len(self.reason_labels)
+        offsets = np.arange(column_count) * label_count
+        flat = (self.reasons + offsets[None, :]).ravel()
+        return np.bincount(flat, minlength=column_count * label_count).reshape(
+            column_count, label_count
+        )
+
+
+@dataclass
+class SolveProblem:
+    """Plain-data snapshot of one month, safe to send to a worker process."""
+
+    year: int
+    month: int
+    role_hint: Optional[str]
+    nurses: List[NurseSnapshot]
+    slots: List[Slot]
+    candidates: Dict[int, List[int]]
+    pedido_pairs: Set[Tuple[int, int]]
+    constraint_map: Dict[Tuple[int, int], str]
+    adjustment_map: Dict[int, AdjustmentSnapshot]
+    locked: List[Tuple[int, int, str, str]]
+    settings: SolveSettings
+    service_roles: Dict[str, str]
+    shifts: ShiftCatalogue
+    average_bank: int
+    shift_targets: Dict[Tuple[str, str], int]
+    hints: Dict[int, int] = field(default_factory=dict)
+    # (nurse_id, day, shift_code) worked at the end of the previous month, day <= 0.
+    previous_tail: List[Tuple[int, int, str]] = field(default_factory=list)
+
+
+@dataclass
+class NurseCandidates:
+    """One nurse's (slot, variable) pairs in slot order, grouped per constraint family."""
+
+    pairs: List[Tuple[Slot, cp_model.IntVar]] = field(default_factory=list)
+    by_day: Dict[int, List[Tuple[Slot, cp_model.IntVar]]] = field(
+        default_factory=lambda: defaultdict(list)
     )
-    requirements: List[MonthlyRequirement] = list(session.scalars(requirements_query))
-    constraints_query = select(ConstraintEntry).where(
-        ConstraintEntry.year == year,
-        ConstraintEntry.month == month,
+    by_week: Dict[int, List[Tuple[Slot, cp_model.IntVar]]] = field(
+        default_factory=lambda: defaultdict(list)
     )
-    if nurse_ids:
-        constraints_query = constraints_query.where(
-            ConstraintEntry.nurse_id.in_(nurse_ids)
+    by_role_type: Dict[Tuple[str, str], List[Tuple[Slot, cp_model.IntVar]]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+
+    def add(
+        self, slot: Slot, var: cp_model.IntVar, role_type: Optional[Tuple[str, str]]
+    ) -> None:
+        pair = (slot, var)
+        self.pairs.append(pair)
+        self.by_day[slot.day].append(pair)
+        self.by_week[slot.week_id].append(pair)
+        if role_type:
+            self.by_role_type[role_type].append(pair)
+
+
+def _add_at_most_one(
+    model: cp_model.CpModel,
+    literals: List[cp_model.IntVar],
+    enforcement: List[cp_model.IntVar],
+) -> None:
+    # CP-SAT only takes enforcement literals on linear and boolean constraints.
+    if enforcement:
+        model.Add(cp_model.LinearExpr.Sum(literals) <= 1).OnlyEnforceIf(enforcement)
+    else:
+        model.AddAtMostOne(literals)
+
+
+def _add_conjunction(
+    model: cp_model.CpModel, target: cp_model.IntVar, literals: List
+) -> None:
+    """Constrain the boolean ``target`` to be true exactly when all literals are."""
+    for literal in literals:
+        model.AddImplication(target, literal)
+    model.AddBoolOr([literal.Not() for literal in literals] + [target])
+
+
+@dataclass
+class ScheduleModel:
+    model: cp_model.CpModel
+    slot_candidate_vars: Dict[int, List[Tuple[int, cp_model.IntVar]]]
+    slot_unfilled_vars: Dict[int, cp_model.IntVar]
+    slot_sizes: Dict[int, int] = field(default_factory=dict)
+    objective: Optional[cp_model.LinearExpr] = None
+    slots: Dict[int, Slot] = field(default_factory=dict)
+    # Enforcement literal per (rule, nurse_id, day) when built to explain infeasibility.
+    guards: Dict[Tuple[str, int, Optional[int]], cp_model.IntVar] = field(
+        default_factory=dict
+    )
+    # The objective split per OBJECTIVE_STAGES entry, in order, empty stages left out.
+    stage_objectives: List[Tuple[str, cp_model.LinearExpr]] = field(
+        default_factory=list
+    )
+
+
+@dataclass
+class PoolSolution:
+    objective: float
+    assigned: Dict[int, int]
+    unfilled: List[int]
+
+
+@dataclass
+class SolveOutcome:
+    status: int
+    assigned: Dict[int, int] = field(default_factory=dict)
+    unfilled: List[int] = field(default_factory=list)
+    objective: float = 0.0
+    best_bound: float = 0.0
+    response_stats: List[str] = field(default_factory=list)
+    # Distinct runner-up solutions seen during the search, best first.
+    alternatives: List[PoolSolution] = field(default_factory=list)
+    # (rule, nurse_id, day) guards that together make an infeasible month.
+    conflicts: List[Tuple[str, int, Optional[int]]] = field(default_factory=list)
+
+
+@dataclass
+class SolveProfiler:
+    """Wall time and model growth of each phase of a schedule generation.
+
+    ``lap`` closes the phase running since the previous lap; passing the model
+    also records how many variables and constraints that phase added.
+    """
+
+    phases: List[Dict[str, object]] = field(default_factory=list)
+    response_stats: List[str] = field(default_factory=list)
+    profile: Optional[Dict[str, object]] = None
+    slots: Optional[int] = None
+    started: float = field(default_factory=time.perf_counter)
+    _last: float = field(default=0.0, repr=False)
+    _model_size: Tuple[int, int, int] = field(default=(0, 0, 0), repr=False)
+
+    def __post_init__(self) -> None:
+        self._last = self.started
+
+    def lap(self, phase: str, model: Optional[cp_model.CpModel] = None) -> None:
+        now = time.perf_counter()
+        record: Dict[str, object] = {
+            "phase": phase,
+            "seconds": round(now - self._last, 4),
+        }
+        if model is not None:
+            proto = model.Proto()
+            model_id, variables, constraints = self._model_size
+            if model_id != id(model):
+                variables, constraints = 0, 0
+            record["variables"] = len(proto.variables) - variables
+            record["constraints"] = len(proto.constraints) - constraints
+            self._model_size = (id(model), len(proto.variables), len(proto.constraints))
+        self.phases.append(record)
+        self._last = now
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "total_seconds": round(self._last - self.started, 4),
+            "phases": list(self.phases),
+            "response_stats": list(self.response_stats),
+            "profile": self.profile,
+            "slots": self.slots,
+        }
+
+    def log(self, year: int, month: int, group: Optional[str]) -> None:
+        logger.info(
+            json.dumps(
+                {
+                    "event": "schedule_profile",
+                    "year": year,
+                    "month": month,
+                    "group": group,
+                    **self.summary(),
+                }
+            )
         )
-    constraints: List[ConstraintEntry] = list(session.scalars(constraints_query))
-    constraint_map: Dict[Tuple[int, int], str] = {
-        (item.nurse_id, item.day): item.code for item in constraints
+
+
+def available_cpu_count() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+@dataclass(frozen=True)
+class SolverProfile:
+    name: str
+    time_limit_seconds: float
+    num_workers: int
+    # Stop once the objective is this close to the bound; 0 searches to optimality.
+    relative_gap: float = 0.0
+    # Stop after this long without a better solution; 0 keeps the whole budget.
+    no_improvement_seconds: float = 0.0
+
+
+def _default_solver_profile() -> SolverProfile:
+    return SolverProfile("default", SOLVER_TIME_LIMIT_SECONDS, available_cpu_count())
+
+
+def solver_profile(config: MonthConfig) -> SolverProfile:
+    """The month's solver budget; "custom" is balanced with solver_settings on top."""
+    name = config.solver_profile or DEFAULT_SOLVER_PROFILE
+    if name not in SOLVER_PROFILES and name != CUSTOM_SOLVER_PROFILE:
+        name = DEFAULT_SOLVER_PROFILE
+    values = {
+        "num_workers": available_cpu_count(),
+        **SOLVER_PROFILES.get(name, SOLVER_PROFILES[DEFAULT_SOLVER_PROFILE]),
     }
+    if name == CUSTOM_SOLVER_PROFILE:
+        settings = config.solver_settings or {}
+        values.update(
+            {key: settings[key] for key in SOLVER_PROFILE_FIELDS if key in settings}
+        )
+    return SolverProfile(
+        name=name,
+        time_limit_seconds=max(
+            MIN_SOLVER_TIME_LIMIT_SECONDS, float(values["time_limit_seconds"])
+        ),
+        num_workers=max(1, int(values["num_workers"])),
+        relative_gap=max(0.0, float(values["relative_gap"])),
+        no_improvement_seconds=max(0.0, float(values["no_improvement_seconds"])),
+    )
 
-    adjustments_query = select(NurseMonthAdjustment).where(
-        NurseMonthAdjustment.year == year,
-        NurseMonthAdjustment.month == month,
+
+def invalid_solver_settings(settings: Dict[str, float]) -> List[str]:
+    """Keys of ``solver_settings`` whose value is not a usable number for them."""
+    checks = {
+        "time_limit_seconds": lambda value: value > 0,
+        "num_workers": lambda value: value >= 1 and float(value).is_integer(),
+        "relative_gap": lambda value: 0 <= value < 1,
+        "no_improvement_seconds": lambda value: value >= 0,
+    }
+    invalid = []
+    for key, check in checks.items():
+        if key not in settings:
+            continue
+        value = settings[key]
+        if (
+            isinstance(value, bool)
+            or not isinstance(value, (int, float))
+            or not math.isfinite(value)
+            or not check(value)
+        ):
+            invalid.append(key)
+    return invalid
+
+
+def solver_time_budget(
+    session: Session, year: int, month: int, months: int = 1
+) -> float:
+    """Seconds the profiles of ``months`` consecutive months allow the solver."""
+    return sum(
+        solver_profile(
+            _month_config_snapshot(session, *_add_months(year, month, offset))
+        ).time_limit_seconds
+        for offset in range(months)
     )
-    if nurse_ids:
-        adjustments_query = adjustments_query.where(
-            NurseMonthAdjustment.nurse_id.in_(nurse_ids)
+
+
+def _role_hint_from_group(group: str | None) -> str | None:
+    normalized_group = (group or "").strip().lower()
+    if normalized_group in {"ao", "assistente_operacional"}:
+        return "ASSISTENTE_OPERACIONAL"
+    if normalized_group in {"enf", "enfermagem"}:
+        return "ENFERMEIRO"
+    return None
+
+
+def _slot_role(
+    slot: Slot, role_hint: str | None, service_roles: Dict[str, str]
+) -> str:
+    return role_hint or service_roles.get(slot.service_code) or "ENFERMEIRO"
+
+
+def _shift_balance_targets(
+    nurses: List[NurseSnapshot],
+    slots: List[Slot],
+    role_hint: str | None,
+    service_roles: Dict[str, str],
+    shifts: Mapping[str, ShiftMeta],
+) -> Dict[Tuple[str, str], int]:
+    totals_by_role: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for slot in slots:
+        shift_meta = shifts.get(slot.shift_code)
+        if not shift_meta or not shift_meta.shift_type:
+            continue
+        slot_role = _slot_role(slot, role_hint, service_roles)
+        totals_by_role[slot_role][shift_meta.shift_type] += 1
+
+    targets: Dict[Tuple[str, str], int] = {}
+    for slot_role, total_by_type in totals_by_role.items():
+        nurse_count = sum(
+            1
+            for nurse in nurses
+            if (slot_role == "ASSISTENTE_OPERACIONAL")
+            == (nurse.category == "ASSISTENTE_OPERACIONAL")
         )
-    adjustments: List[NurseMonthAdjustment] = list(session.scalars(adjustments_query))
-    adjustment_map: Dict[int, NurseMonthAdjustment] = {
-        item.nurse_id: item for item in adjustments
+        if not nurse_count:
+            continue
+        for shift_type in ("M", "T", "N"):
+            total = total_by_type.get(shift_type, 0)
+            if total == 0:
+                continue
+            targets[(slot_role, shift_type)] = int(round(total / nurse_count))
+    return targets
+
+
+def _build_slots(
+    requirements: List[MonthlyRequirement],
+    covered_counts: Dict[Tuple[int, str, str], int],
+    year: int,
+    month: int,
+    shifts: Mapping[str, ShiftMeta],
+) -> List[Slot]:
+    slots: List[Slot] = []
+    slot_idx = 0
+    sap_long_days = {
+        req.day
+        for req in requirements
+        if req.service_code == "TLs" and req.required_count > 0
     }
+    for req in requirements:
+        shift_meta = shifts.get(req.shift_code)
+        if not shift_meta:
+            continue
+        if req.service_code in {"Ts", "Ls"} and req.day in sap_long_days:
+            continue
+        remaining = req.required_count - covered_counts.get(
+            (req.day, req.service_code, req.shift_code), 0
+        )
+        if remaining <= 0:
+            continue
+        for _ in range(remaining):
+            slot = Slot(
+                index=slot_idx,
+                day=req.day,
+                service_code=req.service_code,
+                shift_code=req.shift_code,
+                minutes=shift_meta.minutes,
+                week_id=_week_id(year, month, req.day),
+            )
+            slots.append(slot)
+            slot_idx += 1
+    return slots
 
-    locked_query = select(ScheduleEntry).where(
+
+def _previous_month_day(year: int, month: int, day: int) -> date:
+    """Same weekday four (or five) weeks earlier, always inside the previous month."""
+    current = date(year, month, day)
+    candidate = current - timedelta(weeks=4)
+    if candidate.month == month:
+        candidate = current - timedelta(weeks=5)
+    return candidate
+
+
+def _load_hint_entries(
+    session: Session, year: int, month: int, nurse_ids: List[int]
+) -> List[Tuple[int, int, str, str]]:
+    query = select(ScheduleEntry).where(
         ScheduleEntry.year == year,
         ScheduleEntry.month == month,
-        ScheduleEntry.locked.is_(True),
+        ScheduleEntry.locked.is_(False),
+        ScheduleEntry.service_code != "REST",
     )
     if nurse_ids:
-        locked_query = locked_query.where(ScheduleEntry.nurse_id.in_(nurse_ids))
-    locked_entries: List[ScheduleEntry] = list(session.scalars(locked_query))
-    locked_violations: List[str] = []
-    if locked_entries:
-        grouped_locked: Dict[Tuple[int, int], List[ScheduleEntry]] = defaultdict(list)
-        for entry in locked_entries:
-            grouped_locked[(entry.nurse_id, entry.day)].append(entry)
-        invalid_locked_keys: set[Tuple[int, int]] = set()
-        for (nurse_id, day), entries in grouped_locked.items():
-            if len(entries) < 2:
-                continue
-            nurse = next((item for item in nurses if item.id == nurse_id), None)
-            if not nurse:
-                continue
-            codes = [item.shift_code for item in entries]
-            metas = [SHIFT_LOOKUP.get(code) for code in codes]
-            invalid = False
-            for idx, first_meta in enumerate(metas):
-                for jdx in range(idx + 1, len(metas)):
-                    second_meta = metas[jdx]
-                    if not first_meta or not second_meta:
-                        invalid = True
-                        continue
-                    if first_meta.shift_type == second_meta.shift_type:
-                        invalid = True
-                        continue
-                    if _shifts_overlap(first_meta, second_meta):
-                        invalid = True
-                        continue
-                    if not _allows_double_shift(
-                        nurse, first_meta.shift_type, second_meta.shift_type
-                    ):
-                        invalid = True
-            if invalid:
-                invalid_locked_keys.add((nurse_id, day))
-                locked_violations.append(
-                    f"Dia {day} {nurse.name}: turnos bloqueados removidos"
-                )
-        if invalid_locked_keys:
-            for nurse_id, day in invalid_locked_keys:
-                session.execute(
-                    delete(ScheduleEntry).where(
-                        ScheduleEntry.year == year,
-                        ScheduleEntry.month == month,
-                        ScheduleEntry.day == day,
-                        ScheduleEntry.nurse_id == nurse_id,
-                        ScheduleEntry.locked.is_(True),
-                    )
-                )
-            locked_entries = [
-                entry
-                for entry in locked_entries
-                if (entry.nurse_id, entry.day) not in invalid_locked_keys
-            ]
+        query = query.where(ScheduleEntry.nurse_id.in_(nurse_ids))
+    return [
+        (entry.nurse_id, entry.day, entry.service_code, entry.shift_code)
+        for entry in session.scalars(query)
+    ]
 
-    # Remove previous auto assignments (including rest placeholders).
-    delete_query = delete(ScheduleEntry).where(
-        ScheduleEntry.year == year,
-        ScheduleEntry.month == month,
-        ScheduleEntry.locked.is_(False),
+
+def _previous_month_hint_entries(
+    session: Session, year: int, month: int, nurse_ids: List[int]
+) -> List[Tuple[int, int, str, str]]:
+    previous = date(year, month, 1) - timedelta(days=1)
+    query = select(ScheduleEntry).where(
+        ScheduleEntry.year == previous.year,
+        ScheduleEntry.month == previous.month,
+        ScheduleEntry.service_code != "REST",
     )
     if nurse_ids:
-        delete_query = delete_query.where(ScheduleEntry.nurse_id.in_(nurse_ids))
-    session.execute(delete_query)
+        query = query.where(ScheduleEntry.nurse_id.in_(nurse_ids))
+    by_day: Dict[int, List[ScheduleEntry]] = defaultdict(list)
+    for entry in session.scalars(query):
+        by_day[entry.day].append(entry)
+    hinted: List[Tuple[int, int, str, str]] = []
+    for day in range(1, _days_in_month(year, month) + 1):
+        source_day = _previous_month_day(year, month, day).day
+        for entry in by_day.get(source_day, []):
+            hinted.append((entry.nurse_id, day, entry.service_code, entry.shift_code))
+    return hinted
+
+
+def _previous_month_tail(
+    session: Session, year: int, month: int, nurse_ids: List[int]
+) -> List[Tuple[int, int, str]]:
+    """Shifts worked in the last days of the previous month, counted back from day 0.
+
+    Only as many days as the consecutive-work window can reach are read.
+    """
+    last_day = date(year, month, 1) - timedelta(days=1)
+    query = select(
+        ScheduleEntry.nurse_id, ScheduleEntry.day, ScheduleEntry.shift_code
+    ).where(
+        ScheduleEntry.year == last_day.year,
+        ScheduleEntry.month == last_day.month,
+        ScheduleEntry.day > last_day.day - MAX_CONSECUTIVE_WORK_DAYS,
+        ScheduleEntry.service_code != "REST",
+    )
+    if nurse_ids:
+        query = query.where(ScheduleEntry.nurse_id.in_(nurse_ids))
+    return [
+        (nurse_id, day - last_day.day, shift_code)
+        for nurse_id, day, shift_code in session.execute(query)
+    ]
+
+
+def _drop_previous_tail_conflicts(
+    eligibility: Eligibility,
+    slots: List[Slot],
+    previous_tail: List[Tuple[int, int, str]],
+    min_rest_minutes: int,
+    shifts: Mapping[str, ShiftMeta],
+) -> None:
+    """Remove day-1 candidates whose last shift of the previous month breaks rest rules."""
+    last_codes: Dict[int, List[str]] = defaultdict(list)
+    for nurse_id, day, shift_code in previous_tail:
+        if day == 0:
+            last_codes[nurse_id].append(shift_code)
+    if not last_codes:
+        return
+    for slot in slots:
+        if slot.day != 1:
+            continue
+        kept = []
+        for candidate_id in eligibility.candidates.get(slot.index, []):
+            if _fixed_neighbour_conflict(
+                slot, last_codes.get(candidate_id, []), [], min_rest_minutes, shifts
+            ):
+                eligibility.reason_counts[slot.index]["Descanso mínimo"] += 1
+                continue
+            kept.append(candidate_id)
+        eligibility.candidates[slot.index] = kept
+
+
+def analyse_capacity(
+    nurses: List[NurseSnapshot],
+    slots: List[Slot],
+    eligibility: Eligibility,
+    locked: List[Tuple[int, int, str, str]],
+    previous_tail: List[Tuple[int, int, str]],
+    settings: SolveSettings,
+    year: int,
+    month: int,
+    shifts: Mapping[str, ShiftMeta],
+) -> Tuple[List[Dict[str, object]], Dict[int, str]]:
+    """Eligible supply against demand per (day, shift type, service).
+
+    Candidates whose night cap or weekly hours are already used up by locked
+    entries are dropped from ``eligibility``. Copies of a requirement beyond the
+    nurses eligible for it can never be filled, so their candidates are cleared
+    too; they come back with the reason to report. Budgets that locked entries
+    already exceed are left to the model, which reports the conflict.
+    """
+    nurse_rows = {nurse.id: row for row, nurse in enumerate(nurses)}
+    # Column-major, since it is filled and read one slot at a time.
+    eligible = np.zeros((len(nurses), len(slots)), dtype=bool, order="F")
+    # Slots of one (day, shift) column share their candidate list.
+    candidate_rows: Dict[Tuple[int, ...], np.ndarray] = {}
+    for column, slot in enumerate(slots):
+        key = tuple(eligibility.candidates.get(slot.index, ()))
+        if key not in candidate_rows:
+            candidate_rows[key] = np.array(
+                [nurse_rows[nurse_id] for nurse_id in key], dtype=np.int64
+            )
+        eligible[candidate_rows[key], column] = True
+
+    shift_types = [
+        shifts[slot.shift_code].shift_type if slot.shift_code in shifts else ""
+        for slot in slots
+    ]
+    night_slots = np.array([kind == "N" for kind in shift_types], dtype=bool)
+    weeks = sorted({slot.week_id for slot in slots})
+    week_positions = {week_id: position for position, week_id in enumerate(weeks)}
+    # Hours budgets only depend on the slot's week and length.
+    slot_keys = [(week_positions[slot.week_id], slot.minutes) for slot in slots]
+    budgets = sorted(set(slot_keys))
+    budget_positions = {budget: position for position, budget in enumerate(budgets)}
+    slot_budgets = np.array(
+        [budget_positions[key] for key in slot_keys], dtype=np.int64
+    )
 
+    unlimited = np.iinfo(np.int64).max
+    nights_left = np.array(
+        [nurse.max_noites_mes or unlimited for nurse in nurses], dtype=np.int64
+    )
+    minutes_left = np.full((len(nurses), len(weeks)), unlimited, dtype=np.int64)
+    for row, nurse in enumerate(nurses):
+        if nurse.category == "CONTRATADO":
+            weekly_target = nurse.weekly_hours or settings.target_hours_week
+            minutes_left[row, :] = (
+                max(settings.max_hours_week_contratado, weekly_target) * 60
+            )
     locked_counts: Dict[Tuple[int, str, str], int] = defaultdict(int)
+    for _nurse_id, day, service_code, shift_code in locked:
+        shift_meta = shifts.get(shift_code)
+        if shift_meta:
+            locked_counts[(day, shift_meta.shift_type, service_code)] += 1
+    fixed_work = [(nurse_id, day, code) for nurse_id, day, _, code in locked]
+    for nurse_id, day, shift_code in fixed_work + list(previous_tail):
+        row = nurse_rows.get(nurse_id)
+        shift_meta = shifts.get(shift_code)
+        if row is None or not shift_meta:
+            continue
+        if day >= 1 and shift_meta.shift_type == "N":
+            nights_left[row] -= 1
+        position = week_positions.get(_week_id(year, month, day))
+        if position is not None and minutes_left[row, position] != unlimited:
+            minutes_left[row, position] -= shift_meta.minutes
+
+    budget_left = minutes_left[:, [week for week, _ in budgets]]
+    budget_minutes = np.array([minutes for _, minutes in budgets], dtype=np.int64)
+    out_of_hours = (budget_left >= 0) & (budget_left < budget_minutes[None, :])
+    out_of_nights = nights_left == 0
+    # Only the few nurses with a spent budget need their rows masked.
+    spent = np.flatnonzero(out_of_nights | out_of_hours.any(axis=1))
+    dropped_nights = np.zeros(len(slots), dtype=np.int64)
+    dropped_hours = np.zeros(len(slots), dtype=np.int64)
+    if spent.size:
+        spent_eligible = eligible[spent]
+        no_nights = out_of_nights[spent][:, None] & night_slots[None, :]
+        no_hours = out_of_hours[spent][:, slot_budgets]
+        dropped_nights = (spent_eligible & no_nights).sum(axis=0)
+        dropped_hours = (spent_eligible & no_hours & ~no_nights).sum(axis=0)
+        eligible[spent] = spent_eligible & ~(no_nights | no_hours)
+    nurse_ids = np.array([nurse.id for nurse in nurses], dtype=np.int64)
+    for column in np.flatnonzero(dropped_nights + dropped_hours):
+        slot = slots[column]
+        reasons = eligibility.reason_counts[slot.index]
+        if dropped_nights[column]:
+            reasons["Limite de noites"] += int(dropped_nights[column])
+        if dropped_hours[column]:
+            reasons["Limite de horas semanais"] += int(dropped_hours[column])
+        eligibility.candidates[slot.index] = nurse_ids[eligible[:, column]].tolist()
+
+    groups: Dict[Tuple[int, str, str], List[int]] = defaultdict(list)
+    requirements: Dict[Tuple[int, str, str], List[int]] = defaultdict(list)
+    for column, slot in enumerate(slots):
+        groups[(slot.day, shift_types[column], slot.service_code)].append(column)
+        requirements[(slot.day, slot.service_code, slot.shift_code)].append(column)
+
+    unfillable: Dict[int, str] = {}
+    for columns in requirements.values():
+        # Copies of one requirement overlap, so each nurse fills at most one of them.
+        supply = int(eligible[:, columns].any(axis=1).sum())
+        if not supply:
+            # Already reported as having no eligible nurse at all.
+            continue
+        reason = (
+            f"Capacidade insuficiente ({supply} elegíveis para {len(columns)} vagas)"
+        )
+        for column in columns[supply:]:
+            unfillable[slots[column].index] = reason
+            eligibility.candidates[slots[column].index] = []
+
+    rows: List[Dict[str, object]] = []
+    for key in sorted(set(groups) | set(locked_counts)):
+        day, shift_type, service_code = key
+        columns = groups.get(key, [])
+        supply = int(eligible[:, columns].any(axis=1).sum()) if columns else 0
+        rows.append(
+            {
+                "day": day,
+                "shift_type": shift_type,
+                "service_code": service_code,
+                "demand": len(columns),
+                "locked": locked_counts.get(key, 0),
+                "supply": supply,
+                "shortfall": max(0, len(columns) - supply),
+            }
+        )
+    return rows, unfillable
+
+
+def _hints_for_slots(
+    hint_entries: List[Tuple[int, int, str, str]],
+    slots: List[Slot],
+    candidates: Dict[int, List[int]],
+) -> Dict[int, int]:
+    pending: Dict[Tuple[int, str, str], List[int]] = defaultdict(list)
+    for nurse_id, day, service_code, shift_code in hint_entries:
+        pending[(day, service_code, shift_code)].append(nurse_id)
+    hints: Dict[int, int] = {}
+    used: Set[Tuple[int, int]] = set()
+    for slot in slots:
+        nurse_ids = pending.get((slot.day, slot.service_code, slot.shift_code))
+        if not nurse_ids:
+            continue
+        eligible = set(candidates.get(slot.index, []))
+        for nurse_id in nurse_ids:
+            if nurse_id in eligible and (nurse_id, slot.day) not in used:
+                hints[slot.index] = nurse_id
+                used.add((nurse_id, slot.day))
+                nurse_ids.remove(nurse_id)
+                break
+    return hints
+
+
+def _eligibility_matrix(
+    nurses: List[NurseSnapshot],
+    columns: List[Tuple[int, str]],
+    constraint_map: Dict[Tuple[int, int], str],
+    locked_days: Dict[Tuple[int, int], bool],
+    shifts: Mapping[str, ShiftMeta],
+) -> EligibilityMatrix:
+    """Ineligibility reason of every nurse for every (day, shift) column.
+
+    The constraint rules only depend on category, night permission, constraint
+    code and shift, so they are evaluated once per distinct combination and
+    gathered into the matrix. The per-nurse checks are applied on top and win
+    in this order: coordinator, locked cell, service not permitted.
+    """
+    columns = list(dict.fromkeys(columns))
+    labels: List[str] = [""]
+    label_codes: Dict[str, int] = {"": 0}
+
+    def code_for(label: str) -> int:
+        if label not in label_codes:
+            label_codes[label] = len(labels)
+            labels.append(label)
+        return label_codes[label]
+
+    nurse_rows = {nurse.id: row for row, nurse in enumerate(nurses)}
+    days = sorted({day for day, _ in columns})
+    day_positions = {day: position for position, day in enumerate(days)}
+    shift_codes = sorted({shift_code for _, shift_code in columns})
+    shift_positions = {code: position for position, code in enumerate(shift_codes)}
+    categories = sorted({nurse.category for nurse in nurses})
+    category_positions = {
+        category: position for position, category in enumerate(categories)
+    }
+    constraint_codes = [""] + sorted(
+        {
+            code
+            for (nurse_id, day), code in constraint_map.items()
+            if code and nurse_id in nurse_rows and day in day_positions
+        }
+    )
+    constraint_positions = {
+        code: position for position, code in enumerate(constraint_codes)
+    }
+
+    rule_table = np.zeros(
+        (len(categories), len(constraint_codes), len(shift_codes), 2), dtype=np.int32
+    )
+    for cat_pos, category in enumerate(categories):
+        for code_pos, constraint in enumerate(constraint_codes):
+            for shift_pos, shift_code in enumerate(shift_codes):
+                for night in (0, 1):
+                    rule_table[cat_pos, code_pos, shift_pos, night] = code_for(
+                        _constraint_reason(
+                            category, bool(night), constraint, shift_code, shifts
+                        )
+                    )
+
+    nurse_count = len(nurses)
+    constraint_grid = np.zeros((nurse_count, len(days)), dtype=np.int32)
+    for (nurse_id, day), code in constraint_map.items():
+        row = nurse_rows.get(nurse_id)
+        position = day_positions.get(day)
+        if row is not None and position is not None and code:
+            constraint_grid[row, position] = constraint_positions[code]
+    locked_grid = np.zeros((nurse_count, len(days)), dtype=bool)
+    for (nurse_id, day), locked in locked_days.items():
+        row = nurse_rows.get(nurse_id)
+        position = day_positions.get(day)
+        if locked and row is not None and position is not None:
+            locked_grid[row, position] = True
+    permitted = np.ones((nurse_count, len(shift_codes)), dtype=bool)
+    for row, nurse in enumerate(nurses):
+        if nurse.services_permitted:
+            allowed = set(nurse.services_permitted)
+            permitted[row] = [code in allowed for code in shift_codes]
+
+    column_days = np.array([day_positions[day] for day, _ in columns], dtype=np.int64)
+    column_shifts = np.array(
+        [shift_positions[code] for _, code in columns], dtype=np.int64
+    )
+    nurse_categories = np.array(
+        [category_positions[nurse.category] for nurse in nurses], dtype=np.int64
+    )
+    nurse_nights = np.array(
+        [1 if nurse.can_work_night else 0 for nurse in nurses], dtype=np.int64
+    )
+    coordinators = np.array(
+        [nurse.category == "COORDENADOR" for nurse in nurses], dtype=bool
+    )
+
+    reasons = rule_table[
+        nurse_categories[:, None],
+        constraint_grid[:, column_days],
+        column_shifts[None, :],
+        nurse_nights[:, None],
+    ]
+    reasons = np.where(
+        permitted[:, column_shifts], reasons, code_for("Serviço/turno não permitido")
+    )
+    reasons = np.where(
+        locked_grid[:, column_days], code_for("Célula bloqueada/lock"), reasons
+    )
+    reasons = np.where(
+        coordinators[:, None], code_for("Coordenador fora do solver"), reasons
+    )
+    return EligibilityMatrix(
+        nurse_ids=[nurse.id for nurse in nurses],
+        columns={column: position for position, column in enumerate(columns)},
+        reasons=reasons,
+        reason_labels=labels,
+    )
+
+
+def _compute_eligibility(
+    nurses: List[NurseSnapshot],
+    slots: List[Slot],
+    constraint_map: Dict[Tuple[int, int], str],
+    locked_days: Dict[Tuple[int, int], bool],
+    pedidos_hard: bool,
+    shifts: Mapping[str, ShiftMeta],
+) -> Eligibility:
+    matrix = _eligibility_matrix(
+        nurses,
+        [(slot.day, slot.shift_code) for slot in slots],
+        constraint_map,
+        locked_days,
+        shifts,
+    )
+    nurse_ids = np.array(matrix.nurse_ids, dtype=np.int64)
+    eligible = matrix.reasons == 0
+    column_candidates = [
+        nurse_ids[eligible[:, column]].tolist() for column in range(eligible.shape[1])
+    ]
+    column_reasons = [
+        {
+            matrix.reason_labels[code]: int(count)
+            for code, count in enumerate(counts)
+            if code and count
+        }
+        for counts in matrix.reason_counts()
+    ]
+    candidates: Dict[int, List[int]] = {}
+    reason_counts: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for slot in slots:
+        column = matrix.columns[(slot.day, slot.shift_code)]
+        candidates[slot.index] = list(column_candidates[column])
+        if column_reasons[column]:
+            reason_counts[slot.index].update(column_reasons[column])
+    return Eligibility(candidates, reason_counts, set())
+
+
+def _build_model(
+    problem: SolveProblem,
+    profiler: Optional[SolveProfiler] = None,
+    explain: bool = False,
+) -> ScheduleModel:
+    """CP-SAT model of one month.
+
+    With ``explain`` every hard rule is enforced only under a guard literal per
+    (rule, nurse, day), so an infeasible month can name the rules in conflict.
+    """
+    profiler = profiler or SolveProfiler()
+    year = problem.year
+    month = problem.month
+    nurses = problem.nurses
+    slots = problem.slots
+    config = problem.settings
+    constraint_map = problem.constraint_map
+    adjustment_map = problem.adjustment_map
+    shifts = problem.shifts
+    days = _days_in_month(year, month)
+    nurses_by_id = {nurse.id: nurse for nurse in nurses}
+
     locked_days: Dict[Tuple[int, int], bool] = {}
     locked_shift_map: Dict[Tuple[int, int], str] = {}
     locked_week_minutes: Dict[Tuple[int, int], int] = defaultdict(int)
     locked_month_minutes: Dict[int, int] = defaultdict(int)
     locked_type_counts: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
-    days = _days_in_month(year, month)
-
-    for entry in locked_entries:
-        locked_counts[(entry.day, entry.service_code, entry.shift_code)] += 1
-        locked_days[(entry.nurse_id, entry.day)] = True
-        locked_shift_map[(entry.nurse_id, entry.day)] = entry.shift_code
-        shift_meta = SHIFT_LOOKUP.get(entry.shift_code)
+    locked_night_count: Dict[int, int] = defaultdict(int)
+    for nurse_id, day, _service_code, shift_code in problem.locked:
+        locked_days[(nurse_id, day)] = True
+        locked_shift_map[(nurse_id, day)] = shift_code
+        shift_meta = shifts.get(shift_code)
         minutes = shift_meta.minutes if shift_meta else 0
-        week_id = _week_id(year, month, entry.day)
-        locked_week_minutes[(entry.nurse_id, week_id)] += minutes
-        locked_month_minutes[entry.nurse_id] += minutes
+        week_id = _week_id(year, month, day)
+        locked_week_minutes[(nurse_id, week_id)] += minutes
+        locked_month_minutes[nurse_id] += minutes
         if shift_meta and shift_meta.shift_type:
-            locked_type_counts[entry.nurse_id][shift_meta.shift_type] += 1
+            locked_type_counts[nurse_id][shift_meta.shift_type] += 1
+        if shift_meta and shift_meta.shift_type == "N":
+            locked_night_count[nurse_id] += 1
+    # The previous month's tail only counts towards windows that cross the 1st.
+    tail_days: Dict[int, Set[int]] = defaultdict(set)
+    for nurse_id, day, shift_code in problem.previous_tail:
+        tail_days[nurse_id].add(day)
+        shift_meta = shifts.get(shift_code)
+        if shift_meta:
+            locked_week_minutes[(nurse_id, _week_id(year, month, day))] += (
+                shift_meta.minutes
+            )
 
-    slots: List[Slot] = []
     slots_by_day: Dict[int, List[Slot]] = defaultdict(list)
-    slot_idx = 0
-    sap_long_days = {
-        req.day
-        for req in requirements
-        if req.service_code == "TLs" and req.required_count > 0
-    }
-    for req in requirements:
-        shift_meta = SHIFT_LOOKUP.get(req.shift_code)
-        if not shift_meta:
-            continue
-        if req.service_code in {"Ts", "Ls"} and req.day in sap_long_days:
-            continue
-        remaining = req.required_count - locked_counts[
-            (req.day, req.service_code, req.shift_code)
-        ]
-        if remaining <= 0:
-            continue
-        for _ in range(remaining):
-            slot = Slot(
-                index=slot_idx,
-                day=req.day,
-                service_code=req.service_code,
-                shift_code=req.shift_code,
-                minutes=shift_meta.minutes,
-                week_id=_week_id(year, month, req.day),
-            )
-            slots.append(slot)
-            slots_by_day[req.day].append(slot)
-            slot_idx += 1
+    for slot in slots:
+        slots_by_day[slot.day].append(slot)
 
     slot_candidate_vars: Dict[int, List[Tuple[int, cp_model.IntVar]]] = defaultdict(list)
     candidate_lookup: Dict[Tuple[int, int], cp_model.IntVar] = {}
     slot_candidate_meta: Dict[Tuple[int, int], Dict[str, int]] = {}
     slot_unfilled_vars: Dict[int, cp_model.IntVar] = {}
-    slot_reason_counts: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
-    unfilled_report: List[Dict[str, str]] = []
+    slot_sizes: Dict[int, int] = {}
 
     model = cp_model.CpModel()
+    guards: Dict[Tuple[str, int, Optional[int]], cp_model.IntVar] = {}
+
+    def guard(rule: str, nurse_id: int, day: Optional[int] = None):
+        if not explain:
+            return []
+        key = (rule, nurse_id, day)
+        if key not in guards:
+            guards[key] = model.NewBoolVar(f"guard_{rule}_{nurse_id}_{day}")
+        return [guards[key]]
+
     pedido_penalty_vars: List[cp_model.IntVar] = []
     objective_terms: List[cp_model.LinearExpr] = []
+    stage_terms: Dict[str, List[cp_model.LinearExpr]] = defaultdict(list)
+
+    def penalise(stage: str, term: cp_model.LinearExpr) -> None:
+        objective_terms.append(term)
+        stage_terms[stage].append(term)
+
+    # Every variable gets a hint derived from the slot hints, so the hint is a
+    # whole solution that _run_search can keep before CP-SAT finds its own.
+    hinted: Dict[int, int] = {}
+
+    def hint(var: cp_model.IntVar, value: int) -> None:
+        model.AddHint(var, value)
+        hinted[var.Index()] = value
+
+    def hinted_sum(pairs: List[Tuple[int, cp_model.IntVar]]) -> int:
+        return sum(weight * hinted[var.Index()] for weight, var in pairs)
+
+    def hint_distance(diff: cp_model.IntVar, value: int, target: int) -> None:
+        upper = diff.Proto().domain[-1]
+        hint(diff, min(abs(value - target), upper))
 
     days_range = range(1, days + 1)
+    candidate_index: Dict[int, NurseCandidates] = {
+        nurse.id: NurseCandidates() for nurse in nurses
+    }
+    # Without a previous run to start from, the search starts from a constructed schedule.
+    hints = problem.hints or construct_schedule(problem)
 
     # Build decision variables for each slot/nurse pair.
     for slot in slots:
         slot_candidates = []
-        for nurse in nurses:
-            constraint = constraint_map.get((nurse.id, slot.day), "")
-            eligible, reason, pedido_flag = _static_eligibility(
-                nurse,
-                slot,
-                constraint,
-                locked_days,
-                config.pedidos_folga_hard,
+        shift_meta = shifts.get(slot.shift_code)
+        role_type = None
+        if shift_meta and shift_meta.shift_type:
+            role_type = (
+                _slot_role(slot, problem.role_hint, problem.service_roles),
+                shift_meta.shift_type,
             )
-            if not eligible:
-                if reason:
-                    slot_reason_counts[slot.index][reason] += 1
-                continue
+        for nurse_id in problem.candidates.get(slot.index, []):
+            nurse = nurses_by_id[nurse_id]
             var = model.NewBoolVar(f"x_{slot.index}_{nurse.id}")
             slot_candidates.append((nurse.id, var))
             candidate_lookup[(slot.index, nurse.id)] = var
+            candidate_index[nurse.id].add(slot, var, role_type)
             slot_candidate_meta[(slot.index, nurse.id)] = {
                 "category_penalty": 0 if nurse.category == "RV_TEMPO_PARCIAL" else 1,
             }
-            if pedido_flag:
+            if (slot.index, nurse.id) in problem.pedido_pairs:
                 pedido_penalty_vars.append(var)
 
         if not slot_candidates:
-            unfilled_report.append(
-                {
-                    "day": slot.day,
-                    "service_code": slot.service_code,
-                    "shift_code": slot.shift_code,
-                    "reason": "Sem enfermeiros elegíveis (restrições hard)",
-                }
-            )
             continue
 
-        assignment_sum = sum(var for _, var in slot_candidates)
-        unfilled_var = model.NewBoolVar(f"slot_{slot.index}_unfilled")
+        assignment_sum = cp_model.LinearExpr.Sum([var for _, var in slot_candidates])
+        if slot.count == 1:
+            unfilled_var = model.NewBoolVar(f"slot_{slot.index}_unfilled")
+        else:
+            unfilled_var = model.NewIntVar(
+                0, slot.count, f"slot_{slot.index}_shortfall"
+            )
+            slot_sizes[slot.index] = slot.count
         slot_unfilled_vars[slot.index] = unfilled_var
-        model.Add(assignment_sum + unfilled_var == 1)
+        model.Add(assignment_sum + unfilled_var == slot.count)
         slot_candidate_vars[slot.index] = slot_candidates
 
-    # No slots to process -> return early (only locked entries exist)
-    if not slot_candidate_vars and not unfilled_report:
-        assignments = locked_entries
-        _update_hour_balances(
-            session,
-            nurses,
-            assignments,
-            year,
-            month,
-            constraint_map,
-            adjustment_map,
-        )
-        stats = collect_nurse_stats(session, nurses, year, month)
-        return assignments, [], [], stats
+        hinted_nurses = {
+            hints[member]
+            for member in range(slot.index, slot.index + slot.count)
+            if member in hints
+        }
+        for nurse_id, var in slot_candidates:
+            hint(var, 1 if nurse_id in hinted_nurses else 0)
+        hint(unfilled_var, slot.count - len(hinted_nurses))
+
+    profiler.lap("model_variables", model)
 
     min_rest_minutes = (config.min_rest_hours or 11) * 60
+    pair_table = _shift_pair_table(shifts.shifts, min_rest_minutes)
 
     # Enforce minimum rest between consecutive days.
     double_mismatch_penalty = _default_penalty(
@@ -634,37 +1573,29 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
     )
 
     for nurse in nurses:
+        by_day = candidate_index[nurse.id].by_day
         for day in range(1, days):
-            slots_today = slots_by_day.get(day, [])
-            slots_next = slots_by_day.get(day + 1, [])
-            if not slots_today or not slots_next:
+            pairs_today = by_day.get(day)
+            pairs_next = by_day.get(day + 1)
+            if not pairs_today or not pairs_next:
                 continue
-            for slot_today in slots_today:
-                var_today = candidate_lookup.get((slot_today.index, nurse.id))
-                if var_today is None:
-                    continue
-                for slot_next in slots_next:
-                    if _has_minimum_rest(
-                        slot_today.shift_code,
-                        slot_next.shift_code,
-                        min_rest_minutes,
-                    ):
-                        continue
-                    var_next = candidate_lookup.get((slot_next.index, nurse.id))
-                    if var_next is None:
-                        continue
-                    model.Add(var_today + var_next <= 1)
+            for slot_today, var_today in pairs_today:
+                conflicts = pair_table.rest_conflicts.get(slot_today.shift_code, ())
+                for slot_next, var_next in pairs_next:
+                    if slot_next.shift_code in conflicts:
+                        _add_at_most_one(
+                            model, [var_today, var_next], guard("rest", nurse.id, day)
+                        )
+
+    profiler.lap("model_rest", model)
 
     # Ensure per-day assignments limit.
     day_assign_vars: Dict[Tuple[int, int], cp_model.IntVar] = {}
     night_assign_vars: Dict[Tuple[int, int], cp_model.IntVar] = {}
-    locked_night_count: Dict[int, int] = defaultdict(int)
-    for entry in locked_entries:
-        shift_meta = SHIFT_LOOKUP.get(entry.shift_code)
-        if shift_meta and shift_meta.shift_type == "N":
-            locked_night_count[entry.nurse_id] += 1
 
     for nurse in nurses:
+        double_blocked = pair_table.double_blocked[_double_shift_class(nurse.category)]
+        by_day = candidate_index[nurse.id].by_day
         for day in days_range:
             if locked_days.get((nurse.id, day)):
                 day_assign_vars[(nurse.id, day)] = None
@@ -672,11 +1603,8 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
                 continue
             vars_for_day: List[Tuple[cp_model.IntVar, Slot, ShiftMeta]] = []
             night_vars_for_day: List[cp_model.IntVar] = []
-            for slot in slots_by_day.get(day, []):
-                var = candidate_lookup.get((slot.index, nurse.id))
-                if var is None:
-                    continue
-                shift_meta = SHIFT_LOOKUP.get(slot.shift_code)
+            for slot, var in by_day.get(day, []):
+                shift_meta = shifts.get(slot.shift_code)
                 if not shift_meta:
                     continue
                 vars_for_day.append((var, slot, shift_meta))
@@ -685,50 +1613,80 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
 
             if vars_for_day:
                 assign_var = model.NewBoolVar(f"assign_{nurse.id}_{day}")
-                day_expr = sum(var for var, _, _ in vars_for_day)
+                day_expr = cp_model.LinearExpr.Sum([var for var, _, _ in vars_for_day])
                 max_per_day = 2
-                model.Add(day_expr <= max_per_day)
+                model.Add(day_expr <= max_per_day).OnlyEnforceIf(
+                    guard("daily", nurse.id, day)
+                )
                 model.Add(day_expr >= assign_var)
                 model.Add(day_expr <= assign_var * max_per_day)
                 day_assign_vars[(nurse.id, day)] = assign_var
+                hint(
+                    assign_var,
+                    int(any(hinted[var.Index()] for var, _, _ in vars_for_day)),
+                )
 
-                # Block invalid double-shift combos per nurse.
-                for idx, (first_var, first_slot, first_meta) in enumerate(
-                    vars_for_day
-                ):
-                    for jdx in range(idx + 1, len(vars_for_day)):
-                        second_var, second_slot, second_meta = vars_for_day[jdx]
-                        if _shifts_overlap(first_meta, second_meta):
-                            model.Add(first_var + second_var <= 1)
-                            continue
-                        if not _allows_double_shift(
-                            nurse, first_meta.shift_type, second_meta.shift_type
-                        ):
-                            model.Add(first_var + second_var <= 1)
-                        elif (
-                            double_mismatch_penalty > 0
-                            and first_slot.service_code != second_slot.service_code
-                        ):
+                # Block invalid double-shift combos per nurse. A shift code always
+                # clashes with itself, so the slots of one code are grouped and each
+                # clashing code pair needs a single at-most-one.
+                vars_by_code: Dict[str, List[cp_model.IntVar]] = defaultdict(list)
+                for var, slot, _ in vars_for_day:
+                    vars_by_code[slot.shift_code].append(var)
+                day_codes = list(vars_by_code)
+                grouped: Set[str] = set()
+                for idx, first_code in enumerate(day_codes):
+                    for second_code in day_codes[idx + 1 :]:
+                        pair = (first_code, second_code)
+                        if pair in pair_table.overlaps or pair in double_blocked:
+                            _add_at_most_one(
+                                model,
+                                vars_by_code[first_code] + vars_by_code[second_code],
+                                guard("daily", nurse.id, day),
+                            )
+                            grouped.update(pair)
+                for code in day_codes:
+                    if code not in grouped and len(vars_by_code[code]) > 1:
+                        _add_at_most_one(
+                            model, vars_by_code[code], guard("daily", nurse.id, day)
+                        )
+                if double_mismatch_penalty > 0:
+                    for idx, (first_var, first_slot, _) in enumerate(vars_for_day):
+                        for jdx in range(idx + 1, len(vars_for_day)):
+                            second_var, second_slot, _ = vars_for_day[jdx]
+                            pair = (first_slot.shift_code, second_slot.shift_code)
+                            if (
+                                first_slot.service_code == second_slot.service_code
+                                or pair in pair_table.overlaps
+                                or pair in double_blocked
+                            ):
+                                continue
                             mismatch_var = model.NewBoolVar(
                                 f"double_mismatch_{nurse.id}_{day}_{idx}_{jdx}"
                             )
-                            model.Add(mismatch_var >= first_var + second_var - 1)
-                            model.Add(mismatch_var <= first_var)
-                            model.Add(mismatch_var <= second_var)
-                            objective_terms.append(
-                                mismatch_var * double_mismatch_penalty
+                            _add_conjunction(
+                                model, mismatch_var, [first_var, second_var]
+                            )
+                            hint(
+                                mismatch_var,
+                                hinted[first_var.Index()] * hinted[second_var.Index()],
+                            )
+                            penalise(
+                                "preferences", mismatch_var * double_mismatch_penalty
                             )
             else:
                 day_assign_vars[(nurse.id, day)] = None
 
             if night_vars_for_day:
                 night_var = model.NewBoolVar(f"night_{nurse.id}_{day}")
-                night_expr = sum(night_vars_for_day)
+                night_expr = cp_model.LinearExpr.Sum(night_vars_for_day)
                 model.Add(night_var == night_expr)
                 night_assign_vars[(nurse.id, day)] = night_var
+                hint(night_var, hinted_sum([(1, var) for var in night_vars_for_day]))
             else:
                 night_assign_vars[(nurse.id, day)] = None
 
+    profiler.lap("model_daily", model)
+
     rest_penalty = _default_penalty(config, "rest_followup", 80)
     if not config.prefer_folga_after_nd:
         rest_penalty = 0
@@ -747,13 +1705,12 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
         for day in range(1, days):
             night_today = night_assign_vars.get((nurse.id, day))
             next_day_assign = day_assign_vars.get((nurse.id, day + 1))
-            if night_today is not None or next_day_assign is not None:
-                expr = 0
-                if night_today is not None:
-                    expr += night_today
-                if next_day_assign is not None:
-                    expr += next_day_assign
-                model.Add(expr <= 1)
+            if night_today is not None and next_day_assign is not None:
+                _add_at_most_one(
+                    model,
+                    [night_today, next_day_assign],
+                    guard("night_rest", nurse.id, day + 1),
+                )
 
             next_night = night_assign_vars.get((nurse.id, day + 1))
             if (
@@ -762,10 +1719,11 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
                 and next_night is not None
             ):
                 seq_var = model.NewBoolVar(f"night_seq_{nurse.id}_{day}")
-                model.Add(seq_var >= night_today + next_night - 1)
-                model.Add(seq_var <= night_today)
-                model.Add(seq_var <= next_night)
-                objective_terms.append(seq_var * night_seq_penalty)
+                _add_conjunction(model, seq_var, [night_today, next_night])
+                hint(
+                    seq_var, hinted[night_today.Index()] * hinted[next_night.Index()]
+                )
+                penalise("preferences", seq_var * night_seq_penalty)
 
             if day + 2 <= days:
                 next_day_assign = day_assign_vars.get((nurse.id, day + 1))
@@ -782,23 +1740,39 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
                     if next_night is None:
                         model.Add(non_night_next == next_day_assign)
                     else:
-                        model.Add(non_night_next <= next_day_assign)
-                        model.Add(non_night_next <= 1 - next_night)
-                        model.Add(non_night_next >= next_day_assign - next_night)
+                        _add_conjunction(
+                            model, non_night_next, [next_day_assign, next_night.Not()]
+                        )
+                    hint(
+                        non_night_next,
+                        hinted[next_day_assign.Index()]
+                        * (
+                            1
+                            if next_night is None
+                            else 1 - hinted[next_night.Index()]
+                        ),
+                    )
                     model.Add(folga_day == 0).OnlyEnforceIf(
-                        [night_today, non_night_next]
+                        [
+                            night_today,
+                            non_night_next,
+                            *guard("folga_nd", nurse.id, day + 2),
+                        ]
                     )
                     if rest_penalty > 0:
                         rest_var = model.NewBoolVar(
                             f"rest_followup_{nurse.id}_{day}"
                         )
-                        model.Add(
-                            rest_var >= night_today + non_night_next + folga_day - 2
+                        _add_conjunction(
+                            model, rest_var, [night_today, non_night_next, folga_day]
+                        )
+                        hint(
+                            rest_var,
+                            hinted[night_today.Index()]
+                            * hinted[non_night_next.Index()]
+                            * hinted[folga_day.Index()],
                         )
-                        model.Add(rest_var <= night_today)
-                        model.Add(rest_var <= non_night_next)
-                        model.Add(rest_var <= folga_day)
-                        objective_terms.append(rest_var * rest_penalty)
+                        penalise("preferences", rest_var * rest_penalty)
 
         if nurse.max_noites_mes:
             night_vars = []
@@ -808,17 +1782,23 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
                     night_vars.append(var)
             if night_vars:
                 model.Add(
-                    sum(night_vars) + locked_night_count.get(nurse.id, 0)
+                    cp_model.LinearExpr.Sum(night_vars)
+                    + locked_night_count.get(nurse.id, 0)
                     <= nurse.max_noites_mes
-                )
+                ).OnlyEnforceIf(guard("night_cap", nurse.id))
 
-        for start_day in range(1, max(1, days - window_length + 2)):
+        first_start = 2 - window_length if tail_days.get(nurse.id) else 1
+        for start_day in range(first_start, max(1, days - window_length + 2)):
             vars_window: List[cp_model.IntVar] = []
             locked_count = 0
             for offset in range(window_length):
                 day = start_day + offset
                 if day > days:
                     continue
+                if day < 1:
+                    if day in tail_days[nurse.id]:
+                        locked_count += 1
+                    continue
                 var = day_assign_vars.get((nurse.id, day))
                 if var is not None:
                     vars_window.append(var)
@@ -832,7 +1812,9 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
             if rhs < 0:
                 rhs = 0
             if vars_window:
-                model.Add(sum(vars_window) <= rhs)
+                model.Add(cp_model.LinearExpr.Sum(vars_window) <= rhs).OnlyEnforceIf(
+                    guard("consecutive", nurse.id, max(1, start_day))
+                )
 
         if weekend_pairs:
             weekend_off_vars = []
@@ -844,28 +1826,40 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
                 off_var = model.NewBoolVar(
                     f"weekend_off_{nurse.id}_{saturday}_{sunday}"
                 )
-                model.Add(off_var <= 1 - sat_assign)
-                model.Add(off_var <= 1 - sun_assign)
-                model.Add(off_var >= 1 - sat_assign - sun_assign)
+                _add_conjunction(
+                    model, off_var, [sat_assign.Not(), sun_assign.Not()]
+                )
+                hint(
+                    off_var,
+                    (1 - hinted[sat_assign.Index()]) * (1 - hinted[sun_assign.Index()]),
+                )
                 weekend_off_vars.append(off_var)
             if weekend_off_vars:
-                model.Add(sum(weekend_off_vars) >= 1)
+                model.AddBoolOr(weekend_off_vars).OnlyEnforceIf(
+                    guard("weekend_off", nurse.id)
+                )
+
+    profiler.lap("model_sequences", model)
 
     # Weekly hours / fairness constraints.
     week_ids = sorted({slot.week_id for slot in slots})
+    week_first_day: Dict[int, int] = {}
+    for day in days_range:
+        week_first_day.setdefault(_week_id(year, month, day), day)
     for nurse in nurses:
+        by_week = candidate_index[nurse.id].by_week
         for week_id in week_ids:
-            week_terms = []
-            for slot in slots:
-                if slot.week_id != week_id:
-                    continue
-                var = candidate_lookup.get((slot.index, nurse.id))
-                if var is None:
-                    continue
-                week_terms.append(var * slot.minutes)
-            if not week_terms and locked_week_minutes.get((nurse.id, week_id), 0) == 0:
+            week_pairs = by_week.get(week_id, [])
+            if not week_pairs and locked_week_minutes.get((nurse.id, week_id), 0) == 0:
                 continue
-            week_expr = sum(week_terms) if week_terms else 0
+            week_expr = (
+                cp_model.LinearExpr.WeightedSum(
+                    [var for _, var in week_pairs],
+                    [slot.minutes for slot, _ in week_pairs],
+                )
+                if week_pairs
+                else 0
+            )
             locked_minutes = locked_week_minutes.get((nurse.id, week_id), 0)
             if locked_minutes:
                 week_expr = week_expr + locked_minutes
@@ -874,28 +1868,32 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
             diff = model.NewIntVar(0, 24000, f"weekdiff_{nurse.id}_{week_id}")
             model.Add(diff >= week_expr - target_minutes)
             model.Add(diff >= target_minutes - week_expr)
-            objective_terms.append(diff * _default_penalty(config, "hours_target", 5))
+            hint_distance(
+                diff,
+                hinted_sum([(slot.minutes, var) for slot, var in week_pairs])
+                + locked_minutes,
+                target_minutes,
+            )
+            penalise("fairness", diff * _default_penalty(config, "hours_target", 5))
             if nurse.category == "CONTRATADO":
                 max_minutes = max(config.max_hours_week_contratado, weekly_target) * 60
-                model.Add(week_expr <= max_minutes)
+                model.Add(week_expr <= max_minutes).OnlyEnforceIf(
+                    guard("weekly_max", nurse.id, week_first_day.get(week_id))
+                )
+
+    profiler.lap("model_weekly_hours", model)
 
     bank_balance_weight = _default_penalty(config, "bank_balance", 2)
     if bank_balance_weight:
-        average_bank = (
-            int(
-                sum((nurse.hour_balance_minutes or 0) for nurse in nurses)
-                / len(nurses)
-            )
-            if nurses
-            else 0
+        average_bank = problem.average_bank
+        calendar_summaries = build_calendar_summaries(
+            year, month, constraint_map.items()
         )
         for nurse in nurses:
             desired_delta = average_bank - (nurse.hour_balance_minutes or 0)
             target = _contracted_target_minutes(
                 nurse,
-                year,
-                month,
-                constraint_map,
+                calendar_summaries.get(nurse.id) or empty_calendar_summary(year, month),
                 adjustment_map.get(nurse.id),
             )
             if target is None:
@@ -905,13 +1903,15 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
             if adjustment:
                 adjustment_minutes += adjustment.extra_minutes
                 adjustment_minutes -= adjustment.reduced_minutes
-            month_terms = []
-            for slot in slots:
-                var = candidate_lookup.get((slot.index, nurse.id))
-                if var is None:
-                    continue
-                month_terms.append(var * slot.minutes)
-            month_expr = sum(month_terms) if month_terms else 0
+            month_pairs = candidate_index[nurse.id].pairs
+            month_expr = (
+                cp_model.LinearExpr.WeightedSum(
+                    [var for _, var in month_pairs],
+                    [slot.minutes for slot, _ in month_pairs],
+                )
+                if month_pairs
+                else 0
+            )
             locked_minutes = locked_month_minutes.get(nurse.id, 0)
             if locked_minutes:
                 month_expr = month_expr + locked_minutes
@@ -921,16 +1921,26 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
             diff = model.NewIntVar(0, 100000, f"bankdiff_{nurse.id}")
             model.Add(diff >= delta_expr - desired_delta)
             model.Add(diff >= desired_delta - delta_expr)
-            objective_terms.append(diff * bank_balance_weight)
+            hint_distance(
+                diff,
+                hinted_sum([(slot.minutes, var) for slot, var in month_pairs])
+                + locked_minutes
+                + adjustment_minutes
+                - target,
+                desired_delta,
+            )
+            penalise("fairness", diff * bank_balance_weight)
+
+    profiler.lap("model_bank_balance", model)
 
     pedido_penalty_weight = _default_penalty(config, "pedido", 300)
     unfilled_penalty_weight = _default_penalty(config, "unfilled", 5000)
 
     for var in pedido_penalty_vars:
-        objective_terms.append(var * pedido_penalty_weight)
+        penalise("preferences", var * pedido_penalty_weight)
 
     for slot_idx, var in slot_unfilled_vars.items():
-        objective_terms.append(var * unfilled_penalty_weight)
+        penalise("coverage", var * unfilled_penalty_weight)
 
     for (slot_idx, nurse_id), meta in slot_candidate_meta.items():
         penalty = meta.get("category_penalty", 0)
@@ -938,113 +1948,1426 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
             continue
         var = candidate_lookup.get((slot_idx, nurse_id))
         if var is not None:
-            objective_terms.append(var * penalty)
+            penalise("fairness", var * penalty)
 
     shift_balance_weight = _default_penalty(config, "shift_balance", 4)
-    if shift_balance_weight and nurses:
-        normalized_group = (group or "").strip().lower()
-        role_hint = None
-        if normalized_group in {"ao", "assistente_operacional"}:
-            role_hint = "ASSISTENTE_OPERACIONAL"
-        elif normalized_group in {"enf", "enfermagem"}:
-            role_hint = "ENFERMEIRO"
-
-        slot_roles: Dict[int, str] = {}
-        totals_by_role: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
-        slots_by_role_type: Dict[str, Dict[str, List[int]]] = defaultdict(
-            lambda: defaultdict(list)
-        )
-        for slot in slots:
-            shift_meta = SHIFT_LOOKUP.get(slot.shift_code)
-            if not shift_meta or not shift_meta.shift_type:
-                continue
-            slot_role = (
-                role_hint
-                or service_roles.get(slot.service_code)
-                or "ENFERMEIRO"
-            )
-            slot_roles[slot.index] = slot_role
-            totals_by_role[slot_role][shift_meta.shift_type] += 1
-            slots_by_role_type[slot_role][shift_meta.shift_type].append(slot.index)
-
-        for slot_role, total_by_type in totals_by_role.items():
+    if shift_balance_weight and nurses and problem.shift_targets:
+        # Targets come from the whole month so decomposed parts keep the same goal.
+        for (slot_role, shift_type), target in problem.shift_targets.items():
             group_nurses = [
                 nurse
                 for nurse in nurses
                 if (slot_role == "ASSISTENTE_OPERACIONAL")
                 == (nurse.category == "ASSISTENTE_OPERACIONAL")
             ]
-            if not group_nurses:
-                continue
-            nurse_count = len(group_nurses)
-            for shift_type in ("M", "T", "N"):
-                total = total_by_type.get(shift_type, 0)
-                if total == 0:
-                    continue
-                target = int(round(total / nurse_count))
-                slot_indexes = slots_by_role_type[slot_role][shift_type]
-                for nurse in group_nurses:
-                    terms = []
-                    for slot_idx in slot_indexes:
-                        var = candidate_lookup.get((slot_idx, nurse.id))
-                        if var is None:
-                            continue
-                        terms.append(var)
-                    count_expr = sum(terms) if terms else 0
-                    locked_count = locked_type_counts.get(nurse.id, {}).get(
-                        shift_type, 0
+            for nurse in group_nurses:
+                terms = [
+                    var
+                    for _, var in candidate_index[nurse.id].by_role_type.get(
+                        (slot_role, shift_type), []
                     )
-                    if locked_count:
-                        count_expr = count_expr + locked_count
-                    diff = model.NewIntVar(
-                        0, 1000, f"typebal_{slot_role}_{shift_type}_{nurse.id}"
-                    )
-                    model.Add(diff >= count_expr - target)
-                    model.Add(diff >= target - count_expr)
-                    objective_terms.append(diff * shift_balance_weight)
+                ]
+                count_expr = cp_model.LinearExpr.Sum(terms) if terms else 0
+                locked_count = locked_type_counts.get(nurse.id, {}).get(
+                    shift_type, 0
+                )
+                if locked_count:
+                    count_expr = count_expr + locked_count
+                diff = model.NewIntVar(
+                    0, 1000, f"typebal_{slot_role}_{shift_type}_{nurse.id}"
+                )
+                model.Add(diff >= count_expr - target)
+                model.Add(diff >= target - count_expr)
+                hint_distance(
+                    diff, hinted_sum([(1, var) for var in terms]) + locked_count, target
+                )
+                penalise("fairness", diff * shift_balance_weight)
+
+    objective = cp_model.LinearExpr.Sum(objective_terms) if objective_terms else 0
+    model.Minimize(objective)
+    profiler.lap("model_objective", model)
+
+    return ScheduleModel(
+        model,
+        dict(slot_candidate_vars),
+        slot_unfilled_vars,
+        slot_sizes,
+        objective,
+        {slot.index: slot for slot in slots},
+        guards,
+        [
+            (stage, cp_model.LinearExpr.Sum(stage_terms[stage]))
+            for stage in OBJECTIVE_STAGES
+            if stage_terms.get(stage)
+        ],
+    )
 
-    if objective_terms:
-        model.Minimize(sum(objective_terms))
-    else:
-        model.Minimize(0)
 
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 20
-    solver.parameters.num_search_workers = 8
-    status = solver.Solve(model)
+@dataclass
+class NurseState:
+    """What a nurse already holds while a schedule is being constructed."""
 
-    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        return _fallback_greedy(
-            session,
-            nurses,
-            requirements,
-            constraint_map,
-            locked_entries,
-            year,
-            month,
-            config,
-            adjustment_map,
-        )
+    codes_by_day: Dict[int, List[str]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    worked_days: Set[int] = field(default_factory=set)
+    week_minutes: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    month_minutes: int = 0
+    nights: int = 0
+    # Weekends the model still counts as possible full days off.
+    open_weekends: Set[Tuple[int, int]] = field(default_factory=set)
+
+    def hold(self, day: int, shift: ShiftMeta, week_id: int) -> None:
+        self.codes_by_day[day].append(shift.code)
+        self.worked_days.add(day)
+        self.week_minutes[week_id] += shift.minutes
+        self.month_minutes += shift.minutes
+        if shift.shift_type == "N":
+            self.nights += 1
+        self.open_weekends = {
+            pair for pair in self.open_weekends if day not in pair
+        }
+
+    def run_length(self, day: int) -> int:
+        """Length of the work run that ``day`` would join."""
+        before = day - 1
+        while before in self.worked_days:
+            before -= 1
+        after = day + 1
+        while after in self.worked_days:
+            after += 1
+        return after - before - 1
+
+
+def construct_schedule(problem: SolveProblem) -> Dict[int, int]:
+    """Greedy schedule that keeps the model's hard rules, as slot index -> nurse id.
+
+    Slots with the fewest candidates go first; each one takes the feasible nurse
+    furthest below their weekly and monthly goals, popped from a score heap.
+    """
+    year, month = problem.year, problem.month
+    settings = problem.settings
+    shifts = problem.shifts
+    pair_table = _shift_pair_table(shifts.shifts, (settings.min_rest_hours or 11) * 60)
+    nurses_by_id = {nurse.id: nurse for nurse in problem.nurses}
+    weekend_pairs = [
+        (week[calendar.SATURDAY], week[calendar.SUNDAY])
+        for week in calendar.monthcalendar(year, month)
+        if week[calendar.SATURDAY] and week[calendar.SUNDAY]
+    ]
+    weekend_of = {day: pair for pair in weekend_pairs for day in pair}
+    calendar_summaries = build_calendar_summaries(
+        year, month, problem.constraint_map.items()
+    )
 
-    created_entries: List[ScheduleEntry] = []
-    for slot in slots:
-        pair_list = slot_candidate_vars.get(slot.index)
-        if not pair_list:
+    states = {nurse.id: NurseState() for nurse in problem.nurses}
+    for nurse_id, day, service_code, shift_code in problem.locked:
+        state = states.get(nurse_id)
+        shift = shifts.get(shift_code)
+        if state is None or shift is None:
             continue
-        assigned_nurse = None
-        for nurse_id, var in pair_list:
-            if solver.Value(var) == 1:
-                assigned_nurse = nurse_id
-                break
-        if assigned_nurse is None:
-            unfilled_var = slot_unfilled_vars.get(slot.index)
-            if unfilled_var is not None and solver.Value(unfilled_var) == 1:
-                reason_counts = slot_reason_counts.get(slot.index, {})
-                reason = "Limitações globais"
-                if reason_counts:
-                    reason = f"Elegíveis insuficientes ({max(reason_counts.items(), key=lambda item: item[1])[0]})"
-                unfilled_report.append(
-                    {
+        if service_code == "REST":
+            state.codes_by_day[day].append("REST")
+            continue
+        state.hold(day, shift, _week_id(year, month, day))
+    for nurse_id, day, shift_code in problem.previous_tail:
+        state = states.get(nurse_id)
+        shift = shifts.get(shift_code)
+        if state is None or shift is None:
+            continue
+        state.codes_by_day[day].append(shift_code)
+        state.worked_days.add(day)
+        state.week_minutes[_week_id(year, month, day)] += shift.minutes
+
+    candidate_days: Dict[int, Set[int]] = defaultdict(set)
+    for slot in problem.slots:
+        for nurse_id in problem.candidates.get(slot.index, ()):
+            candidate_days[nurse_id].add(slot.day)
+
+    goals: Dict[int, int] = {}
+    weekly_targets: Dict[int, int] = {}
+    weekly_caps: Dict[int, Optional[int]] = {}
+    for nurse in problem.nurses:
+        state = states[nurse.id]
+        state.open_weekends = {
+            pair
+            for pair in weekend_pairs
+            if all(day in candidate_days[nurse.id] for day in pair)
+        }
+        adjustment = problem.adjustment_map.get(nurse.id)
+        target = _contracted_target_minutes(
+            nurse,
+            calendar_summaries.get(nurse.id) or empty_calendar_summary(year, month),
+            adjustment,
+        )
+        goals[nurse.id] = (
+            (target or 0) + problem.average_bank - nurse.hour_balance_minutes
+        )
+        weekly_target = nurse.weekly_hours or settings.target_hours_week
+        weekly_targets[nurse.id] = weekly_target * 60
+        weekly_caps[nurse.id] = (
+            max(settings.max_hours_week_contratado, weekly_target) * 60
+            if nurse.category == "CONTRATADO"
+            else None
+        )
+
+    def feasible(nurse_id: int, slot: Slot, shift: ShiftMeta) -> bool:
+        state = states[nurse_id]
+        day = slot.day
+        if state.codes_by_day.get(day):
+            return False
+        for code in state.codes_by_day.get(day - 1, ()):
+            previous = shifts.get(code)
+            if previous and previous.shift_type == "N":
+                return False
+            if shift.code in pair_table.rest_conflicts.get(code, ()):
+                return False
+        next_codes = [
+            code for code in state.codes_by_day.get(day + 1, ()) if code != "REST"
+        ]
+        if next_codes and (
+            shift.shift_type == "N"
+            or set(next_codes) & pair_table.rest_conflicts.get(shift.code, frozenset())
+        ):
+            return False
+        if state.run_length(day) > MAX_CONSECUTIVE_WORK_DAYS:
+            return False
+        nurse = nurses_by_id[nurse_id]
+        if shift.shift_type == "N" and nurse.max_noites_mes:
+            if state.nights >= nurse.max_noites_mes:
+                return False
+        cap = weekly_caps[nurse_id]
+        if cap is not None and state.week_minutes[slot.week_id] + shift.minutes > cap:
+            return False
+        if state.open_weekends == {weekend_of.get(day)}:
+            return False
+        return True
+
+    def score(nurse_id: int, slot: Slot) -> Tuple[int, int, int, int]:
+        state = states[nurse_id]
+        week_over = max(
+            0,
+            state.week_minutes[slot.week_id] + slot.minutes - weekly_targets[nurse_id],
+        )
+        return (
+            week_over,
+            state.month_minutes - goals[nurse_id],
+            0 if nurses_by_id[nurse_id].category == "RV_TEMPO_PARCIAL" else 1,
+            nurse_id,
+        )
+
+    assigned: Dict[int, int] = {}
+    ordered = sorted(
+        problem.slots,
+        key=lambda slot: (
+            len(problem.candidates.get(slot.index, ())),
+            slot.day,
+            slot.index,
+        ),
+    )
+    for slot in ordered:
+        shift = shifts.get(slot.shift_code)
+        candidates = problem.candidates.get(slot.index)
+        if shift is None or not candidates:
+            continue
+        heap = [(score(nurse_id, slot), nurse_id) for nurse_id in candidates]
+        heapq.heapify(heap)
+        for member in range(slot.index, slot.index + slot.count):
+            while heap:
+                _, nurse_id = heapq.heappop(heap)
+                if feasible(nurse_id, slot, shift):
+                    break
+            else:
+                break
+            states[nurse_id].hold(slot.day, shift, slot.week_id)
+            assigned[member] = nurse_id
+    return assigned
+
+
+def _read_solution(
+    built: ScheduleModel, value: Callable[[cp_model.IntVar], int]
+) -> Tuple[Dict[int, int], List[int]]:
+    """Assigned nurse per slot index and the unfilled slot indexes of one solution."""
+    assigned: Dict[int, int] = {}
+    unfilled: List[int] = []
+    for slot_idx, pair_list in built.slot_candidate_vars.items():
+        # Aggregated slots stand for consecutive slot indexes of one requirement.
+        members = range(slot_idx, slot_idx + built.slot_sizes.get(slot_idx, 1))
+        chosen = [nurse_id for nurse_id, var in pair_list if value(var) == 1]
+        for member, nurse_id in zip(members, chosen):
+            assigned[member] = nurse_id
+        unfilled_var = built.slot_unfilled_vars.get(slot_idx)
+        if unfilled_var is not None:
+            shortfall = value(unfilled_var)
+            unfilled.extend(members[len(chosen) : len(chosen) + shortfall])
+    return assigned, unfilled
+
+
+@dataclass
+class SearchResult:
+    """One CP-SAT search; ``solver`` holds the values of the schedule it kept."""
+
+    solver: cp_model.CpSolver
+    status: int
+    best_bound: float
+    response_stats: str
+
+
+def _hinted_incumbent(
+    built: ScheduleModel, callback: SolveProgressCallback, time_limit: float
+) -> Optional[cp_model.CpSolver]:
+    """The hinted schedule checked on its own, when every variable has a hint.
+
+    CP-SAT only reaches a complete hint after presolve and its first search
+    workers, which can take the whole budget of a large month. With every
+    variable fixed the check takes a fraction of that.
+    """
+    proto = built.model.Proto()
+    if len(set(proto.solution_hint.vars)) != len(proto.variables):
+        return None
+    solver = cp_model.CpSolver()
+    solver.parameters.fix_variables_to_their_hinted_value = True
+    solver.parameters.num_search_workers = 1
+    solver.parameters.max_time_in_seconds = time_limit
+    if solver.Solve(built.model, callback) not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+    return solver
+
+
+def _run_search(
+    built: ScheduleModel,
+    progress: Optional[Callable[[Dict[str, float]], None]],
+    stop_event,
+    num_workers: int,
+    time_limit: float,
+    relative_gap: float = 0.0,
+    no_improvement: float = 0.0,
+) -> SearchResult:
+    started = time.monotonic()
+    callback = SolveProgressCallback(list(built.slot_unfilled_vars.values()), progress)
+    incumbent = _hinted_incumbent(built, callback, time_limit)
+    callback.offset = time.monotonic() - started
+    remaining = max(0.0, time_limit - callback.offset)
+    if stop_event is not None and stop_event.is_set():
+        # Stopped while the hint was checked, before the search could be stopped.
+        remaining = 0.0
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = remaining
+    solver.parameters.num_search_workers = num_workers
+    if relative_gap:
+        solver.parameters.relative_gap_limit = relative_gap
+    # A stop request keeps the best schedule found so far instead of waiting out the budget.
+    finished = threading.Event()
+    if stop_event is not None:
+        threading.Thread(
+            target=_watch_stop_request,
+            args=(stop_event, finished, solver.StopSearch),
+            daemon=True,
+        ).start()
+    if no_improvement:
+        threading.Thread(
+            target=_watch_stagnation,
+            args=(callback, finished, no_improvement, solver.StopSearch),
+            daemon=True,
+        ).start()
+    try:
+        status = solver.Solve(built.model, callback)
+    finally:
+        finished.set()
+    result = SearchResult(
+        solver, status, solver.BestObjectiveBound(), solver.ResponseStats()
+    )
+    if incumbent is not None and (
+        status not in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        or solver.ObjectiveValue() > incumbent.ObjectiveValue()
+    ):
+        # The search found nothing better, so the hinted schedule stands.
+        result.solver = incumbent
+        result.status = cp_model.FEASIBLE
+        result.response_stats = result.response_stats.replace(
+            f"status: {solver.StatusName(status)}", "status: FEASIBLE (hint)", 1
+        )
+    return result
+
+
+def _solve_model(
+    built: ScheduleModel,
+    progress: Optional[Callable[[Dict[str, float]], None]] = None,
+    stop_event=None,
+    num_workers: int = SOLVER_NUM_WORKERS,
+    time_limit: float = SOLVER_TIME_LIMIT_SECONDS,
+    pool_size: int = 0,
+    staged: bool = False,
+    relative_gap: float = 0.0,
+    no_improvement: float = 0.0,
+) -> SolveOutcome:
+    # Alternatives come out of the same time limit, which holds for the whole solve.
+    deadline = time.monotonic() + time_limit
+    time_limit -= _pool_reserve(pool_size, time_limit)
+    if staged and len(built.stage_objectives) > 1:
+        return _solve_staged(
+            built,
+            progress,
+            stop_event,
+            num_workers,
+            time_limit,
+            pool_size,
+            relative_gap,
+            no_improvement,
+            deadline,
+        )
+    search = _run_search(
+        built,
+        progress,
+        stop_event,
+        num_workers,
+        time_limit,
+        relative_gap,
+        no_improvement,
+    )
+    solver, status = search.solver, search.status
+    outcome = SolveOutcome(status=status, response_stats=[search.response_stats])
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return outcome
+    outcome.objective = solver.ObjectiveValue()
+    outcome.best_bound = search.best_bound
+    outcome.assigned, outcome.unfilled = _read_solution(built, solver.Value)
+    if pool_size > 1 and built.objective is not None and not (
+        stop_event is not None and stop_event.is_set()
+    ):
+        outcome.alternatives = _alternative_solutions(
+            built, solver, outcome, pool_size - 1, num_workers, deadline
+        )
+    return outcome
+
+
+def _pool_reserve(pool_size: int, time_limit: float) -> float:
+    if pool_size <= 1:
+        return 0.0
+    return min((pool_size - 1) * POOL_SEARCH_SECONDS, time_limit * POOL_BUDGET_SHARE)
+
+
+def _stage_progress(
+    progress: Optional[Callable[[Dict[str, float]], None]],
+    stage: int,
+    offset: float,
+    counter: List[int],
+) -> Optional[Callable[[Dict[str, float]], None]]:
+    if progress is None:
+        return None
+
+    # Solution numbers keep growing across stages so listeners can tell events apart.
+    def report(event: Dict[str, float]) -> None:
+        counter[0] += 1
+        elapsed = round(offset + event["elapsed_seconds"], 3)
+        progress(
+            {
+                **event,
+                "solution": counter[0],
+                "stage": stage,
+                "elapsed_seconds": elapsed,
+            }
+        )
+
+    return report
+
+
+def _solve_staged(
+    built: ScheduleModel,
+    progress: Optional[Callable[[Dict[str, float]], None]],
+    stop_event,
+    num_workers: int,
+    time_limit: float,
+    pool_size: int,
+    relative_gap: float = 0.0,
+    no_improvement: float = 0.0,
+    deadline: Optional[float] = None,
+) -> SolveOutcome:
+    """Minimise the objective stages in order, holding each at its best value.
+
+    A stage gets its share of the budget plus whatever earlier stages left, and
+    starts from the previous stage's solution. When a later stage finds nothing
+    in time the schedule of the stage before it stands. The reported objective
+    is the usual weighted sum; its bound adds up the bound of every stage that
+    was searched and the value of every stage that was not.
+    """
+    model = built.model
+    started = time.monotonic()
+    best: Optional[cp_model.CpSolver] = None
+    status = cp_model.OPTIMAL
+    response_stats: List[str] = []
+    stages = built.stage_objectives
+    bounds: Dict[str, float] = {}
+    counter = [0]
+    for position, (stage, expression) in enumerate(stages):
+        elapsed = time.monotonic() - started
+        shares = [OBJECTIVE_STAGES[name] for name, _ in stages[position:]]
+        budget = max(0.1, (time_limit - elapsed) * shares[0] / sum(shares))
+        model.Minimize(expression)
+        search = _run_search(
+            built,
+            _stage_progress(progress, position + 1, elapsed, counter),
+            stop_event,
+            num_workers,
+            budget,
+            relative_gap,
+            no_improvement,
+        )
+        response_stats.append(f"stage: {stage}\n{search.response_stats}")
+        remaining = time_limit - (time.monotonic() - started)
+        if (
+            search.status == cp_model.UNKNOWN
+            and best is None
+            and remaining > 0.1
+            and not (stop_event is not None and stop_event.is_set())
+        ):
+            # Nothing to fall back on yet, so this stage gets the rest of the budget.
+            search = _run_search(
+                built,
+                _stage_progress(
+                    progress, position + 1, time_limit - remaining, counter
+                ),
+                stop_event,
+                num_workers,
+                remaining,
+                relative_gap,
+                no_improvement,
+            )
+            response_stats.append(f"stage: {stage}\n{search.response_stats}")
+        solver, stage_status = search.solver, search.status
+        if stage_status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            if best is None:
+                return SolveOutcome(status=stage_status, response_stats=response_stats)
+            status = cp_model.FEASIBLE
+            break
+        best = solver
+        bounds[stage] = search.best_bound
+        if stage_status == cp_model.FEASIBLE:
+            status = cp_model.FEASIBLE
+        model.Add(expression <= round(solver.ObjectiveValue()))
+        proto = model.Proto()
+        proto.ClearField("solution_hint")
+        solution = solver.ResponseProto().solution
+        proto.solution_hint.vars.extend(range(len(solution)))
+        proto.solution_hint.values.extend(solution)
+        if stop_event is not None and stop_event.is_set():
+            status = cp_model.FEASIBLE
+            break
+    model.Minimize(built.objective)
+
+    outcome = SolveOutcome(status=status, response_stats=response_stats)
+    outcome.objective = best.Value(built.objective)
+    outcome.best_bound = sum(
+        bounds.get(stage, best.Value(expression)) for stage, expression in stages
+    )
+    outcome.assigned, outcome.unfilled = _read_solution(built, best.Value)
+    if pool_size > 1 and not (stop_event is not None and stop_event.is_set()):
+        outcome.alternatives = _alternative_solutions(
+            built, best, outcome, pool_size - 1, num_workers, deadline
+        )
+    return outcome
+
+
+def _alternative_solutions(
+    built: ScheduleModel,
+    solver: cp_model.CpSolver,
+    outcome: SolveOutcome,
+    count: int,
+    num_workers: int,
+    deadline: Optional[float] = None,
+) -> List[PoolSolution]:
+    """Near-best schedules that each rework one week of the best one.
+
+    Every search copies the model, keeps the best schedule outside one week and
+    asks for enough changes inside it, so each takes seconds instead of a full
+    solve and no two alternatives are equal. Searches split the time left before
+    ``deadline`` and stop once it has passed.
+    """
+    bound = int(outcome.objective + abs(outcome.objective) * POOL_OBJECTIVE_GAP)
+    # Copies of one requirement are interchangeable, so changes are counted per
+    # (nurse, day, service, shift) cell rather than per slot variable.
+    cells: Dict[int, Dict[Tuple[int, int, str, str], List[cp_model.IntVar]]] = (
+        defaultdict(lambda: defaultdict(list))
+    )
+    for slot_idx, pair_list in built.slot_candidate_vars.items():
+        slot = built.slots[slot_idx]
+        for nurse_id, var in pair_list:
+            cell = (nurse_id, slot.day, slot.service_code, slot.shift_code)
+            cells[slot.week_id][cell].append(var)
+
+    found: List[PoolSolution] = []
+    for week_id in sorted(cells, key=lambda week: -len(cells[week])):
+        if len(found) == count:
+            break
+        search_seconds = float(POOL_SEARCH_SECONDS)
+        if deadline is not None:
+            left = deadline - time.monotonic()
+            if left < 0.1:
+                break
+            search_seconds = min(search_seconds, left / (count - len(found)))
+        # A clone keeps the variable indexes, so the original variables still apply.
+        model = built.model.Clone()
+        model.ClearHints()
+        chosen = []
+        for other_week, week_cells in cells.items():
+            for cell_vars in week_cells.values():
+                values = [solver.Value(var) for var in cell_vars]
+                for var, value in zip(cell_vars, values):
+                    model.AddHint(var, value)
+                    if other_week != week_id:
+                        model.Add(var == value)
+                if other_week == week_id and any(values):
+                    chosen.append(cp_model.LinearExpr.Sum(cell_vars))
+        if not chosen:
+            continue
+        changes = max(1, int(len(chosen) * POOL_MIN_CHANGES))
+        model.Add(cp_model.LinearExpr.Sum(chosen) <= len(chosen) - changes)
+        model.Add(built.objective <= bound)
+        search = cp_model.CpSolver()
+        search.parameters.max_time_in_seconds = search_seconds
+        search.parameters.num_search_workers = num_workers
+        if search.Solve(model) not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            continue
+        assigned, unfilled = _read_solution(built, search.Value)
+        found.append(PoolSolution(search.ObjectiveValue(), assigned, unfilled))
+    return sorted(found, key=lambda solution: solution.objective)
+
+
+def explain_infeasibility(
+    problem: SolveProblem, time_limit: float = EXPLAIN_TIME_LIMIT_SECONDS
+) -> List[Tuple[str, int, Optional[int]]]:
+    """A small set of (rule, nurse_id, day) hard rules that cannot hold together.
+
+    The guards are assumptions, so CP-SAT returns the subset it used to prove
+    infeasibility; each one is then dropped in turn while the rest stay infeasible.
+    An empty list means the hard rules are not what blocks the month.
+    """
+    deadline = time.monotonic() + time_limit
+    built = _build_model(problem, explain=True)
+    # Only feasibility matters here; without an objective a first solution ends it.
+    built.model.Proto().ClearField("objective")
+    keys = {var.Index(): key for key, var in built.guards.items()}
+
+    def infeasible(literals: List[cp_model.IntVar]) -> Optional[List[int]]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        built.model.ClearAssumptions()
+        built.model.AddAssumptions(literals)
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = remaining
+        solver.parameters.num_search_workers = 1
+        if solver.Solve(built.model) != cp_model.INFEASIBLE:
+            return None
+        return list(solver.SufficientAssumptionsForInfeasibility())
+
+    core = infeasible(list(built.guards.values()))
+    if not core:
+        return []
+    index = 0
+    while index < len(core) and len(core) > 1:
+        trial = core[:index] + core[index + 1 :]
+        smaller = infeasible([built.guards[keys[item]] for item in trial])
+        if smaller is None:
+            index += 1
+        else:
+            core = [item for item in trial if item in smaller] or trial
+    return sorted(
+        (keys[item] for item in core), key=lambda key: (key[1], key[2] or 0, key[0])
+    )
+
+
+def conflict_violations(
+    conflicts: List[Tuple[str, int, Optional[int]]], nurses: Iterable[Nurse]
+) -> List[str]:
+    names = {nurse.id: nurse.name for nurse in nurses}
+    messages = []
+    for rule, nurse_id, day in conflicts:
+        name = names.get(nurse_id, f"ID {nurse_id}")
+        label = CONFLICT_RULE_LABELS.get(rule, rule)
+        prefix = f"Dia {day} {name}" if day is not None else name
+        messages.append(f"{prefix}: regra impossível de cumprir ({label})")
+    return messages
+
+
+def _eligibility_components(problem: SolveProblem) -> List[Tuple[List[int], List[int]]]:
+    parent: Dict[int, int] = {nurse.id: nurse.id for nurse in problem.nurses}
+
+    def find(nurse_id: int) -> int:
+        while parent[nurse_id] != nurse_id:
+            parent[nurse_id] = parent[parent[nurse_id]]
+            nurse_id = parent[nurse_id]
+        return nurse_id
+
+    for nurse_ids in problem.candidates.values():
+        if not nurse_ids:
+            continue
+        root = find(nurse_ids[0])
+        for nurse_id in nurse_ids[1:]:
+            other = find(nurse_id)
+            if other != root:
+                parent[other] = root
+
+    slots_by_root: Dict[int, List[int]] = defaultdict(list)
+    for slot in problem.slots:
+        nurse_ids = problem.candidates.get(slot.index)
+        if nurse_ids:
+            slots_by_root[find(nurse_ids[0])].append(slot.index)
+    nurses_by_root: Dict[int, List[int]] = defaultdict(list)
+    for nurse in problem.nurses:
+        root = find(nurse.id)
+        if root in slots_by_root:
+            nurses_by_root[root].append(nurse.id)
+    return [
+        (nurses_by_root[root], slot_indexes)
+        for root, slot_indexes in slots_by_root.items()
+    ]
+
+
+def _batch_components(
+    components: List[Tuple[List[int], List[int]]], max_batches: int
+) -> List[Tuple[List[int], List[int]]]:
+    """Greedily packs components into at most max_batches similar-sized groups."""
+    batches: List[Tuple[List[int], List[int]]] = [
+        ([], []) for _ in range(min(max_batches, len(components)))
+    ]
+    for nurse_ids, slot_indexes in sorted(
+        components, key=lambda item: len(item[1]), reverse=True
+    ):
+        target = min(batches, key=lambda batch: len(batch[1]))
+        target[0].extend(nurse_ids)
+        target[1].extend(slot_indexes)
+    return [batch for batch in batches if batch[1]]
+
+
+def _subproblem(
+    problem: SolveProblem, nurse_ids: List[int], slot_indexes: List[int]
+) -> SolveProblem:
+    nurse_set = set(nurse_ids)
+    slot_set = set(slot_indexes)
+    member_set = {
+        member
+        for slot in problem.slots
+        if slot.index in slot_set
+        for member in range(slot.index, slot.index + slot.count)
+    }
+    return replace(
+        problem,
+        nurses=[nurse for nurse in problem.nurses if nurse.id in nurse_set],
+        slots=[slot for slot in problem.slots if slot.index in slot_set],
+        candidates={
+            slot_idx: nurse_list
+            for slot_idx, nurse_list in problem.candidates.items()
+            if slot_idx in slot_set
+        },
+        pedido_pairs={
+            pair for pair in problem.pedido_pairs if pair[0] in slot_set
+        },
+        constraint_map={
+            key: code
+            for key, code in problem.constraint_map.items()
+            if key[0] in nurse_set
+        },
+        adjustment_map={
+            nurse_id: item
+            for nurse_id, item in problem.adjustment_map.items()
+            if nurse_id in nurse_set
+        },
+        locked=[item for item in problem.locked if item[0] in nurse_set],
+        previous_tail=[
+            item for item in problem.previous_tail if item[0] in nurse_set
+        ],
+        hints={
+            slot_idx: nurse_id
+            for slot_idx, nurse_id in problem.hints.items()
+            if slot_idx in member_set
+        },
+    )
+
+
+_WORKER_STOP_EVENT = None
+
+
+def _init_solve_worker(stop_event) -> None:
+    global _WORKER_STOP_EVENT
+    _WORKER_STOP_EVENT = stop_event
+
+
+def _solve_in_worker(
+    problem: SolveProblem, profile: SolverProfile, staged: bool = False
+) -> SolveOutcome:
+    return _solve_model(
+        _build_model(problem),
+        stop_event=_WORKER_STOP_EVENT,
+        num_workers=profile.num_workers,
+        time_limit=profile.time_limit_seconds,
+        staged=staged,
+        relative_gap=profile.relative_gap,
+        no_improvement=profile.no_improvement_seconds,
+    )
+
+
+def _solve_decomposed(
+    problem: SolveProblem,
+    batches: List[Tuple[List[int], List[int]]],
+    progress: Optional[Callable[[Dict[str, float]], None]] = None,
+    stop_event: Optional[threading.Event] = None,
+    profile: Optional[SolverProfile] = None,
+    staged: bool = False,
+) -> SolveOutcome:
+    subproblems = [
+        _subproblem(problem, nurse_ids, slot_indexes)
+        for nurse_ids, slot_indexes in batches
+    ]
+    profile = profile or _default_solver_profile()
+    # The profile's workers are shared between the parts solved side by side.
+    part_profile = replace(
+        profile, num_workers=max(1, profile.num_workers // len(subproblems))
+    )
+    context = multiprocessing.get_context("spawn")
+    worker_stop = context.Event()
+    finished = threading.Event()
+    if stop_event is not None:
+        threading.Thread(
+            target=_watch_stop_request,
+            args=(stop_event, finished, worker_stop.set),
+            daemon=True,
+        ).start()
+
+    merged = SolveOutcome(status=cp_model.OPTIMAL)
+    started = time.monotonic()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=len(subproblems),
+            mp_context=context,
+            initializer=_init_solve_worker,
+            initargs=(worker_stop,),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _solve_in_worker,
+                    subproblem,
+                    part_profile,
+                    staged,
+                )
+                for subproblem in subproblems
+            ]
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                outcome = future.result()
+                if outcome.status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                    # One infeasible part makes the whole month fall back, as before.
+                    worker_stop.set()
+                    return SolveOutcome(
+                        status=outcome.status, response_stats=outcome.response_stats
+                    )
+                if outcome.status == cp_model.FEASIBLE:
+                    merged.status = cp_model.FEASIBLE
+                merged.assigned.update(outcome.assigned)
+                merged.unfilled.extend(outcome.unfilled)
+                merged.objective += outcome.objective
+                merged.best_bound += outcome.best_bound
+                merged.response_stats.extend(outcome.response_stats)
+                if progress:
+                    progress(
+                        {
+                            "solution": done_count,
+                            "objective": merged.objective,
+                            "best_bound": merged.best_bound,
+                            "unfilled": len(merged.unfilled),
+                            "elapsed_seconds": round(time.monotonic() - started, 3),
+                        }
+                    )
+    finally:
+        finished.set()
+    merged.unfilled.sort()
+    return merged
+
+
+def _aggregate_slots(slots: List[Slot]) -> List[Slot]:
+    """Merge the consecutive copies of each requirement into one counted slot."""
+    aggregated: List[Slot] = []
+    for slot in slots:
+        previous = aggregated[-1] if aggregated else None
+        if (
+            previous is not None
+            and previous.index + previous.count == slot.index
+            and (previous.day, previous.service_code, previous.shift_code)
+            == (slot.day, slot.service_code, slot.shift_code)
+        ):
+            aggregated[-1] = replace(previous, count=previous.count + slot.count)
+        else:
+            aggregated.append(slot)
+    return aggregated
+
+
+def _aggregated_problem(problem: SolveProblem) -> SolveProblem:
+    # Slots without candidates get no variables and must not join a filled copy's count.
+    slots = _aggregate_slots(
+        [slot for slot in problem.slots if problem.candidates.get(slot.index)]
+    )
+    slot_set = {slot.index for slot in slots}
+    return replace(
+        problem,
+        slots=slots,
+        candidates={
+            slot_idx: nurse_list
+            for slot_idx, nurse_list in problem.candidates.items()
+            if slot_idx in slot_set
+        },
+        pedido_pairs={
+            pair for pair in problem.pedido_pairs if pair[0] in slot_set
+        },
+    )
+
+
+def problem_fingerprint(
+    problem: SolveProblem,
+    opening_banks: Optional[Dict[int, int]] = None,
+    options: Tuple = (),
+) -> str:
+    """Stable hash of everything that decides a month's solution.
+
+    Warm-start hints and the derived eligibility are left out. ``opening_banks``
+    replaces each bank with its value before this month was generated, since a
+    generate moves the bank by the month's own delta.
+    """
+    opening_banks = opening_banks or {}
+    payload = {
+        "month": [problem.year, problem.month, problem.role_hint],
+        "nurses": [
+            {
+                **asdict(nurse),
+                "hour_balance_minutes": opening_banks.get(
+                    nurse.id, nurse.hour_balance_minutes
+                ),
+            }
+            for nurse in problem.nurses
+        ],
+        "slots": [asdict(slot) for slot in problem.slots],
+        "constraints": sorted(
+            [nurse_id, day, code]
+            for (nurse_id, day), code in problem.constraint_map.items()
+        ),
+        "adjustments": sorted(
+            [nurse_id, asdict(item)] for nurse_id, item in problem.adjustment_map.items()
+        ),
+        "locked": sorted(problem.locked),
+        "settings": asdict(problem.settings),
+        "service_roles": problem.service_roles,
+        "shifts": [asdict(meta) for meta in problem.shifts.shifts],
+        "previous_tail": sorted(problem.previous_tail),
+        "options": list(options),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def dump_schedule_model(
+    problem: SolveProblem,
+    directory: Optional[Path] = None,
+    formulation: Optional[str] = None,
+    label: str = "",
+) -> Path:
+    """Write the month's CP-SAT model where it can be replayed without the database.
+
+    ``<name>.pb`` is the serialized CpModelProto, hints and objective included;
+    ``<name>.json`` maps assignment and shortfall variable indexes back to
+    slots and nurses. Returns the path of the proto.
+    """
+    if (formulation or SOLVER_FORMULATION) == "aggregated":
+        problem = _aggregated_problem(problem)
+    built = _build_model(problem)
+    directory = directory or MODEL_DUMP_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    name = "_".join(
+        part for part in (f"{problem.year}-{problem.month:02d}", label, stamp) if part
+    )
+    path = directory / f"{name}.pb"
+    path.write_bytes(built.model.Proto().SerializeToString())
+    variables: Dict[int, Dict[str, object]] = {}
+    for slot_idx, pair_list in built.slot_candidate_vars.items():
+        for nurse_id, var in pair_list:
+            variables[var.Index()] = {
+                "kind": "assign",
+                "slot": slot_idx,
+                "nurse_id": nurse_id,
+            }
+    for slot_idx, var in built.slot_unfilled_vars.items():
+        variables[var.Index()] = {"kind": "unfilled", "slot": slot_idx}
+    sidecar = {
+        "year": problem.year,
+        "month": problem.month,
+        "label": label,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "formulation": formulation or SOLVER_FORMULATION,
+        "slots": {slot.index: asdict(slot) for slot in built.slots.values()},
+        "nurses": {
+            nurse.id: {"name": nurse.name, "category": nurse.category}
+            for nurse in problem.nurses
+        },
+        "variables": variables,
+    }
+    path.with_suffix(".json").write_text(
+        json.dumps(sidecar, indent=2, default=str), encoding="utf-8"
+    )
+    return path
+
+
+def solve_problem(
+    problem: SolveProblem,
+    progress: Optional[Callable[[Dict[str, float]], None]] = None,
+    stop_event: Optional[threading.Event] = None,
+    decompose: Optional[bool] = None,
+    formulation: Optional[str] = None,
+    profiler: Optional[SolveProfiler] = None,
+    time_limit: Optional[float] = None,
+    pool_size: int = 0,
+    objective: Optional[str] = None,
+    profile: Optional[SolverProfile] = None,
+) -> SolveOutcome:
+    """Solve one month, decomposed or as a single model.
+
+    ``pool_size`` keeps that many of the best solutions found by a single model;
+    decomposed months only report their merged best. An infeasible month comes
+    back with the conflicting hard rules in ``conflicts``. ``objective`` is
+    "weighted" for one weighted sum or "staged" to minimise the
+    OBJECTIVE_STAGES one after another. ``profile`` sets the workers, gap and
+    stagnation window; ``time_limit`` overrides its time limit.
+    """
+    outcome = _solve_problem(
+        problem,
+        progress,
+        stop_event,
+        decompose,
+        formulation,
+        profiler,
+        time_limit,
+        pool_size,
+        objective,
+        profile,
+    )
+    if outcome.status == cp_model.INFEASIBLE:
+        outcome.conflicts = explain_infeasibility(problem)
+        if profiler is not None:
+            profiler.lap("explain")
+    return outcome
+
+
+def _solve_problem(
+    problem: SolveProblem,
+    progress: Optional[Callable[[Dict[str, float]], None]],
+    stop_event: Optional[threading.Event],
+    decompose: Optional[bool],
+    formulation: Optional[str],
+    profiler: Optional[SolveProfiler],
+    time_limit: Optional[float],
+    pool_size: int,
+    objective: Optional[str] = None,
+    profile: Optional[SolverProfile] = None,
+) -> SolveOutcome:
+    profile = profile or _default_solver_profile()
+    if time_limit is not None:
+        profile = replace(profile, time_limit_seconds=time_limit)
+    staged = (objective or SOLVER_OBJECTIVE) == "staged"
+    if (formulation or SOLVER_FORMULATION) == "aggregated":
+        problem = _aggregated_problem(problem)
+    if decompose is None:
+        decompose = SOLVER_DECOMPOSE == "on" or (
+            SOLVER_DECOMPOSE == "auto" and len(problem.slots) >= DECOMPOSE_MIN_SLOTS
+        )
+    if decompose:
+        batches = _batch_components(
+            _eligibility_components(problem), available_cpu_count()
+        )
+        if len(batches) > 1:
+            return _solve_decomposed(
+                problem, batches, progress, stop_event, profile, staged
+            )
+    return _solve_model(
+        _build_model(problem, profiler),
+        progress,
+        stop_event,
+        num_workers=profile.num_workers,
+        time_limit=profile.time_limit_seconds,
+        pool_size=pool_size,
+        staged=staged,
+        relative_gap=profile.relative_gap,
+        no_improvement=profile.no_improvement_seconds,
+    )
+
+
+@dataclass
+class ScheduleVariant:
+    """A what-if change to a month's inputs, applied to copies of what was read.
+
+    Added nurses get negative ids (-1, -2, ...) in order unless they carry one;
+    constraint overrides map (nurse_id, day) to a code, or None to clear it.
+    """
+
+    name: str = "base"
+    add_nurses: List[Nurse] = field(default_factory=list)
+    remove_nurse_ids: List[int] = field(default_factory=list)
+    requirement_counts: Dict[Tuple[int, str, str], int] = field(default_factory=dict)
+    constraints: Dict[Tuple[int, int], Optional[str]] = field(default_factory=dict)
+
+    def apply_nurses(self, nurses: List[Nurse]) -> List[Nurse]:
+        removed = set(self.remove_nurse_ids)
+        kept = [nurse for nurse in nurses if nurse.id not in removed]
+        for index, nurse in enumerate(self.add_nurses, start=1):
+            if nurse.id is None:
+                nurse.id = -index
+            kept.append(nurse)
+        return sort_nurses_by_category(kept)
+
+    def apply_requirements(
+        self, requirements: List[MonthlyRequirement], year: int, month: int
+    ) -> List[MonthlyRequirement]:
+        if not self.requirement_counts:
+            return requirements
+        counts = {
+            (item.day, item.service_code, item.shift_code): item.required_count
+            for item in requirements
+        }
+        counts.update(self.requirement_counts)
+        return [
+            MonthlyRequirement(
+                year=year,
+                month=month,
+                day=day,
+                service_code=service_code,
+                shift_code=shift_code,
+                required_count=count,
+            )
+            for (day, service_code, shift_code), count in sorted(counts.items())
+        ]
+
+    def apply_constraints(
+        self, constraint_map: Dict[Tuple[int, int], str]
+    ) -> Dict[Tuple[int, int], str]:
+        changed = dict(constraint_map)
+        for key, code in self.constraints.items():
+            if code:
+                changed[key] = code
+            else:
+                changed.pop(key, None)
+        return changed
+
+
+@dataclass
+class PreparedSchedule:
+    config: MonthConfig
+    nurses: List[Nurse]
+    nurse_ids: List[int]
+    requirements: List[MonthlyRequirement]
+    constraint_map: Dict[Tuple[int, int], str]
+    adjustment_map: Dict[int, NurseMonthAdjustment]
+    locked_entries: List[ScheduleEntry]
+    invalid_locked_keys: Set[Tuple[int, int]]
+    locked_violations: List[str]
+    slots: List[Slot]
+    shifts: ShiftCatalogue
+    eligibility: Optional[Eligibility] = None
+    unfilled_report: List[Dict[str, str]] = field(default_factory=list)
+    problem: Optional[SolveProblem] = None
+    capacity: List[Dict[str, object]] = field(default_factory=list)
+
+
+def prepare_schedule(
+    session: Session,
+    year: int,
+    month: int,
+    group: str | None = None,
+    warm_start: bool = True,
+    profiler: Optional[SolveProfiler] = None,
+    variant: Optional[ScheduleVariant] = None,
+    read_only: bool = False,
+) -> PreparedSchedule:
+    """Read everything the solver needs for a month without changing the schedule.
+
+    ``read_only`` leaves a missing month config uncreated, and a ``variant`` is
+    applied to copies so the session never sees its changes.
+    """
+    profiler = profiler or SolveProfiler()
+    shifts = shift_catalogue(session)
+    if read_only:
+        config = _month_config_snapshot(session, year, month)
+    else:
+        config = get_or_create_month_config(session, year, month)
+    service_roles = {
+        service.code: service.role for service in session.scalars(select(Service))
+    }
+    nurse_query = select(Nurse)
+    role = _role_from_group(session, group)
+    if role:
+        categories = _categories_for_role(session, role)
+        if categories:
+            nurse_query = nurse_query.where(Nurse.category.in_(categories))
+        else:
+            nurse_query = nurse_query.where(Nurse.category == role)
+    nurses: List[Nurse] = sort_nurses_by_category(list(session.scalars(nurse_query)))
+    if variant is not None:
+        nurses = variant.apply_nurses(nurses)
+    nurse_ids = [nurse.id for nurse in nurses]
+    service_codes = []
+    if role:
+        service_codes = list(
+            session.scalars(select(Service.code).where(Service.role == role))
+        )
+    requirements_query = select(MonthlyRequirement).where(
+        MonthlyRequirement.year == year,
+        MonthlyRequirement.month == month,
+    )
+    if service_codes:
+        requirements_query = requirements_query.where(
+            MonthlyRequirement.service_code.in_(service_codes)
+        )
+    requirements_query = requirements_query.order_by(
+        MonthlyRequirement.day,
+        MonthlyRequirement.service_code,
+        MonthlyRequirement.shift_code,
+    )
+    requirements: List[MonthlyRequirement] = list(session.scalars(requirements_query))
+    if variant is not None:
+        requirements = variant.apply_requirements(requirements, year, month)
+    constraints_query = select(ConstraintEntry).where(
+        ConstraintEntry.year == year,
+        ConstraintEntry.month == month,
+    )
+    if nurse_ids:
+        constraints_query = constraints_query.where(
+            ConstraintEntry.nurse_id.in_(nurse_ids)
+        )
+    constraints: List[ConstraintEntry] = list(session.scalars(constraints_query))
+    constraint_map: Dict[Tuple[int, int], str] = {
+        (item.nurse_id, item.day): item.code for item in constraints
+    }
+    if variant is not None:
+        constraint_map = variant.apply_constraints(constraint_map)
+
+    adjustments_query = select(NurseMonthAdjustment).where(
+        NurseMonthAdjustment.year == year,
+        NurseMonthAdjustment.month == month,
+    )
+    if nurse_ids:
+        adjustments_query = adjustments_query.where(
+            NurseMonthAdjustment.nurse_id.in_(nurse_ids)
+        )
+    adjustments: List[NurseMonthAdjustment] = list(session.scalars(adjustments_query))
+    adjustment_map: Dict[int, NurseMonthAdjustment] = {
+        item.nurse_id: item for item in adjustments
+    }
+
+    locked_query = select(ScheduleEntry).where(
+        ScheduleEntry.year == year,
+        ScheduleEntry.month == month,
+        ScheduleEntry.locked.is_(True),
+    )
+    if nurse_ids:
+        locked_query = locked_query.where(ScheduleEntry.nurse_id.in_(nurse_ids))
+    locked_entries: List[ScheduleEntry] = list(session.scalars(locked_query))
+    locked_violations: List[str] = []
+    invalid_locked_keys: Set[Tuple[int, int]] = set()
+    if locked_entries:
+        grouped_locked: Dict[Tuple[int, int], List[ScheduleEntry]] = defaultdict(list)
+        for entry in locked_entries:
+            grouped_locked[(entry.nurse_id, entry.day)].append(entry)
+        for (nurse_id, day), entries in grouped_locked.items():
+            if len(entries) < 2:
+                continue
+            nurse = next((item for item in nurses if item.id == nurse_id), None)
+            if not nurse:
+                continue
+            codes = [item.shift_code for item in entries]
+            metas = [shifts.get(code) for code in codes]
+            invalid = False
+            for idx, first_meta in enumerate(metas):
+                for jdx in range(idx + 1, len(metas)):
+                    second_meta = metas[jdx]
+                    if not first_meta or not second_meta:
+                        invalid = True
+                        continue
+                    if first_meta.shift_type == second_meta.shift_type:
+                        invalid = True
+                        continue
+                    if _shifts_overlap(first_meta, second_meta):
+                        invalid = True
+                        continue
+                    if not _allows_double_shift(
+                        nurse, first_meta.shift_type, second_meta.shift_type
+                    ):
+                        invalid = True
+            if invalid:
+                invalid_locked_keys.add((nurse_id, day))
+                locked_violations.append(
+                    f"Dia {day} {nurse.name}: turnos bloqueados removidos"
+                )
+        locked_entries = [
+            entry
+            for entry in locked_entries
+            if (entry.nurse_id, entry.day) not in invalid_locked_keys
+        ]
+
+    # The previous auto assignments become solver hints once they are replaced.
+    hint_entries: List[Tuple[int, int, str, str]] = []
+    if warm_start:
+        hint_entries = _load_hint_entries(session, year, month, nurse_ids)
+        if not hint_entries:
+            hint_entries = _previous_month_hint_entries(
+                session, year, month, nurse_ids
+            )
+
+    previous_tail = _previous_month_tail(session, year, month, nurse_ids)
+
+    locked_counts: Dict[Tuple[int, str, str], int] = defaultdict(int)
+    locked_days: Dict[Tuple[int, int], bool] = {}
+    for entry in locked_entries:
+        locked_counts[(entry.day, entry.service_code, entry.shift_code)] += 1
+        locked_days[(entry.nurse_id, entry.day)] = True
+
+    slots = _build_slots(requirements, locked_counts, year, month, shifts)
+    profiler.slots = len(slots)
+    profiler.lap("load")
+    prepared = PreparedSchedule(
+        config=config,
+        nurses=nurses,
+        nurse_ids=nurse_ids,
+        requirements=requirements,
+        constraint_map=constraint_map,
+        adjustment_map=adjustment_map,
+        locked_entries=locked_entries,
+        invalid_locked_keys=invalid_locked_keys,
+        locked_violations=locked_violations,
+        slots=slots,
+        shifts=shifts,
+    )
+    if not slots:
+        return prepared
+
+    snapshots = [NurseSnapshot.from_nurse(nurse) for nurse in nurses]
+    eligibility = _compute_eligibility(
+        snapshots,
+        slots,
+        constraint_map,
+        locked_days,
+        config.pedidos_folga_hard,
+        shifts,
+    )
+    _drop_previous_tail_conflicts(
+        eligibility, slots, previous_tail, (config.min_rest_hours or 11) * 60, shifts
+    )
+    settings = SolveSettings.from_config(config)
+    locked = [
+        (entry.nurse_id, entry.day, entry.service_code, entry.shift_code)
+        for entry in locked_entries
+    ]
+    prepared.capacity, unfillable = analyse_capacity(
+        snapshots,
+        slots,
+        eligibility,
+        locked,
+        previous_tail,
+        settings,
+        year,
+        month,
+        shifts,
+    )
+    prepared.eligibility = eligibility
+    profiler.lap("eligibility")
+    prepared.unfilled_report = [
+        {
+            "day": slot.day,
+            "service_code": slot.service_code,
+            "shift_code": slot.shift_code,
+            "reason": unfillable.get(
+                slot.index, "Sem enfermeiros elegíveis (restrições hard)"
+            ),
+        }
+        for slot in slots
+        if not eligibility.candidates.get(slot.index)
+    ]
+    role_hint = _role_hint_from_group(group)
+    prepared.problem = SolveProblem(
+        year=year,
+        month=month,
+        role_hint=role_hint,
+        nurses=snapshots,
+        slots=slots,
+        candidates=eligibility.candidates,
+        pedido_pairs=eligibility.pedido_pairs,
+        constraint_map=constraint_map,
+        adjustment_map={
+            nurse_id: AdjustmentSnapshot.from_adjustment(item)
+            for nurse_id, item in adjustment_map.items()
+        },
+        locked=locked,
+        settings=settings,
+        service_roles=service_roles,
+        shifts=shifts,
+        average_bank=(
+            int(sum(nurse.hour_balance_minutes for nurse in snapshots) / len(snapshots))
+            if snapshots
+            else 0
+        ),
+        shift_targets=_shift_balance_targets(
+            snapshots, slots, role_hint, service_roles, shifts
+        ),
+        hints=_hints_for_slots(hint_entries, slots, eligibility.candidates),
+        previous_tail=previous_tail,
+    )
+    profiler.lap("problem")
+    return prepared
+
+
+def _clear_replaced_entries(
+    session: Session, prepared: PreparedSchedule, year: int, month: int
+) -> None:
+    for nurse_id, day in prepared.invalid_locked_keys:
+        session.execute(
+            delete(ScheduleEntry).where(
+                ScheduleEntry.year == year,
+                ScheduleEntry.month == month,
+                ScheduleEntry.day == day,
+                ScheduleEntry.nurse_id == nurse_id,
+                ScheduleEntry.locked.is_(True),
+            )
+        )
+
+    # Remove previous auto assignments (including rest placeholders).
+    delete_query = delete(ScheduleEntry).where(
+        ScheduleEntry.year == year,
+        ScheduleEntry.month == month,
+        ScheduleEntry.locked.is_(False),
+    )
+    if prepared.nurse_ids:
+        delete_query = delete_query.where(
+            ScheduleEntry.nurse_id.in_(prepared.nurse_ids)
+        )
+    session.execute(delete_query)
+
+
+def _solution_rows(
+    slots: List[Slot],
+    eligibility: Eligibility,
+    assigned: Dict[int, int],
+    unfilled: List[int],
+    year: int,
+    month: int,
+) -> Tuple[List[Dict[str, object]], List[Dict[str, str]]]:
+    """Entry rows for the assigned slots and the report of the unfilled ones."""
+    unfilled_slots = set(unfilled)
+    rows: List[Dict[str, object]] = []
+    unfilled_report: List[Dict[str, str]] = []
+    for slot in slots:
+        assigned_nurse = assigned.get(slot.index)
+        if assigned_nurse is None:
+            if slot.index in unfilled_slots:
+                reason_counts = eligibility.reason_counts.get(slot.index, {})
+                reason = "Limitações globais"
+                if reason_counts:
+                    reason = f"Elegíveis insuficientes ({max(reason_counts.items(), key=lambda item: item[1])[0]})"
+                unfilled_report.append(
+                    {
                         "day": slot.day,
                         "service_code": slot.service_code,
                         "shift_code": slot.shift_code,
@@ -1052,139 +3375,559 @@ def generate_schedule(session: Session, year: int, month: int, group: str | None
                     }
                 )
             continue
-        entry = ScheduleEntry(
-            nurse_id=assigned_nurse,
-            year=year,
-            month=month,
-            day=slot.day,
-            service_code=slot.service_code,
-            shift_code=slot.shift_code,
-            locked=False,
-            source="auto",
-        )
-        session.add(entry)
-        created_entries.append(entry)
+        rows.append(
+            _entry_row(
+                assigned_nurse,
+                year,
+                month,
+                slot.day,
+                slot.service_code,
+                slot.shift_code,
+            )
+        )
+    return rows, unfilled_report
 
-    session.flush()
-    _insert_rest_entries(session, created_entries, year, month)
-    session.flush()
 
-    assignments: List[ScheduleEntry] = list(
-        session.scalars(
-            select(ScheduleEntry).where(
-                ScheduleEntry.year == year,
-                ScheduleEntry.month == month,
+def _replace_schedule_drafts(
+    session: Session,
+    year: int,
+    month: int,
+    group: str | None,
+    prepared: PreparedSchedule,
+    solutions: List[PoolSolution],
+) -> None:
+    """Keep the solutions of this run as ranked drafts, dropping the previous run's."""
+    session.execute(
+        delete(ScheduleDraft).where(
+            ScheduleDraft.year == year,
+            ScheduleDraft.month == month,
+            ScheduleDraft.group == group,
+        )
+    )
+    draft_rows = []
+    for rank, solution in enumerate(solutions):
+        rows, unfilled = _solution_rows(
+            prepared.slots,
+            prepared.eligibility,
+            solution.assigned,
+            solution.unfilled,
+            year,
+            month,
+        )
+        draft_rows.append(
+            {
+                "year": year,
+                "month": month,
+                "group": group,
+                "rank": rank,
+                "objective": solution.objective,
+                "nurse_ids": prepared.nurse_ids,
+                "entries": [
+                    [row[key] for key in ("nurse_id", "day", "service_code", "shift_code")]
+                    for row in rows
+                ],
+                "unfilled": prepared.unfilled_report + unfilled,
+            }
+        )
+    if draft_rows:
+        session.execute(insert(ScheduleDraft), draft_rows)
+
+
+def generate_schedule(
+    session: Session,
+    year: int,
+    month: int,
+    group: str | None = None,
+    progress: Optional[Callable[[Dict[str, float]], None]] = None,
+    stop_event: Optional[threading.Event] = None,
+    decompose: Optional[bool] = None,
+    warm_start: bool = True,
+    formulation: Optional[str] = None,
+    profiler: Optional[SolveProfiler] = None,
+    time_limit: Optional[float] = None,
+    dump_model: Optional[bool] = None,
+    objective: Optional[str] = None,
+):
+    profiler = profiler or SolveProfiler()
+    prepared = prepare_schedule(session, year, month, group, warm_start, profiler)
+    _clear_replaced_entries(session, prepared, year, month)
+    profiler.lap("clear")
+    config = prepared.config
+    nurses = prepared.nurses
+    adjustment_map = prepared.adjustment_map
+    locked_entries = prepared.locked_entries
+    locked_violations = prepared.locked_violations
+    slots = prepared.slots
+    profile = solver_profile(config)
+    if time_limit is not None:
+        profile = replace(profile, time_limit_seconds=time_limit)
+    profiler.profile = asdict(profile)
+
+    # No slots to process -> return early (only locked entries exist)
+    if prepared.problem is None:
+        assignments = locked_entries
+        _update_hour_balances(
+            session,
+            nurses,
+            assignments,
+            year,
+            month,
+            adjustment_map,
+            prepared.shifts,
+        )
+        profiler.lap("hour_balances")
+        stats = collect_nurse_stats(session, nurses, year, month)
+        profiler.lap("stats")
+        profiler.log(year, month, group)
+        return assignments, [], [], stats
+
+    eligibility = prepared.eligibility
+    unfilled_report = list(prepared.unfilled_report)
+    previous_deltas = _month_stat_deltas(session, year, month, prepared.nurse_ids)
+    fingerprint = problem_fingerprint(
+        prepared.problem,
+        {
+            nurse.id: (nurse.hour_balance_minutes or 0) - previous_deltas.get(nurse.id, 0)
+            for nurse in nurses
+        },
+        (
+            group,
+            warm_start,
+            decompose,
+            formulation,
+            asdict(profile),
+            SOLUTION_POOL_SIZE,
+            objective,
+        ),
+    )
+    if SOLVER_DUMP_MODELS if dump_model is None else dump_model:
+        # The whole month as one model, even when it is solved in parts.
+        path = dump_schedule_model(
+            prepared.problem, formulation=formulation, label=fingerprint[:12]
+        )
+        logger.info("Schedule model written to %s", path)
+        profiler.lap("dump")
+    outcome = solve_cache.get(session, fingerprint)
+    if outcome is not None:
+        profiler.lap("cache")
+    else:
+        outcome = solve_problem(
+            prepared.problem,
+            progress,
+            stop_event,
+            decompose,
+            formulation,
+            profiler,
+            pool_size=SOLUTION_POOL_SIZE,
+            objective=objective,
+            profile=profile,
+        )
+        profiler.lap("solve")
+        profiler.response_stats.extend(outcome.response_stats)
+        if outcome.status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            # Without a model solution the constructive schedule still keeps the hard rules.
+            assigned = construct_schedule(prepared.problem)
+            outcome = SolveOutcome(
+                status=outcome.status,
+                assigned=assigned,
+                unfilled=[
+                    slot.index
+                    for slot in slots
+                    if slot.index not in assigned
+                    and eligibility.candidates.get(slot.index)
+                ],
+                conflicts=outcome.conflicts,
+            )
+            profiler.lap("fallback")
+        # A stopped search is only the best so far; the next generate may do better.
+        if stop_event is None or not stop_event.is_set():
+            solve_cache.put(session, fingerprint, outcome)
+
+    solutions: List[PoolSolution] = []
+    if outcome.status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        solutions = [
+            PoolSolution(outcome.objective, outcome.assigned, outcome.unfilled),
+            *outcome.alternatives,
+        ]
+
+    rows, solver_unfilled = _solution_rows(
+        slots, eligibility, outcome.assigned, outcome.unfilled, year, month
+    )
+    unfilled_report += solver_unfilled
+    _replace_schedule_drafts(session, year, month, group, prepared, solutions)
+
+    occupied = {(entry.nurse_id, entry.day) for entry in locked_entries}
+    created = _persist_entries(
+        session, rows, occupied, year, month, shifts=prepared.shifts
+    )
+    assignments: List[ScheduleEntry] = locked_entries + created
+    if group:
+        # The response shows the whole month, other groups included.
+        assignments += _entries_outside(session, prepared.nurse_ids, year, month)
+
+    violations = [
+        f"Dia {item['day']} {item['service_code']}/{item['shift_code']}: {item['reason']}"
+        for item in unfilled_report
+    ]
+    if config.prefer_folga_after_nd:
+        violations.extend(
+            _folga_after_nd_violations(
+                assignments, nurses, year, month, prepared.shifts
             )
         )
+    if locked_violations:
+        violations.extend(locked_violations)
+    violations.extend(conflict_violations(outcome.conflicts, nurses))
+    profiler.lap("persist")
+
+    _update_hour_balances(
+        session,
+        nurses,
+        assignments,
+        year,
+        month,
+        adjustment_map,
+        prepared.shifts,
+    )
+    profiler.lap("hour_balances")
+
+    stats = collect_nurse_stats(session, nurses, year, month)
+    profiler.lap("stats")
+    profiler.log(year, month, group)
+
+    return assignments, unfilled_report, violations, stats
+
+
+@dataclass
+class SimulationResult:
+    name: str
+    status: str
+    entries: List[Dict[str, object]]
+    unfilled: List[Dict[str, str]]
+    violations: List[str]
+    stats: List[Dict[str, int]]
+    added: List[Tuple[int, int, str, str]]
+    removed: List[Tuple[int, int, str, str]]
+
+
+def _simulation_result(
+    session: Session,
+    prepared: PreparedSchedule,
+    outcome: SolveOutcome,
+    variant: ScheduleVariant,
+    year: int,
+    month: int,
+) -> SimulationResult:
+    """Turn a solve into entries, stats and a diff without writing any of it."""
+    rows: List[Dict[str, object]] = []
+    unfilled_report = list(prepared.unfilled_report)
+    status = "EMPTY"
+    if prepared.problem is not None:
+        status = cp_model.CpSolver().StatusName(outcome.status)
+        rows, solver_unfilled = _solution_rows(
+            prepared.slots,
+            prepared.eligibility,
+            outcome.assigned,
+            outcome.unfilled,
+            year,
+            month,
+        )
+        unfilled_report += solver_unfilled
+    locked_rows = []
+    for entry in prepared.locked_entries:
+        row = _entry_row(
+            entry.nurse_id,
+            year,
+            month,
+            entry.day,
+            entry.service_code,
+            entry.shift_code,
+            entry.source,
+        )
+        row["locked"] = True
+        locked_rows.append(row)
+    occupied = {(row["nurse_id"], row["day"]) for row in locked_rows + rows}
+    rest_rows = _rest_entry_rows(
+        [(row["nurse_id"], row["day"], row["shift_code"]) for row in rows],
+        occupied,
+        year,
+        month,
+        prepared.shifts,
+    )
+    entry_rows = locked_rows + rows + rest_rows
+    # Detached entries let the persisted path's rules run on the simulated month.
+    entries = [ScheduleEntry(**row) for row in entry_rows]
+
+    violations = [
+        f"Dia {item['day']} {item['service_code']}/{item['shift_code']}: {item['reason']}"
+        for item in unfilled_report
+    ]
+    if prepared.config.prefer_folga_after_nd:
+        violations.extend(
+            _folga_after_nd_violations(
+                entries, prepared.nurses, year, month, prepared.shifts
+            )
+        )
+    violations.extend(prepared.locked_violations)
+    violations.extend(conflict_violations(outcome.conflicts, prepared.nurses))
+
+    stat_rows = _month_stat_rows(
+        prepared.nurses,
+        entries,
+        year,
+        month,
+        prepared.adjustment_map,
+        build_calendar_summaries(year, month, prepared.constraint_map.items()),
+        prepared.shifts,
     )
+    previous_deltas = _month_stat_deltas(session, year, month, prepared.nurse_ids)
+    balances = {nurse.id: nurse.hour_balance_minutes or 0 for nurse in prepared.nurses}
+    stats = []
+    for row in stat_rows:
+        nurse_id = row["nurse_id"]
+        bank = (
+            balances[nurse_id] - previous_deltas.get(nurse_id, 0) + row["delta_minutes"]
+        )
+        stats.append(
+            {
+                "nurse_id": nurse_id,
+                "target_minutes": row["target_minutes"],
+                "actual_minutes": row["actual_minutes"],
+                "delta_minutes": row["delta_minutes"],
+                "bank_minutes": bank,
+                "previous_bank_minutes": bank - row["delta_minutes"],
+            }
+        )
 
-    violations = [
-        f"Dia {item['day']} {item['service_code']}/{item['shift_code']}: {item['reason']}"
-        for item in unfilled_report
-    ]
-    if config.prefer_folga_after_nd:
-        violations.extend(_folga_after_nd_violations(assignments, nurses, year, month))
-    if locked_violations:
-        violations.extend(locked_violations)
-
-    _update_hour_balances(
+    current = _current_cells(
         session,
-        nurses,
-        assignments,
         year,
         month,
-        constraint_map,
-        adjustment_map,
+        [nurse_id for nurse_id in prepared.nurse_ids if nurse_id > 0]
+        + list(variant.remove_nurse_ids),
+    )
+    proposed = {
+        (row["nurse_id"], row["day"], row["service_code"], row["shift_code"])
+        for row in rows
+    }
+    return SimulationResult(
+        name=variant.name,
+        status=status,
+        entries=entry_rows,
+        unfilled=unfilled_report,
+        violations=violations,
+        stats=stats,
+        added=sorted(proposed - current),
+        removed=sorted(current - proposed),
     )
 
-    stats = collect_nurse_stats(session, nurses, year, month)
 
-    return assignments, unfilled_report, violations, stats
+def _simulate_outcome(problem: SolveProblem, profile: SolverProfile) -> SolveOutcome:
+    outcome = _solve_model(
+        _build_model(problem),
+        num_workers=profile.num_workers,
+        time_limit=profile.time_limit_seconds,
+        relative_gap=profile.relative_gap,
+        no_improvement=profile.no_improvement_seconds,
+    )
+    if outcome.status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return outcome
+    assigned = construct_schedule(problem)
+    return SolveOutcome(
+        status=outcome.status,
+        assigned=assigned,
+        unfilled=[
+            slot.index
+            for slot in problem.slots
+            if slot.index not in assigned and problem.candidates.get(slot.index)
+        ],
+        conflicts=(
+            explain_infeasibility(problem)
+            if outcome.status == cp_model.INFEASIBLE
+            else []
+        ),
+    )
 
 
-def _fallback_greedy(
+def simulate_schedule(
     session: Session,
-    nurses: List[Nurse],
-    requirements: List[MonthlyRequirement],
-    constraint_map: Dict[Tuple[int, int], str],
-    locked_entries: List[ScheduleEntry],
     year: int,
     month: int,
-    config: MonthConfig,
-    adjustment_map: Dict[int, NurseMonthAdjustment],
-):
-    locked_counts: Dict[Tuple[int, str, str], int] = defaultdict(int)
-    locked_days = {(entry.nurse_id, entry.day): True for entry in locked_entries}
+    group: str | None = None,
+    variants: Optional[List[ScheduleVariant]] = None,
+    time_limit: Optional[float] = None,
+) -> List[SimulationResult]:
+    """Solve what-if copies of a month in memory; the database is only read.
+
+    Every variant is read through the session first, then the models are solved
+    side by side, sharing the CPU cores between them.
+    """
+    variants = variants or [ScheduleVariant()]
+    prepared_list = [
+        prepare_schedule(session, year, month, group, variant=variant, read_only=True)
+        for variant in variants
+    ]
+    problems = [item.problem for item in prepared_list if item.problem is not None]
+    profile = solver_profile(prepared_list[0].config)
+    # The month's profile is shared out between the variants solved side by side.
+    profile = replace(
+        profile,
+        num_workers=max(1, profile.num_workers // max(1, len(problems))),
+        time_limit_seconds=(
+            profile.time_limit_seconds if time_limit is None else time_limit
+        ),
+    )
+    outcomes: Dict[int, SolveOutcome] = {}
+    if problems:
+        with ThreadPoolExecutor(max_workers=len(problems)) as executor:
+            futures = {
+                executor.submit(_simulate_outcome, item.problem, profile): index
+                for index, item in enumerate(prepared_list)
+                if item.problem is not None
+            }
+            for future in as_completed(futures):
+                outcomes[futures[future]] = future.result()
+    return [
+        _simulation_result(
+            session,
+            prepared,
+            outcomes.get(index, SolveOutcome(status=cp_model.UNKNOWN)),
+            variant,
+            year,
+            month,
+        )
+        for index, (prepared, variant) in enumerate(zip(prepared_list, variants))
+    ]
 
-    for entry in locked_entries:
-        locked_counts[(entry.day, entry.service_code, entry.shift_code)] += 1
 
-    assignments_total: Dict[int, int] = defaultdict(int)
-    for entry in locked_entries:
-        assignments_total[entry.nurse_id] += 1
+@dataclass
+class HorizonMonth:
+    year: int
+    month: int
+    assignments: List[ScheduleEntry]
+    unfilled: List[Dict[str, str]]
+    violations: List[str]
+    stats: List[Dict[str, int]]
+    profiler: SolveProfiler
 
-    assigned_days: Dict[Tuple[int, int], bool] = dict(locked_days)
-    created_entries: List[ScheduleEntry] = []
-    unfilled: List[Dict[str, str]] = []
 
-    for req in requirements:
-        remaining = req.required_count - locked_counts[
-            (req.day, req.service_code, req.shift_code)
-        ]
-        if remaining <= 0:
-            continue
-        shift_meta = SHIFT_LOOKUP.get(req.shift_code)
-        if not shift_meta:
-            continue
+def _add_months(year: int, month: int, offset: int) -> Tuple[int, int]:
+    index = year * 12 + month - 1 + offset
+    return index // 12, index % 12 + 1
 
-        for _ in range(remaining):
-            best = None
-            for nurse in nurses:
-                constraint = constraint_map.get((nurse.id, req.day), "")
-                eligible, _, pedido_flag = _static_eligibility(
-                    nurse, Slot(0, req.day, req.service_code, req.shift_code, 0, 0), constraint, locked_days, config.pedidos_folga_hard
-                )
-                if not eligible:
-                    continue
-                if assigned_days.get((nurse.id, req.day)):
-                    continue
-                weight = 1 if pedido_flag else 0
-                score = (weight, assignments_total[nurse.id], nurse.id)
-                if best is None or score < best[0]:
-                    best = (score, nurse)
 
-            if not best:
-                unfilled.append(
-                    {
-                        "day": req.day,
-                        "service_code": req.service_code,
-                        "shift_code": req.shift_code,
-                        "reason": "Sem enfermeiros elegíveis (fallback)",
-                    }
-                )
-                continue
+def _horizon_progress(
+    progress: Callable[[Dict[str, float]], None],
+    counter: List[int],
+    year: int,
+    month: int,
+) -> Callable[[Dict[str, float]], None]:
+    # Solution numbers keep growing across months so listeners can tell events apart.
+    def report(event: Dict[str, float]) -> None:
+        counter[0] += 1
+        progress({**event, "solution": counter[0], "year": year, "month": month})
 
-            selected = best[1]
-            entry = ScheduleEntry(
-                nurse_id=selected.id,
-                year=year,
-                month=month,
-                day=req.day,
-                service_code=req.service_code,
-                shift_code=req.shift_code,
-                locked=False,
-                source="auto",
+    return report
+
+
+def generate_horizon(
+    session: Session,
+    year: int,
+    month: int,
+    months: int,
+    group: str | None = None,
+    progress: Optional[Callable[[Dict[str, float]], None]] = None,
+    stop_event: Optional[threading.Event] = None,
+    time_budget: Optional[float] = None,
+) -> List[HorizonMonth]:
+    """Generate consecutive months in order, each one starting from the last.
+
+    Every month reads the tail of the month generated before it, so rest and
+    consecutive-day rules hold across the 1st. The months share one time
+    budget: time a month does not use is left to the ones after it.
+    """
+    if time_budget is None:
+        time_budget = solver_time_budget(session, year, month, months)
+    started = time.monotonic()
+    counter = [0]
+    results: List[HorizonMonth] = []
+    for offset in range(months):
+        if offset and stop_event is not None and stop_event.is_set():
+            break
+        current_year, current_month = _add_months(year, month, offset)
+        remaining = time_budget - (time.monotonic() - started)
+        profiler = SolveProfiler()
+        assignments, unfilled, violations, stats = generate_schedule(
+            session,
+            current_year,
+            current_month,
+            group,
+            progress=(
+                _horizon_progress(progress, counter, current_year, current_month)
+                if progress
+                else None
+            ),
+            stop_event=stop_event,
+            profiler=profiler,
+            time_limit=max(1.0, remaining / (months - offset)),
+        )
+        results.append(
+            HorizonMonth(
+                current_year,
+                current_month,
+                assignments,
+                unfilled,
+                violations,
+                stats,
+                profiler,
             )
-            session.add(entry)
-            created_entries.append(entry)
-            assignments_total[selected.id] += 1
-            assigned_days[(selected.id, req.day)] = True
+        )
+    return results
 
-    session.flush()
-    _insert_rest_entries(session, created_entries, year, month)
-    session.flush()
 
-    assignments: List[ScheduleEntry] = list(
+def _fixed_neighbour_conflict(
+    slot: Slot,
+    previous_codes: List[str],
+    next_codes: List[str],
+    min_rest_minutes: int,
+    shifts: Mapping[str, ShiftMeta],
+) -> bool:
+    for code in previous_codes:
+        shift_meta = shifts.get(code)
+        if shift_meta and shift_meta.shift_type == "N":
+            return True
+        if not _has_minimum_rest(code, slot.shift_code, min_rest_minutes, shifts):
+            return True
+    slot_meta = shifts.get(slot.shift_code)
+    if next_codes and slot_meta and slot_meta.shift_type == "N":
+        return True
+    return any(
+        not _has_minimum_rest(slot.shift_code, code, min_rest_minutes, shifts)
+        for code in next_codes
+    )
+
+
+def repair_schedule(
+    session: Session,
+    year: int,
+    month: int,
+    nurse_id: int,
+    day: int,
+    extra_nurse_ids: Optional[List[int]] = None,
+    window_days: int = REPAIR_WINDOW_DAYS,
+):
+    """Re-solve the neighbourhood of an edited cell, keeping the rest of the month fixed.
+
+    Only unlocked automatic entries of the affected nurses inside the day window
+    are reassigned; the edited cell, manual and locked entries stay as they are.
+    """
+    shifts = shift_catalogue(session)
+    config = get_or_create_month_config(session, year, month)
+    days = _days_in_month(year, month)
+    first_day = max(1, day - window_days)
+    last_day = min(days, day + window_days)
+
+    month_entries: List[ScheduleEntry] = list(
         session.scalars(
             select(ScheduleEntry).where(
                 ScheduleEntry.year == year,
@@ -1192,27 +3935,386 @@ def _fallback_greedy(
             )
         )
     )
+    edited_cells = {
+        (entry.service_code, entry.shift_code)
+        for entry in month_entries
+        if entry.nurse_id == nurse_id and entry.day == day
+    }
+    # Nurses sharing the edited cell are the ones most likely left over-assigned.
+    affected_ids = {nurse_id, *(extra_nurse_ids or [])}
+    affected_ids.update(
+        entry.nurse_id
+        for entry in month_entries
+        if entry.day == day
+        and not entry.locked
+        and entry.source == "auto"
+        and (entry.service_code, entry.shift_code) in edited_cells
+    )
+    all_nurses: List[Nurse] = list(session.scalars(select(Nurse)))
+
+    # A cell left uncovered by the edit can be taken by anyone free on that day.
+    day_requirements = list(
+        session.scalars(
+            select(MonthlyRequirement).where(
+                MonthlyRequirement.year == year,
+                MonthlyRequirement.month == month,
+                MonthlyRequirement.day == day,
+            )
+        )
+    )
+    day_counts: Dict[Tuple[int, str, str], int] = defaultdict(int)
+    busy_ids: Set[int] = set()
+    for entry in month_entries:
+        if entry.day == day:
+            day_counts[(entry.day, entry.service_code, entry.shift_code)] += 1
+            busy_ids.add(entry.nurse_id)
+    shortfall = _build_slots(day_requirements, day_counts, year, month, shifts)
+    if shortfall:
+        day_constraints = {
+            (item.nurse_id, item.day): item.code
+            for item in session.scalars(
+                select(ConstraintEntry).where(
+                    ConstraintEntry.year == year,
+                    ConstraintEntry.month == month,
+                    ConstraintEntry.day == day,
+                )
+            )
+        }
+        free_nurses = [
+            NurseSnapshot.from_nurse(nurse)
+            for nurse in all_nurses
+            if nurse.id not in busy_ids and nurse.id != nurse_id
+        ]
+        shortfall_candidates = _compute_eligibility(
+            free_nurses,
+            shortfall,
+            day_constraints,
+            {},
+            config.pedidos_folga_hard,
+            shifts,
+        ).candidates
+        for candidate_ids in shortfall_candidates.values():
+            affected_ids.update(candidate_ids)
+
+    nurses: List[Nurse] = sort_nurses_by_category(
+        [nurse for nurse in all_nurses if nurse.id in affected_ids]
+    )
+    affected_ids = {nurse.id for nurse in nurses}
+
+    def is_free(entry: ScheduleEntry) -> bool:
+        return (
+            entry.nurse_id in affected_ids
+            and not entry.locked
+            and entry.source in {"auto", "auto_rest"}
+            and first_day <= entry.day <= last_day
+            and not (entry.nurse_id == nurse_id and entry.day == day)
+        )
+
+    freed = [entry for entry in month_entries if is_free(entry)]
+    fixed = [entry for entry in month_entries if not is_free(entry)]
+
+    covered_counts: Dict[Tuple[int, str, str], int] = defaultdict(int)
+    for entry in fixed:
+        covered_counts[(entry.day, entry.service_code, entry.shift_code)] += 1
+    requirements: List[MonthlyRequirement] = list(
+        session.scalars(
+            select(MonthlyRequirement)
+            .where(
+                MonthlyRequirement.year == year,
+                MonthlyRequirement.month == month,
+                MonthlyRequirement.day >= first_day,
+                MonthlyRequirement.day <= last_day,
+            )
+            .order_by(
+                MonthlyRequirement.day,
+                MonthlyRequirement.service_code,
+                MonthlyRequirement.shift_code,
+            )
+        )
+    )
+    slots = _build_slots(requirements, covered_counts, year, month, shifts)
+
+    constraint_map: Dict[Tuple[int, int], str] = {
+        (item.nurse_id, item.day): item.code
+        for item in session.scalars(
+            select(ConstraintEntry).where(
+                ConstraintEntry.year == year,
+                ConstraintEntry.month == month,
+                ConstraintEntry.nurse_id.in_(affected_ids),
+            )
+        )
+    }
+    adjustment_map: Dict[int, NurseMonthAdjustment] = {
+        item.nurse_id: item
+        for item in session.scalars(
+            select(NurseMonthAdjustment).where(
+                NurseMonthAdjustment.year == year,
+                NurseMonthAdjustment.month == month,
+                NurseMonthAdjustment.nurse_id.in_(affected_ids),
+            )
+        )
+    }
+
+    fixed_codes: Dict[Tuple[int, int], List[str]] = defaultdict(list)
+    for entry in fixed:
+        if entry.nurse_id in affected_ids and entry.service_code != "REST":
+            fixed_codes[(entry.nurse_id, entry.day)].append(entry.shift_code)
+    previous_tail = _previous_month_tail(session, year, month, list(affected_ids))
+    for tail_nurse_id, tail_day, shift_code in previous_tail:
+        fixed_codes[(tail_nurse_id, tail_day)].append(shift_code)
+    locked_days: Dict[Tuple[int, int], bool] = {
+        (entry.nurse_id, entry.day): True
+        for entry in fixed
+        if entry.nurse_id in affected_ids
+    }
+    # The edited cell is the coordinator's decision, even when it was cleared.
+    locked_days[(nurse_id, day)] = True
+
+    snapshots = [NurseSnapshot.from_nurse(nurse) for nurse in nurses]
+    eligibility = _compute_eligibility(
+        snapshots, slots, constraint_map, locked_days, config.pedidos_folga_hard, shifts
+    )
+    # The model only links rest rules between its own variables, so fixed
+    # neighbours outside the repaired cells are checked here.
+    min_rest_minutes = (config.min_rest_hours or 11) * 60
+    for slot in slots:
+        kept = []
+        for candidate_id in eligibility.candidates.get(slot.index, []):
+            if _fixed_neighbour_conflict(
+                slot,
+                fixed_codes.get((candidate_id, slot.day - 1), []),
+                fixed_codes.get((candidate_id, slot.day + 1), []),
+                min_rest_minutes,
+                shifts,
+            ):
+                eligibility.reason_counts[slot.index]["Descanso mínimo"] += 1
+                continue
+            kept.append(candidate_id)
+        eligibility.candidates[slot.index] = kept
+
+    categories = {nurse.category for nurse in nurses}
+    peers = [nurse for nurse in all_nurses if nurse.category in categories]
+    average_bank = (
+        int(sum(nurse.hour_balance_minutes for nurse in peers) / len(peers))
+        if peers
+        else 0
+    )
+    problem = SolveProblem(
+        year=year,
+        month=month,
+        role_hint=None,
+        nurses=snapshots,
+        slots=slots,
+        candidates=eligibility.candidates,
+        pedido_pairs=eligibility.pedido_pairs,
+        constraint_map=constraint_map,
+        adjustment_map={
+            item_id: AdjustmentSnapshot.from_adjustment(item)
+            for item_id, item in adjustment_map.items()
+        },
+        locked=[
+            (entry.nurse_id, entry.day, entry.service_code, entry.shift_code)
+            for entry in fixed
+            if entry.nurse_id in affected_ids
+        ],
+        settings=SolveSettings.from_config(config),
+        service_roles={},
+        shifts=shifts,
+        average_bank=average_bank,
+        shift_targets={},
+        hints=_hints_for_slots(
+            [
+                (entry.nurse_id, entry.day, entry.service_code, entry.shift_code)
+                for entry in freed
+                if entry.service_code != "REST"
+            ],
+            slots,
+            eligibility.candidates,
+        ),
+        previous_tail=previous_tail,
+    )
+    outcome = _solve_model(
+        _build_model(problem),
+        num_workers=min(SOLVER_NUM_WORKERS, available_cpu_count()),
+        time_limit=REPAIR_TIME_LIMIT_SECONDS,
+    )
+    if outcome.status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        stats = collect_nurse_stats(session, nurses, year, month)
+        return month_entries, [], ["Reparação sem solução viável"], stats
+
+    for entry in freed:
+        session.delete(entry)
+    session.flush()
 
+    unfilled_report: List[Dict[str, str]] = []
+    rows: List[Dict[str, object]] = []
+    for slot in slots:
+        assigned_nurse = outcome.assigned.get(slot.index)
+        if assigned_nurse is None:
+            reason = "Sem enfermeiros elegíveis (restrições hard)"
+            if eligibility.candidates.get(slot.index):
+                reason = "Limitações globais"
+            unfilled_report.append(
+                {
+                    "day": slot.day,
+                    "service_code": slot.service_code,
+                    "shift_code": slot.shift_code,
+                    "reason": reason,
+                }
+            )
+            continue
+        rows.append(
+            _entry_row(
+                assigned_nurse,
+                year,
+                month,
+                slot.day,
+                slot.service_code,
+                slot.shift_code,
+            )
+        )
+    created = _persist_entries(
+        session,
+        rows,
+        {(entry.nurse_id, entry.day) for entry in fixed},
+        year,
+        month,
+        rest_sources=[
+            (entry.nurse_id, entry.day, entry.shift_code)
+            for entry in fixed
+            if entry.nurse_id in affected_ids
+        ],
+        shifts=shifts,
+    )
+    assignments: List[ScheduleEntry] = fixed + created
     violations = [
         f"Dia {item['day']} {item['service_code']}/{item['shift_code']}: {item['reason']}"
-        for item in unfilled
+        for item in unfilled_report
     ]
-    if config.prefer_folga_after_nd:
-        violations.extend(_folga_after_nd_violations(assignments, nurses, year, month))
-
     _update_hour_balances(
         session,
         nurses,
         assignments,
         year,
         month,
-        constraint_map,
         adjustment_map,
+        shifts,
+    )
+    stats = collect_nurse_stats(session, nurses, year, month)
+    return assignments, unfilled_report, violations, stats
+
+
+def schedule_draft_diff(
+    session: Session, draft: ScheduleDraft, against: Optional[ScheduleDraft] = None
+) -> Tuple[List[Tuple[int, int, str, str]], List[Tuple[int, int, str, str]]]:
+    """Cells a draft adds and removes compared with another draft or the schedule.
+
+    Cells are (nurse_id, day, service_code, shift_code); locked entries and rest
+    placeholders are never part of a draft and are left out of the comparison.
+    """
+    if against is not None:
+        current = {tuple(cell) for cell in against.entries}
+    else:
+        current = _current_cells(session, draft.year, draft.month, draft.nurse_ids)
+    proposed = {tuple(cell) for cell in draft.entries}
+    return sorted(proposed - current), sorted(current - proposed)
+
+
+def _current_cells(
+    session: Session, year: int, month: int, nurse_ids: List[int]
+) -> Set[Tuple[int, int, str, str]]:
+    """Automatic working cells of the month as stored, rest placeholders excluded."""
+    query = select(
+        ScheduleEntry.nurse_id,
+        ScheduleEntry.day,
+        ScheduleEntry.service_code,
+        ScheduleEntry.shift_code,
+    ).where(
+        ScheduleEntry.year == year,
+        ScheduleEntry.month == month,
+        ScheduleEntry.locked.is_(False),
+        ScheduleEntry.service_code != "REST",
+    )
+    if nurse_ids:
+        query = query.where(ScheduleEntry.nurse_id.in_(nurse_ids))
+    return {tuple(row) for row in session.execute(query)}
+
+
+def promote_schedule_draft(session: Session, draft: ScheduleDraft):
+    """Replace the automatic entries of the draft's nurses with its assignments."""
+    shifts = shift_catalogue(session)
+    year, month = draft.year, draft.month
+    nurse_query = select(Nurse)
+    if draft.nurse_ids:
+        nurse_query = nurse_query.where(Nurse.id.in_(draft.nurse_ids))
+    nurses = list(session.scalars(nurse_query))
+    nurse_ids = [nurse.id for nurse in nurses]
+
+    delete_query = delete(ScheduleEntry).where(
+        ScheduleEntry.year == year,
+        ScheduleEntry.month == month,
+        ScheduleEntry.locked.is_(False),
+    )
+    if draft.nurse_ids:
+        delete_query = delete_query.where(ScheduleEntry.nurse_id.in_(nurse_ids))
+    session.execute(delete_query)
+    locked_entries = list(
+        session.scalars(
+            select(ScheduleEntry).where(
+                ScheduleEntry.year == year,
+                ScheduleEntry.month == month,
+                ScheduleEntry.nurse_id.in_(nurse_ids),
+            )
+        )
     )
+    # Cells locked after the draft was made keep the coordinator's choice.
+    occupied = {(entry.nurse_id, entry.day) for entry in locked_entries}
+    rows = [
+        _entry_row(nurse_id, year, month, day, service_code, shift_code)
+        for nurse_id, day, service_code, shift_code in draft.entries
+        if (nurse_id, day) not in occupied and nurse_id in nurse_ids
+    ]
+    created = _persist_entries(session, rows, occupied, year, month, shifts=shifts)
+    assignments: List[ScheduleEntry] = locked_entries + created
+    if draft.group:
+        assignments += _entries_outside(session, nurse_ids, year, month)
 
+    adjustment_map: Dict[int, NurseMonthAdjustment] = {
+        item.nurse_id: item
+        for item in session.scalars(
+            select(NurseMonthAdjustment).where(
+                NurseMonthAdjustment.year == year,
+                NurseMonthAdjustment.month == month,
+                NurseMonthAdjustment.nurse_id.in_(nurse_ids),
+            )
+        )
+    }
+    _update_hour_balances(
+        session, nurses, assignments, year, month, adjustment_map, shifts
+    )
+    unfilled_report = list(draft.unfilled)
+    violations = [
+        f"Dia {item['day']} {item['service_code']}/{item['shift_code']}: {item['reason']}"
+        for item in unfilled_report
+    ]
     stats = collect_nurse_stats(session, nurses, year, month)
+    return assignments, unfilled_report, violations, stats
 
-    return assignments, unfilled, violations, stats
+
+def _entries_outside(
+    session: Session, nurse_ids: List[int], year: int, month: int
+) -> List[ScheduleEntry]:
+    if not nurse_ids:
+        return []
+    return list(
+        session.scalars(
+            select(ScheduleEntry).where(
+                ScheduleEntry.year == year,
+                ScheduleEntry.month == month,
+                ScheduleEntry.nurse_id.not_in(nurse_ids),
+            )
+        )
+    )
 
 
 def _update_hour_balances(
@@ -1221,24 +4323,53 @@ def _update_hour_balances(
     assignments: List[ScheduleEntry],
     year: int,
     month: int,
-    constraint_map: Dict[Tuple[int, int], str],
     adjustment_map: Dict[int, NurseMonthAdjustment],
+    shifts: Optional[ShiftCatalogue] = None,
 ):
+    rows = _month_stat_rows(
+        nurses,
+        assignments,
+        year,
+        month,
+        adjustment_map,
+        month_calendar_summaries(session, year, month),
+        shifts if shifts is not None else shift_catalogue(session),
+    )
+    previous_deltas = _month_stat_deltas(
+        session, year, month, [nurse.id for nurse in nurses]
+    )
+    balance_changes = {
+        row["nurse_id"]: row["delta_minutes"] - previous_deltas.get(row["nurse_id"], 0)
+        for row in rows
+    }
+    _upsert_month_stats(session, rows)
+    _shift_hour_balances(session, balance_changes, nurses)
+
+
+def _month_stat_rows(
+    nurses: List[Nurse],
+    assignments: Iterable[ScheduleEntry],
+    year: int,
+    month: int,
+    adjustment_map: Dict[int, NurseMonthAdjustment],
+    calendar_summaries: Dict[int, NurseCalendarSummary],
+    shifts: Mapping[str, ShiftMeta],
+) -> List[Dict[str, int]]:
+    """Target, actual and delta minutes of each nurse for the given entries."""
     actual_minutes: Dict[int, int] = defaultdict(int)
     for entry in assignments:
         if entry.service_code == "REST":
             continue
-        shift_meta = SHIFT_LOOKUP.get(entry.shift_code)
+        shift_meta = shifts.get(entry.shift_code)
         if not shift_meta:
             continue
         actual_minutes[entry.nurse_id] += shift_meta.minutes
 
+    rows: List[Dict[str, int]] = []
     for nurse in nurses:
         target = _contracted_target_minutes(
             nurse,
-            year,
-            month,
-            constraint_map,
+            calendar_summaries.get(nurse.id) or empty_calendar_summary(year, month),
             adjustment_map.get(nurse.id),
         )
         if target is None:
@@ -1249,30 +4380,84 @@ def _update_hour_balances(
             actual += adjustment.extra_minutes
             actual -= adjustment.reduced_minutes
         delta = actual - target
-        stat = session.scalar(
-            select(NurseMonthStat).where(
-                NurseMonthStat.nurse_id == nurse.id,
-                NurseMonthStat.year == year,
-                NurseMonthStat.month == month,
-            )
+        rows.append(
+            {
+                "nurse_id": nurse.id,
+                "year": year,
+                "month": month,
+                "target_minutes": target,
+                "actual_minutes": actual,
+                "delta_minutes": delta,
+            }
         )
-        if stat:
-            nurse.hour_balance_minutes -= stat.delta_minutes
-            stat.target_minutes = target
-            stat.actual_minutes = actual
-            stat.delta_minutes = delta
-        else:
-            stat = NurseMonthStat(
-                nurse_id=nurse.id,
-                year=year,
-                month=month,
-                target_minutes=target,
-                actual_minutes=actual,
-                delta_minutes=delta,
+    return rows
+
+
+def _month_stat_deltas(
+    session: Session, year: int, month: int, nurse_ids: Optional[List[int]] = None
+) -> Dict[int, int]:
+    query = select(NurseMonthStat.nurse_id, NurseMonthStat.delta_minutes).where(
+        NurseMonthStat.year == year,
+        NurseMonthStat.month == month,
+    )
+    if nurse_ids is not None:
+        query = query.where(NurseMonthStat.nurse_id.in_(nurse_ids))
+    return {nurse_id: delta or 0 for nurse_id, delta in session.execute(query)}
+
+
+def _upsert_month_stats(session: Session, rows: List[Dict[str, int]]) -> None:
+    if not rows:
+        return
+    statement = sqlite_insert(NurseMonthStat).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["nurse_id", "year", "month"],
+        set_={
+            column: statement.excluded[column]
+            for column in ("target_minutes", "actual_minutes", "delta_minutes")
+        },
+    ).returning(NurseMonthStat)
+    # Refresh stats already loaded in the session instead of leaving them stale.
+    session.scalars(statement, execution_options={"populate_existing": True}).all()
+
+
+def _shift_hour_balances(
+    session: Session, changes: Dict[int, int], nurses: Iterable[Nurse] = ()
+) -> None:
+    """Add each nurse's change to the bank with one executemany UPDATE."""
+    changes = {nurse_id: change for nurse_id, change in changes.items() if change}
+    if not changes:
+        return
+    session.flush()
+    table = Nurse.__table__
+    session.execute(
+        update(table)
+        .where(table.c.id == bindparam("nurse_id"))
+        .values(
+            hour_balance_minutes=func.coalesce(table.c.hour_balance_minutes, 0)
+            + bindparam("change")
+        ),
+        [
+            {"nurse_id": nurse_id, "change": change}
+            for nurse_id, change in changes.items()
+        ],
+    )
+    for nurse in nurses:
+        if nurse.id in changes:
+            set_committed_value(
+                nurse,
+                "hour_balance_minutes",
+                (nurse.hour_balance_minutes or 0) + changes[nurse.id],
             )
-        nurse.hour_balance_minutes += delta
-        session.add(stat)
-        session.add(nurse)
+
+
+def _revert_month_stats(
+    session: Session, year: int, month: int, nurse_ids: Optional[List[int]] = None
+) -> None:
+    """Take the month's recorded deltas back out of the nurses' banks."""
+    deltas = _month_stat_deltas(session, year, month, nurse_ids)
+    _shift_hour_balances(
+        session, {nurse_id: -delta for nurse_id, delta in deltas.items()}
+    )
 
 
 def collect_nurse_stats(
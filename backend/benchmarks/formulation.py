@@ -0,0 +1,95 @@
+"""Compare the slot-expanded and aggregated CP-SAT formulations.
+
+Usage: python -m backend.benchmarks.formulation --nurses 40 120 --time-limit 10
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+from ortools.sat.python import cp_model
+
+from ..app import solver
+from .synthetic import build_synthetic_hospital, memory_session
+
+FORMULATIONS = ("slots", "aggregated")
+
+
+def run_formulation(
+    problem: solver.SolveProblem, formulation: str, time_limit: float, workers: int
+) -> Dict[str, float]:
+    if formulation == "aggregated":
+        problem = solver._aggregated_problem(problem)
+    started = time.perf_counter()
+    built = solver._build_model(problem)
+    build_seconds = time.perf_counter() - started
+    proto = built.model.Proto()
+    events: List[Dict[str, float]] = []
+    outcome = solver._solve_model(
+        built, progress=events.append, num_workers=workers, time_limit=time_limit
+    )
+    return {
+        "formulation": formulation,
+        "status": cp_model.cp_model_pb2.CpSolverStatus.Name(outcome.status),
+        "slots": len(problem.slots),
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+        "build_seconds": round(build_seconds, 3),
+        "first_solution_seconds": events[0]["elapsed_seconds"] if events else None,
+        "solutions": len(events),
+        "objective": outcome.objective,
+        "best_bound": outcome.best_bound,
+        "unfilled": len(outcome.unfilled),
+    }
+
+
+def benchmark(
+    nurse_counts: List[int],
+    year: int,
+    month: int,
+    time_limit: float,
+    workers: int,
+    seed: int,
+) -> List[Dict[str, float]]:
+    results = []
+    for nurses in nurse_counts:
+        session = memory_session()
+        build_synthetic_hospital(session, nurses, year, month, seed=seed)
+        prepared = solver.prepare_schedule(session, year, month, warm_start=False)
+        for formulation in FORMULATIONS:
+            result = run_formulation(prepared.problem, formulation, time_limit, workers)
+            result["nurses"] = nurses
+            results.append(result)
+        session.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nurses", type=int, nargs="+", default=[40, 120])
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=9)
+    parser.add_argument("--time-limit", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=solver.available_cpu_count())
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+    results = benchmark(
+        args.nurses, args.year, args.month, args.time_limit, args.workers, args.seed
+    )
+    for row in results:
+        print(
+            f"{row['nurses']:>5} {row['formulation']:<10} slots={row['slots']:<5} "
+            f"vars={row['variables']:<7} constraints={row['constraints']:<7} "
+            f"build={row['build_seconds']}s first={row['first_solution_seconds']}s "
+            f"status={row['status']} objective={row['objective']:.0f} "
+            f"unfilled={row['unfilled']}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
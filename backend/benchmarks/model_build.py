@@ -0,0 +1,69 @@
+"""Time CP-SAT model construction for synthetic units of increasing size.
+
+Usage: python -m backend.benchmarks.model_build --nurses 40 120 300
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+from ..app import solver
+from .synthetic import build_synthetic_hospital, memory_session
+
+
+def benchmark(
+    nurse_counts: List[int], year: int, month: int, repeats: int, seed: int
+) -> List[Dict[str, float]]:
+    results = []
+    for nurses in nurse_counts:
+        session = memory_session()
+        build_synthetic_hospital(session, nurses, year, month, seed=seed)
+        problem = solver.prepare_schedule(
+            session, year, month, warm_start=False
+        ).problem
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            built = solver._build_model(problem)
+            timings.append(time.perf_counter() - started)
+        proto = built.model.Proto()
+        results.append(
+            {
+                "nurses": nurses,
+                "slots": len(problem.slots),
+                "candidate_pairs": sum(
+                    len(candidates) for candidates in problem.candidates.values()
+                ),
+                "variables": len(proto.variables),
+                "constraints": len(proto.constraints),
+                "build_seconds": round(min(timings), 3),
+            }
+        )
+        session.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nurses", type=int, nargs="+", default=[40, 120])
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=9)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+    results = benchmark(args.nurses, args.year, args.month, args.repeats, args.seed)
+    for row in results:
+        print(
+            f"{row['nurses']:>5} nurses slots={row['slots']:<5} "
+            f"pairs={row['candidate_pairs']:<7} vars={row['variables']:<7} "
+            f"constraints={row['constraints']:<7} build={row['build_seconds']}s"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Replay a dumped schedule model under different CP-SAT parameter sets.
+
+Usage: python -m backend.benchmarks.replay data/models/2025-09_<label>.pb \
+           --workers 1 8 --linearization 0 1 2 --branching AUTOMATIC_SEARCH
+
+Every combination of the grid flags is solved once; ``--params`` adds parameter
+sets in protobuf text format. Each run reports its time-to-quality curve: the
+objective, bound and unfilled slots of every improving solution.
+"""
+
+import argparse
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from google.protobuf import text_format
+from ortools.sat import cp_model_pb2, sat_parameters_pb2
+from ortools.sat.python import cp_model
+
+
+class CurveCallback(cp_model.CpSolverSolutionCallback):
+    def __init__(self, unfilled: List[cp_model.IntVar]):
+        super().__init__()
+        self._unfilled = unfilled
+        self.points: List[Dict[str, float]] = []
+
+    def on_solution_callback(self) -> None:
+        self.points.append(
+            {
+                "seconds": round(self.WallTime(), 3),
+                "objective": self.ObjectiveValue(),
+                "best_bound": self.BestObjectiveBound(),
+                "unfilled": sum(self.Value(var) for var in self._unfilled),
+            }
+        )
+
+
+def load_model(path: Path) -> cp_model.CpModel:
+    proto = cp_model_pb2.CpModelProto()
+    proto.ParseFromString(path.read_bytes())
+    model = cp_model.CpModel()
+    model.Proto().CopyFrom(proto)
+    return model
+
+
+def unfilled_vars(model: cp_model.CpModel, path: Path) -> List[cp_model.IntVar]:
+    sidecar = path.with_suffix(".json")
+    if not sidecar.exists():
+        return []
+    variables = json.loads(sidecar.read_text(encoding="utf-8"))["variables"]
+    return [
+        model.GetIntVarFromProtoIndex(int(index))
+        for index, meta in variables.items()
+        if meta["kind"] == "unfilled"
+    ]
+
+
+def parameter_grid(args: argparse.Namespace) -> List[Dict[str, object]]:
+    grid = [
+        {
+            "num_workers": workers,
+            "max_time_in_seconds": args.time_limit,
+            "linearization_level": linearization,
+            "search_branching": branching,
+        }
+        for workers, linearization, branching in itertools.product(
+            args.workers, args.linearization, args.branching
+        )
+    ]
+    for text in args.params or []:
+        parameters = sat_parameters_pb2.SatParameters()
+        text_format.Parse(text, parameters)
+        grid.append(
+            {
+                "max_time_in_seconds": args.time_limit,
+                **{
+                    descriptor.name: (
+                        descriptor.enum_type.values_by_number[value].name
+                        if descriptor.enum_type
+                        else value
+                    )
+                    for descriptor, value in parameters.ListFields()
+                },
+            }
+        )
+    return grid
+
+
+def replay(
+    model: cp_model.CpModel,
+    unfilled: List[cp_model.IntVar],
+    settings: Dict[str, object],
+) -> Dict[str, object]:
+    solver = cp_model.CpSolver()
+    text_format.Parse(
+        "\n".join(f"{name}: {value}" for name, value in settings.items()),
+        solver.parameters,
+    )
+    callback = CurveCallback(unfilled)
+    started = time.perf_counter()
+    status = solver.Solve(model, callback)
+    result: Dict[str, object] = {
+        "parameters": settings,
+        "status": solver.StatusName(status),
+        "seconds": round(time.perf_counter() - started, 3),
+        "curve": callback.points,
+    }
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        result["objective"] = solver.ObjectiveValue()
+        result["best_bound"] = solver.BestObjectiveBound()
+        result["unfilled"] = sum(solver.Value(var) for var in unfilled)
+    return result
+
+
+def time_to_quality(curve: List[Dict[str, float]], target: float) -> Optional[float]:
+    """Seconds until the run first found a solution at least as good as ``target``."""
+    for point in curve:
+        if point["objective"] <= target:
+            return point["seconds"]
+    return None
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value}s"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model", type=Path, help="Model proto written by a generate")
+    parser.add_argument("--workers", type=int, nargs="+", default=[8])
+    parser.add_argument("--time-limit", type=float, default=20.0)
+    parser.add_argument("--linearization", type=int, nargs="+", default=[1])
+    parser.add_argument(
+        "--branching",
+        nargs="+",
+        default=["AUTOMATIC_SEARCH"],
+        choices=sat_parameters_pb2.SatParameters.SearchBranching.keys(),
+    )
+    parser.add_argument(
+        "--params",
+        action="append",
+        help='Extra parameter set, e.g. "num_workers: 4 cp_model_presolve: false"',
+    )
+    parser.add_argument(
+        "--gap",
+        type=float,
+        default=0.01,
+        help="Relative distance to the best objective counted as reaching quality",
+    )
+    parser.add_argument("--output", help="Write the runs as JSON to this path")
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    unfilled = unfilled_vars(model, args.model)
+    runs = [replay(model, unfilled, settings) for settings in parameter_grid(args)]
+    objectives = [run["objective"] for run in runs if "objective" in run]
+    best = min(objectives) if objectives else None
+    for run in runs:
+        if best is not None:
+            target = best + abs(best) * args.gap
+            run["seconds_to_first"] = (
+                run["curve"][0]["seconds"] if run["curve"] else None
+            )
+            run["seconds_to_quality"] = time_to_quality(run["curve"], target)
+        print(
+            f"{json.dumps(run['parameters'], sort_keys=True)} "
+            f"status={run['status']} objective={run.get('objective')} "
+            f"bound={run.get('best_bound')} unfilled={run.get('unfilled')} "
+            f"first={_seconds(run.get('seconds_to_first'))} "
+            f"quality={_seconds(run.get('seconds_to_quality'))}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"model": str(args.model), "best": best, "runs": runs},
+                handle,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
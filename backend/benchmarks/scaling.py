@@ -0,0 +1,234 @@
+"""Time generate_schedule end to end on synthetic units of increasing size.
+
+Usage: python -m backend.benchmarks.scaling --output results.json
+       python -m backend.benchmarks.scaling --baseline previous.json
+
+Each size reports the profiler phases of one generate grouped into prepare,
+model build, solve and persistence. Decomposed months build their models in
+worker processes, so their build time is part of the solve and their model
+size is reported as null.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import ortools
+
+from ..app import solver
+from .synthetic import build_synthetic_hospital, memory_session
+
+DEFAULT_SIZES = [30, 100, 300, 1000]
+PHASE_GROUPS = {
+    "prepare_seconds": ("load", "eligibility", "problem"),
+    "solve_seconds": ("solve", "fallback", "explain", "cache"),
+    "persist_seconds": ("clear", "persist", "hour_balances", "stats"),
+}
+TIMED_METRICS = [
+    "prepare_seconds",
+    "model_build_seconds",
+    "solve_seconds",
+    "persist_seconds",
+    "total_seconds",
+]
+
+
+def _response_status(response_stats: List[str]) -> str:
+    for stats in response_stats:
+        for line in stats.splitlines():
+            if line.startswith("status:"):
+                return line.split(":", 1)[1].strip()
+    return "UNKNOWN"
+
+
+def run_size(
+    nurses: int,
+    year: int,
+    month: int,
+    seed: int,
+    time_limit: float,
+    constraint_rate: float,
+    locked_rate: float,
+) -> Dict[str, object]:
+    session = memory_session()
+    build_synthetic_hospital(
+        session,
+        nurses,
+        year,
+        month,
+        seed=seed,
+        constraint_rate=constraint_rate,
+        locked_rate=locked_rate,
+    )
+    profiler = solver.SolveProfiler()
+    started = time.perf_counter()
+    assignments, unfilled, violations, _ = solver.generate_schedule(
+        session, year, month, profiler=profiler, time_limit=time_limit
+    )
+    session.commit()
+    total = time.perf_counter() - started
+    summary = profiler.summary()
+    seconds: Dict[str, float] = {}
+    for phase in summary["phases"]:
+        seconds[phase["phase"]] = seconds.get(phase["phase"], 0.0) + phase["seconds"]
+    # The model_* laps record what each build phase added to the one model.
+    model_phases = [
+        phase for phase in summary["phases"] if phase["phase"].startswith("model_")
+    ]
+    result: Dict[str, object] = {
+        "nurses": nurses,
+        "slots": summary["slots"],
+        # Decomposed months build one model per part in the workers.
+        "decomposed": not model_phases,
+        "variables": (
+            sum(phase["variables"] for phase in model_phases) if model_phases else None
+        ),
+        "constraints": (
+            sum(phase["constraints"] for phase in model_phases)
+            if model_phases
+            else None
+        ),
+        "status": _response_status(summary["response_stats"]),
+        "assignments": len(assignments),
+        "unfilled": len(unfilled),
+        "violations": len(violations),
+    }
+    for metric, phases in PHASE_GROUPS.items():
+        result[metric] = round(sum(seconds.get(phase, 0.0) for phase in phases), 4)
+    result["model_build_seconds"] = round(
+        sum(value for phase, value in seconds.items() if phase.startswith("model_")),
+        4,
+    )
+    result["total_seconds"] = round(total, 4)
+    session.close()
+    return result
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(args: argparse.Namespace) -> Dict[str, object]:
+    results = [
+        run_size(
+            nurses,
+            args.year,
+            args.month,
+            args.seed,
+            args.time_limit,
+            args.constraint_rate,
+            args.locked_rate,
+        )
+        for nurses in args.nurses
+    ]
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "ortools": ortools.__version__,
+            "numpy": np.__version__,
+            "cpus": os.cpu_count(),
+            "year": args.year,
+            "month": args.month,
+            "seed": args.seed,
+            "time_limit": args.time_limit,
+            "constraint_rate": args.constraint_rate,
+            "locked_rate": args.locked_rate,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    current: Dict[str, object],
+    baseline: Dict[str, object],
+    tolerance: float,
+    min_seconds: float,
+) -> List[str]:
+    """Metrics that got slower than the baseline by more than the tolerance."""
+    previous = {row["nurses"]: row for row in baseline.get("results", [])}
+    regressions = []
+    for row in current["results"]:
+        before = previous.get(row["nurses"])
+        if not before:
+            continue
+        for metric in TIMED_METRICS:
+            old, new = before.get(metric), row.get(metric)
+            if old is None or new is None or new - old < min_seconds:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append(
+                    f"{row['nurses']} nurses {metric}: {old:.3f}s -> {new:.3f}s"
+                )
+        if row.get("unfilled", 0) > before.get("unfilled", 0):
+            regressions.append(
+                f"{row['nurses']} nurses unfilled: "
+                f"{before['unfilled']} -> {row['unfilled']}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nurses", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=9)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--time-limit", type=float, default=10.0)
+    parser.add_argument("--constraint-rate", type=float, default=0.2)
+    parser.add_argument("--locked-rate", type=float, default=0.02)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a previous JSON run")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Relative slowdown reported as a regression",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.05,
+        help="Ignore slowdowns smaller than this many seconds",
+    )
+    args = parser.parse_args()
+    report = benchmark(args)
+    for row in report["results"]:
+        print(
+            f"{row['nurses']:>5} nurses slots={row['slots']:<5} "
+            f"vars={str(row['variables']):<7} status={row['status']:<10} "
+            f"prepare={row['prepare_seconds']}s build={row['model_build_seconds']}s "
+            f"solve={row['solve_seconds']}s persist={row['persist_seconds']}s "
+            f"total={row['total_seconds']}s unfilled={row['unfilled']}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        regressions = compare(report, baseline, args.tolerance, args.min_seconds)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
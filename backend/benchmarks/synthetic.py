@@ -0,0 +1,146 @@
+import calendar
+import math
+import random
+from collections import defaultdict
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlmodel import Session, SQLModel, create_engine
+
+from ..app.constants import NURSE_CATEGORIES, SERVICE_SHIFT_DEFS
+from ..app.defaults import (
+    ensure_default_categories,
+    ensure_default_requirements,
+    ensure_default_service_shifts,
+    ensure_default_services,
+    ensure_default_shifts,
+)
+from ..app.models import ConstraintEntry, MonthlyRequirement, Nurse, ScheduleEntry
+
+# The demo requirements are sized for a unit of roughly this many nurses.
+BASE_UNIT_NURSES = 40
+# Share of each category in a unit; assistants work other services, so none here.
+CATEGORY_WEIGHTS = {
+    "COORDENADOR": 0.03,
+    "CONTRATADO": 0.42,
+    "CONTRATADO_TEMPO_PARCIAL": 0.15,
+    "RV_TEMPO_INTEIRO": 0.22,
+    "RV_TEMPO_PARCIAL": 0.18,
+    "ASSISTENTE_OPERACIONAL": 0.0,
+}
+CATEGORIES = [category for category in NURSE_CATEGORIES if CATEGORY_WEIGHTS[category]]
+CONSTRAINT_CODES = [
+    "FERIAS",
+    "INDISPONIVEL",
+    "INDISPONIVEL_N",
+    "PEDIDO_FOLGA",
+    "DISPONIVEL",
+    "DISPONIVEL_M",
+    "DISPONIVEL_TN",
+]
+
+
+def memory_session() -> Session:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    return Session(engine)
+
+
+def build_synthetic_hospital(
+    session: Session,
+    nurses: int,
+    year: int,
+    month: int,
+    seed: int = 1,
+    constraint_rate: float = 0.2,
+    locked_rate: float = 0.0,
+) -> List[Nurse]:
+    """Seed a unit with the demo catalogue and demand scaled to the nurse count.
+
+    ``locked_rate`` is the share of unconstrained nurse days given a locked shift
+    from the nurse's services, as a coordinator would pin them by hand.
+    """
+    rnd = random.Random(seed)
+    ensure_default_categories(session)
+    ensure_default_services(session)
+    ensure_default_shifts(session)
+    ensure_default_service_shifts(session)
+    ensure_default_requirements(session, year, month)
+
+    scale = nurses / BASE_UNIT_NURSES
+    for requirement in session.scalars(
+        select(MonthlyRequirement).where(
+            MonthlyRequirement.year == year,
+            MonthlyRequirement.month == month,
+        )
+    ):
+        requirement.required_count = max(
+            1, math.ceil(requirement.required_count * scale)
+        )
+
+    codes_by_service: Dict[str, List[str]] = defaultdict(list)
+    for service, code, _label, _shift_type in SERVICE_SHIFT_DEFS:
+        codes_by_service[service].append(code)
+    service_groups = [
+        codes_by_service["SAP"] + codes_by_service["Reforço"],
+        codes_by_service["Análises"]
+        + codes_by_service["Consulta Externa"]
+        + codes_by_service["Pequenas Cirurgias"]
+        + codes_by_service["Gastroenterologia"],
+        codes_by_service["Piso 1"] + codes_by_service["Piso 3"],
+    ]
+
+    created: List[Nurse] = []
+    for index in range(nurses):
+        nurse = Nurse(
+            name=f"Sintético {index + 1:04d}",
+            category=rnd.choices(
+                CATEGORIES, weights=[CATEGORY_WEIGHTS[item] for item in CATEGORIES]
+            )[0],
+            services_permitted=list(service_groups[index % len(service_groups)]),
+            can_work_night=rnd.random() < 0.8,
+            max_noites_mes=rnd.choice([None, 6, 8]),
+            weekly_hours=rnd.choice([35, 40]),
+            hour_balance_minutes=rnd.randint(-600, 600),
+            display_order=index + 1,
+        )
+        session.add(nurse)
+        created.append(nurse)
+    session.flush()
+
+    services = {code: service for service, code, _, _ in SERVICE_SHIFT_DEFS}
+    shift_types = {code: shift_type for _, code, _, shift_type in SERVICE_SHIFT_DEFS}
+    days = calendar.monthrange(year, month)[1]
+    for nurse in created:
+        lockable = [
+            code
+            for code in nurse.services_permitted
+            if nurse.can_work_night or shift_types[code] != "N"
+        ]
+        for day in range(1, days + 1):
+            if rnd.random() < constraint_rate:
+                session.add(
+                    ConstraintEntry(
+                        nurse_id=nurse.id,
+                        year=year,
+                        month=month,
+                        day=day,
+                        code=rnd.choice(CONSTRAINT_CODES),
+                    )
+                )
+            elif locked_rate and rnd.random() < locked_rate:
+                code = rnd.choice(lockable)
+                session.add(
+                    ScheduleEntry(
+                        nurse_id=nurse.id,
+                        year=year,
+                        month=month,
+                        day=day,
+                        service_code=services[code],
+                        shift_code=code,
+                        locked=True,
+                        source="manual",
+                    )
+                )
+    session.commit()
+    return created
@@ -0,0 +1,59 @@
+from sqlalchemy import delete
+
+from backend.app.calendar_summary import month_calendar_summaries, nurse_calendar_summary
+from backend.app.models import ConstraintEntry, Nurse
+from backend.app.solver import _contracted_target_minutes
+from backend.tests.helpers import build_session
+
+
+def _add_constraints(session, nurse_id, codes):
+    for day, code in codes.items():
+        session.add(
+            ConstraintEntry(nurse_id=nurse_id, year=2025, month=9, day=day, code=code)
+        )
+
+
+def test_calendar_summary_counts_codes_and_target():
+    session = build_session()
+    nurse = Nurse(name="Ana", category="CONTRATADO", weekly_hours=35)
+    other = Nurse(name="Bruno", category="CONTRATADO", weekly_hours=40)
+    session.add_all([nurse, other])
+    session.flush()
+    _add_constraints(
+        session, nurse.id, {1: "FERIAS", 2: "FERIAS", 5: "FERIADO_TRAB", 9: "DISPENSA"}
+    )
+    _add_constraints(session, other.id, {3: "INDISPONIVEL"})
+    session.commit()
+
+    summary = nurse_calendar_summary(session, nurse.id, 2025, 9)
+    assert summary.business_days == 22
+    assert summary.vacation_days == 2
+    assert summary.holiday_worked_days == 1
+    assert summary.blocked_days == frozenset({1, 2, 9})
+    # 22 business days at 7h, minus two vacation days and one worked holiday.
+    assert _contracted_target_minutes(nurse, summary, None) == 19 * 7 * 60
+    assert nurse_calendar_summary(session, 999, 2025, 9).code_counts == {}
+
+
+def test_calendar_summaries_follow_constraint_changes():
+    session = build_session()
+    nurse = Nurse(name="Carla", category="CONTRATADO")
+    session.add(nurse)
+    session.flush()
+    _add_constraints(session, nurse.id, {1: "FERIAS"})
+    session.commit()
+
+    first = month_calendar_summaries(session, 2025, 9)
+    assert month_calendar_summaries(session, 2025, 9) is first
+    assert first[nurse.id].vacation_days == 1
+
+    _add_constraints(session, nurse.id, {2: "FERIAS"})
+    session.commit()
+    assert month_calendar_summaries(session, 2025, 9)[nurse.id].vacation_days == 2
+
+    session.execute(delete(ConstraintEntry).where(ConstraintEntry.nurse_id == nurse.id))
+    session.commit()
+    assert nurse.id not in month_calendar_summaries(session, 2025, 9)
+
+    other_session = build_session()
+    assert month_calendar_summaries(other_session, 2025, 9) == {}
@@ -0,0 +1,93 @@
+from backend.app import solver
+from backend.app.models import MonthlyRequirement, Nurse, Shift
+from backend.app.shift_catalogue import build_shift_catalogue
+from backend.app.solver import (
+    Slot,
+    _batch_components,
+    _eligibility_components,
+    generate_schedule,
+)
+from backend.tests.helpers import build_session
+
+
+def _problem(candidates, nurse_ids, slot_count):
+    return solver.SolveProblem(
+        year=2025,
+        month=9,
+        role_hint=None,
+        nurses=[
+            solver.NurseSnapshot(
+                id=nurse_id,
+                name=f"N{nurse_id}",
+                category="CONTRATADO",
+                services_permitted=[],
+                can_work_night=True,
+                max_noites_mes=None,
+                weekly_hours=40,
+                hour_balance_minutes=0,
+            )
+            for nurse_id in nurse_ids
+        ],
+        slots=[Slot(index, 1, "S", "M1", 360, 36) for index in range(slot_count)],
+        candidates=candidates,
+        pedido_pairs=set(),
+        constraint_map={},
+        adjustment_map={},
+        locked=[],
+        settings=None,
+        service_roles={},
+        shifts=build_shift_catalogue(()),
+        average_bank=0,
+        shift_targets={},
+    )
+
+
+def test_components_follow_shared_candidates():
+    problem = _problem({0: [1, 2], 1: [2], 2: [3], 3: [], 4: [4, 3]}, [1, 2, 3, 4, 5], 5)
+    components = sorted(_eligibility_components(problem))
+    assert components == [([1, 2], [0, 1]), ([3, 4], [2, 4])]
+
+
+def test_batches_balance_slot_counts():
+    components = [([1], [0, 1, 2]), ([2], [3]), ([3], [4]), ([4], [5, 6])]
+    batches = _batch_components(components, 2)
+    assert sorted(len(slots) for _, slots in batches) == [3, 4]
+    assert sorted(n for nurses, _ in batches for n in nurses) == [1, 2, 3, 4]
+
+
+def test_decomposed_solve_matches_requirements(monkeypatch):
+    monkeypatch.setattr(solver, "available_cpu_count", lambda: 2)
+    session = build_session()
+    session.add(
+        Shift(code="M1", label="M1", shift_type="M", start_minute=480, end_minute=840)
+    )
+    session.add(
+        Shift(code="M3", label="M3", shift_type="M", start_minute=480, end_minute=840)
+    )
+    first = Nurse(name="Ana", category="CONTRATADO", services_permitted=["M1"])
+    second = Nurse(name="Rui", category="CONTRATADO", services_permitted=["M3"])
+    session.add(first)
+    session.add(second)
+    for code in ("M1", "M3"):
+        session.add(
+            MonthlyRequirement(
+                year=2025,
+                month=9,
+                day=4,
+                service_code=code,
+                shift_code=code,
+                required_count=1,
+            )
+        )
+    session.commit()
+
+    events = []
+    assignments, unfilled, _, _ = generate_schedule(
+        session, 2025, 9, decompose=True, progress=events.append
+    )
+    assert not unfilled
+    assert sorted((entry.shift_code, entry.nurse_id) for entry in assignments) == [
+        ("M1", first.id),
+        ("M3", second.id),
+    ]
+    assert [event["solution"] for event in events] == [1, 2]
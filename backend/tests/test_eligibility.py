@@ -0,0 +1,169 @@
+import itertools
+from collections import defaultdict
+
+from backend.app.models import Shift
+from backend.app.shift_catalogue import shift_catalogue
+from backend.app.solver import (
+    Eligibility,
+    NurseSnapshot,
+    Slot,
+    SolveSettings,
+    _constraint_reason,
+    _eligibility_matrix,
+    _week_id,
+    analyse_capacity,
+)
+from backend.tests.helpers import build_session
+
+
+def _scalar_eligibility(nurse, day, shift_code, constraint, locked_days, shifts):
+    """The rules one nurse and slot at a time, as the matrix must apply them."""
+    if nurse.category == "COORDENADOR":
+        return "Coordenador fora do solver"
+    if locked_days.get((nurse.id, day)):
+        return "Célula bloqueada/lock"
+    if nurse.services_permitted and shift_code not in nurse.services_permitted:
+        return "Serviço/turno não permitido"
+    return _constraint_reason(
+        nurse.category, nurse.can_work_night, constraint, shift_code, shifts
+    )
+
+
+def test_eligibility_matrix_matches_scalar_rules():
+    session = build_session()
+    for code, shift_type, start, end in (
+        ("M1", "M", 480, 840),
+        ("T1", "T", 840, 1200),
+        ("N1", "N", 1200, 1920),
+    ):
+        session.add(
+            Shift(
+                code=code,
+                label=code,
+                shift_type=shift_type,
+                start_minute=start,
+                end_minute=end,
+            )
+        )
+    session.commit()
+    shifts = shift_catalogue(session)
+
+    categories = [
+        "CONTRATADO",
+        "RV_TEMPO_PARCIAL",
+        "RV_TEMPO_INTEIRO",
+        "COORDENADOR",
+    ]
+    nurses = [
+        NurseSnapshot(
+            id=index + 1,
+            name=f"N{index}",
+            category=category,
+            services_permitted=permitted,
+            can_work_night=night,
+            max_noites_mes=None,
+            weekly_hours=35,
+            hour_balance_minutes=0,
+        )
+        for index, (category, permitted, night) in enumerate(
+            itertools.product(categories, [[], ["M1", "N1"]], [True, False])
+        )
+    ]
+    codes = [
+        "FERIAS",
+        "INDISPONIVEL",
+        "INDISPONIVEL_N",
+        "DISPONIVEL",
+        "DISPONIVEL_M",
+        "PEDIDO_FOLGA",
+        "FERIADO_TRAB",
+    ]
+    constraint_map = {}
+    for nurse in nurses:
+        for day, code in enumerate(codes, start=1):
+            if (nurse.id + day) % 3:
+                constraint_map[(nurse.id, day)] = code
+    locked_days = {(nurses[0].id, 2): True, (nurses[5].id, 4): True}
+    columns = [
+        (day, code) for day in range(1, 10) for code in ("M1", "T1", "N1", "X9")
+    ]
+
+    matrix = _eligibility_matrix(nurses, columns, constraint_map, locked_days, shifts)
+    for (day, code), column in matrix.columns.items():
+        for row, nurse in enumerate(nurses):
+            reason = _scalar_eligibility(
+                nurse,
+                day,
+                code,
+                constraint_map.get((nurse.id, day), ""),
+                locked_days,
+                shifts,
+            )
+            assert matrix.reason_labels[matrix.reasons[row, column]] == reason
+            assert (nurse.id in matrix.eligible_ids(day, code)) == (not reason)
+
+
+def test_capacity_drops_spent_budgets_and_unfillable_copies():
+    session = build_session()
+    session.add(
+        Shift(code="M1", label="M1", shift_type="M", start_minute=480, end_minute=840)
+    )
+    session.add(
+        Shift(code="N1", label="N1", shift_type="N", start_minute=1200, end_minute=1920)
+    )
+    session.commit()
+    shifts = shift_catalogue(session)
+
+    nurses = [
+        NurseSnapshot(
+            id=nurse_id,
+            name=f"N{nurse_id}",
+            category="CONTRATADO",
+            services_permitted=[],
+            can_work_night=True,
+            max_noites_mes=max_nights,
+            weekly_hours=40,
+            hour_balance_minutes=0,
+        )
+        for nurse_id, max_nights in ((1, 1), (2, None), (3, None))
+    ]
+    # Nurse 1 has used its only night; nurse 2 has 6h of the week's 48h left.
+    locked = [(1, 2, "N1", "N1")] + [
+        (2, day, code, code)
+        for day, code in ((1, "N1"), (3, "N1"), (5, "N1"), (6, "M1"))
+    ]
+    week = _week_id(2025, 9, 4)
+    slots = [Slot(0, 4, "M1", "M1", 360, week)] + [
+        Slot(index, 4, "N1", "N1", 720, week) for index in (1, 2, 3)
+    ]
+    eligibility = Eligibility(
+        {slot.index: [1, 2, 3] for slot in slots},
+        defaultdict(lambda: defaultdict(int)),
+        set(),
+    )
+    settings = SolveSettings(
+        penalty_weights={},
+        pedidos_folga_hard=False,
+        prefer_folga_after_nd=False,
+        min_rest_hours=11,
+        target_hours_week=40,
+        max_hours_week_contratado=48,
+    )
+
+    rows, unfillable = analyse_capacity(
+        nurses, slots, eligibility, locked, [], settings, 2025, 9, shifts
+    )
+    assert eligibility.candidates[0] == [1, 2, 3]
+    assert eligibility.candidates[1] == [3]
+    assert eligibility.candidates[2] == eligibility.candidates[3] == []
+    assert set(unfillable) == {2, 3}
+    assert eligibility.reason_counts[1] == {
+        "Limite de noites": 1,
+        "Limite de horas semanais": 1,
+    }
+    by_key = {(row["day"], row["shift_type"]): row for row in rows}
+    assert by_key[(4, "N")]["demand"] == 3
+    assert by_key[(4, "N")]["supply"] == 1
+    assert by_key[(4, "N")]["shortfall"] == 2
+    assert by_key[(4, "M")]["shortfall"] == 0
+    assert by_key[(1, "N")]["locked"] == 1
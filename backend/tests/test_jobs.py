@@ -0,0 +1,219 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.jobs import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_RUNNING,
+    JOB_SIMULATE,
+    SolveJob,
+    SolveJobConflict,
+    SolveJobManager,
+)
+from backend.app.models import MonthlyRequirement, Nurse, Shift
+from backend.app.solver import get_or_create_month_config
+from backend.app.schemas import ScheduleResponse, SimulationResultRead
+from backend.tests.helpers import build_session_factory
+
+
+def test_concurrent_requests_for_same_month_share_one_job():
+    release = threading.Event()
+    calls = []
+
+    def runner(session, job):
+        calls.append((job.year, job.month, job.group))
+        release.wait(5)
+        return ScheduleResponse(entries=[], unfilled=[])
+
+    manager = SolveJobManager(build_session_factory(), max_workers=2, runner=runner)
+    first = manager.submit(2025, 9, "enf")
+    second = manager.submit(2025, 9, " ENF ")
+    other = manager.submit(2025, 9, "ao")
+    assert first.id == second.id
+    assert other.id != first.id
+
+    release.set()
+    assert manager.wait(first.id, timeout=5).status == JOB_DONE
+    assert manager.wait(other.id, timeout=5).status == JOB_DONE
+    assert sorted(calls) == [(2025, 9, "ao"), (2025, 9, "enf")]
+
+    again = manager.submit(2025, 9, "enf")
+    assert again.id != first.id
+    manager.wait(again.id, timeout=5)
+    manager.shutdown()
+
+
+def test_overlapping_months_are_not_generated_twice():
+    release = threading.Event()
+
+    def runner(session, job):
+        release.wait(5)
+        return ScheduleResponse(entries=[], unfilled=[])
+
+    manager = SolveJobManager(build_session_factory(), max_workers=3, runner=runner)
+    horizon = manager.submit(2025, 12, "enf", months=2)
+    for year, month, group in ((2026, 1, "enf"), (2025, 12, None)):
+        with pytest.raises(SolveJobConflict) as conflict:
+            manager.submit(year, month, group)
+        assert conflict.value.job is horizon
+    later = manager.submit(2026, 2, "enf")
+    other_group = manager.submit(2026, 1, "ao")
+    assert len({horizon.id, later.id, other_group.id}) == 3
+
+    release.set()
+    for job in (horizon, later, other_group):
+        assert manager.wait(job.id, timeout=5).status == JOB_DONE
+    assert manager.submit(2026, 1, "enf").id != horizon.id
+    manager.shutdown()
+
+
+def test_simulation_runs_as_a_job_next_to_generate():
+    release = threading.Event()
+
+    def runner(session, job):
+        release.wait(5)
+        return ScheduleResponse(entries=[], unfilled=[])
+
+    def simulate(session, job):
+        return [
+            SimulationResultRead(name="base", status="OPTIMAL", entries=[], unfilled=[])
+        ]
+
+    manager = SolveJobManager(build_session_factory(), max_workers=2, runner=runner)
+    generate = manager.submit(2025, 9)
+    # A simulation only reads the month, so it does not wait for the generate.
+    simulation = manager.submit_simulation(2025, 9, None, simulate)
+    assert simulation.kind == JOB_SIMULATE
+    assert manager.wait(simulation.id, timeout=5).status == JOB_DONE
+    assert [item.name for item in simulation.simulation] == ["base"]
+    assert simulation.result is None
+    assert simulation.message == "Simulação concluída"
+
+    release.set()
+    assert manager.wait(generate.id, timeout=5).status == JOB_DONE
+    manager.shutdown()
+
+
+def test_failed_job_reports_error():
+    def runner(session, job):
+        raise ValueError("sem dados")
+
+    manager = SolveJobManager(build_session_factory(), runner=runner)
+    job = manager.wait(manager.submit(2025, 9).id, timeout=5)
+    assert job.status == JOB_FAILED
+    assert job.error == "sem dados"
+    assert job.progress == 1.0
+    manager.shutdown()
+
+
+def test_job_runs_generate_schedule():
+    factory = build_session_factory()
+    with factory() as session:
+        session.add(
+            Shift(code="M1", label="M1", shift_type="M", start_minute=480, end_minute=840)
+        )
+        session.add(Nurse(name="Ana", category="CONTRATADO", services_permitted=["M1"]))
+        session.add(
+            MonthlyRequirement(
+                year=2025,
+                month=9,
+                day=1,
+                service_code="M1",
+                shift_code="M1",
+                required_count=1,
+            )
+        )
+
+    manager = SolveJobManager(factory)
+    job = manager.wait(manager.submit(2025, 9).id, timeout=60)
+    assert job.status == JOB_DONE
+    assert len(job.result.entries) == 1
+    assert not job.result.unfilled
+    manager.shutdown()
+
+
+def test_job_progress_follows_month_solver_profile():
+    factory = build_session_factory()
+    with factory() as session:
+        get_or_create_month_config(session, 2025, 9).solver_profile = "thorough"
+        get_or_create_month_config(session, 2025, 10).solver_profile = "fast"
+
+    manager = SolveJobManager(factory)
+    job = manager.wait(manager.submit(2025, 9, months=2).id, timeout=60)
+    assert job.status == JOB_DONE
+    assert job.time_budget == 125
+    manager.shutdown()
+
+    running = SolveJob(
+        id="x",
+        year=2025,
+        month=9,
+        group=None,
+        status=JOB_RUNNING,
+        started_at=datetime.utcnow() - timedelta(seconds=30),
+        time_budget=120,
+    )
+    assert running.progress == 0.25
+
+
+def test_stop_request_reaches_running_job():
+    started = threading.Event()
+
+    def runner(session, job):
+        job.record_progress({"solution": 1, "unfilled": 3})
+        started.set()
+        assert job.stop_event.wait(5)
+        return ScheduleResponse(entries=[], unfilled=[])
+
+    manager = SolveJobManager(build_session_factory(), runner=runner)
+    job = manager.submit(2025, 10)
+    assert started.wait(5)
+    manager.stop(job.id)
+    assert manager.wait(job.id, timeout=5).status == JOB_DONE
+    assert job.last_progress == {"solution": 1, "unfilled": 3}
+    manager.shutdown()
+
+
+def test_horizon_job_generates_months_in_order():
+    factory = build_session_factory()
+    with factory() as session:
+        session.add_all(
+            Shift(
+                code=code,
+                label=code,
+                shift_type=code[0],
+                start_minute=start,
+                end_minute=end,
+            )
+            for code, start, end in (("M1", 480, 840), ("N1", 1200, 1920))
+        )
+        session.add_all(
+            Nurse(name=name, category="CONTRATADO", services_permitted=["M1", "N1"])
+            for name in ("Ana", "Rui")
+        )
+        session.add_all(
+            MonthlyRequirement(
+                year=2025,
+                month=month,
+                day=day,
+                service_code=code,
+                shift_code=code,
+                required_count=count,
+            )
+            for month, day, code, count in ((9, 30, "N1", 1), (10, 1, "M1", 2))
+        )
+
+    manager = SolveJobManager(factory)
+    job = manager.wait(manager.submit(2025, 9, months=2).id, timeout=120)
+    assert job.status == JOB_DONE
+    assert [(item.year, item.month) for item in job.horizon] == [(2025, 9), (2025, 10)]
+    assert job.result == job.horizon[0]
+    (night,) = [entry for entry in job.horizon[0].entries if entry.shift_code == "N1"]
+    # The nurse on the last night of September cannot start October on the 1st.
+    assert [entry.nurse_id for entry in job.horizon[1].entries] != [night.nurse_id]
+    assert len(job.horizon[1].entries) == 1
+    assert len(job.horizon[1].unfilled) == 1
+    assert manager.submit(2025, 9).id != job.id
+    manager.shutdown()
@@ -0,0 +1,51 @@
+from sqlalchemy import select
+
+from backend.app.models import MonthlyRequirement, Nurse, ScheduleEntry, Shift
+from backend.app.solver import generate_schedule, repair_schedule
+from backend.tests.helpers import build_session
+
+
+def test_repair_refills_cleared_cell_inside_window():
+    session = build_session()
+    session.add(
+        Shift(code="M1", label="M1", shift_type="M", start_minute=480, end_minute=840)
+    )
+    nurses = [
+        Nurse(name=name, category="CONTRATADO", services_permitted=["M1"])
+        for name in ("Inês", "João")
+    ]
+    session.add_all(nurses)
+    session.flush()
+    for day in (5, 25):
+        session.add(
+            MonthlyRequirement(
+                year=2025,
+                month=9,
+                day=day,
+                service_code="M1",
+                shift_code="M1",
+                required_count=1,
+            )
+        )
+    session.commit()
+    generate_schedule(session, 2025, 9)
+    session.commit()
+
+    edited = session.scalar(select(ScheduleEntry).where(ScheduleEntry.day == 5))
+    untouched = session.scalar(select(ScheduleEntry).where(ScheduleEntry.day == 25))
+    untouched_nurse = untouched.nurse_id
+    edited_nurse = edited.nurse_id
+    session.delete(edited)
+    session.flush()
+
+    assignments, unfilled, violations, stats = repair_schedule(
+        session, 2025, 9, edited_nurse, 5
+    )
+    day_five = [entry for entry in assignments if entry.day == 5]
+    assert len(day_five) == 1
+    assert day_five[0].nurse_id != edited_nurse
+    assert not unfilled
+    assert not violations
+    assert {item["nurse_id"] for item in stats} == {nurse.id for nurse in nurses}
+    day_25 = [entry for entry in assignments if entry.day == 25]
+    assert [entry.nurse_id for entry in day_25] == [untouched_nurse]
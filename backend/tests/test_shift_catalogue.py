@@ -0,0 +1,55 @@
+import pickle
+from dataclasses import FrozenInstanceError
+
+import pytest
+from sqlalchemy import delete
+
+from backend.app.models import Shift
+from backend.app.shift_catalogue import shift_catalogue
+from backend.tests.helpers import build_session
+
+
+def test_shift_catalogue_is_cached_until_a_shift_changes():
+    session = build_session()
+    session.add(
+        Shift(code="M1", label="M1", shift_type="M", start_minute=480, end_minute=840)
+    )
+    session.commit()
+
+    first = shift_catalogue(session)
+    assert shift_catalogue(session) is first
+    assert first["M1"].minutes == 360
+    assert shift_catalogue(build_session()) == {}
+
+    shift = session.get(Shift, "M1")
+    shift.end_minute = 900
+    session.commit()
+    second = shift_catalogue(session)
+    assert second is not first
+    assert second.version > first.version
+    assert second["M1"].minutes == 420
+    # A solve that took the old catalogue keeps seeing the old timings.
+    assert first["M1"].minutes == 360
+
+    session.execute(delete(Shift).where(Shift.code == "M1"))
+    session.commit()
+    assert "M1" not in shift_catalogue(session)
+
+
+def test_shift_catalogue_is_immutable_and_picklable():
+    session = build_session()
+    session.add(
+        Shift(code="N1", label="N1", shift_type="N", start_minute=1200, end_minute=1920)
+    )
+    session.commit()
+    catalogue = shift_catalogue(session)
+
+    with pytest.raises(FrozenInstanceError):
+        catalogue.version = 0
+    with pytest.raises(TypeError):
+        catalogue["X1"] = catalogue["N1"]
+
+    copy = pickle.loads(pickle.dumps(catalogue))
+    assert copy == catalogue
+    assert copy.version == catalogue.version
+    assert copy.shifts == catalogue.shifts
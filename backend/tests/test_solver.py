@@ -1,7 +1,51 @@
-from sqlalchemy import delete
+import json
+import threading
+import time
+from datetime import date
+from itertools import product
 
-from backend.app.models import ConstraintEntry, MonthlyRequirement, Nurse, ScheduleEntry
-from backend.app.solver import generate_schedule
+from ortools.sat.python import cp_model
+from sqlalchemy import delete, select
+
+from backend.app.constants import SOLVER_PROFILES
+from backend.app.models import (
+    ConstraintEntry,
+    MonthConfig,
+    MonthlyRequirement,
+    Nurse,
+    NurseMonthStat,
+    ScheduleDraft,
+    ScheduleEntry,
+    Shift,
+)
+from backend.app import solver
+from backend.app.schemas import SolveDiagnostics
+from backend.app.shift_catalogue import shift_catalogue
+from backend.app.solver import (
+    ScheduleVariant,
+    Slot,
+    SolveOutcome,
+    SolveProfiler,
+    SolverProfile,
+    _add_conjunction,
+    _entry_row,
+    _persist_entries,
+    _revert_month_stats,
+    _update_hour_balances,
+    _aggregate_slots,
+    _allows_double_shift,
+    _has_minimum_rest,
+    _previous_month_day,
+    _shift_pair_table,
+    _shifts_overlap,
+    construct_schedule,
+    generate_schedule,
+    promote_schedule_draft,
+    schedule_draft_diff,
+    simulate_schedule,
+)
+from backend.app.solve_cache import SolveCache
+from backend.benchmarks.synthetic import build_synthetic_hospital, memory_session
 from backend.tests.helpers import build_session
 
 
@@ -107,3 +151,861 @@ def test_solver_partial_needs_availability():
     assignments, _, _, _ = generate_schedule(session, 2025, 9)
     assert len(assignments) == 1
     assert assignments[0].nurse_id == full.id
+
+
+def test_solver_reports_progress_events():
+    session = build_session()
+    session.add(
+        Shift(code="M1", label="M1", shift_type="M", start_minute=480, end_minute=840)
+    )
+    nurse = Nurse(name="Eva", category="CONTRATADO", services_permitted=["M1"])
+    session.add(nurse)
+    session.add(
+        MonthlyRequirement(
+            year=2025,
+            month=9,
+            day=3,
+            service_code="M1",
+            shift_code="M1",
+            required_count=2,
+        )
+    )
+    session.commit()
+
+    events = []
+    assignments, unfilled, _, _ = generate_schedule(
+        session, 2025, 9, progress=events.append
+    )
+    assert len(assignments) == 1
+    assert len(unfilled) == 1
+    assert events
+    # The second copy is known to be unfillable before the model is built.
+    assert events[-1]["unfilled"] == 0
+    assert unfilled[0]["reason"] == (
+        "Capacidade insuficiente (1 elegíveis para 2 vagas)"
+    )
+    assert events[-1]["objective"] >= events[-1]["best_bound"]
+    assert [event["solution"] for event in events] == list(range(1, len(events) + 1))
+
+
+def _seed_hint_scenario(session):
+    session.add(
+        Shift(code="M1", label="M1", shift_type="M", start_minute=480, end_minute=840)
+    )
+    nurses = [
+        Nurse(name=name, category="CONTRATADO", services_permitted=["M1"])
+        for name in ("Filipa", "Gil", "Helena")
+    ]
+    session.add_all(nurses)
+    session.flush()
+    return nurses
+
+
+def _capture_hints(monkeypatch):
+    captured = []
+    original = solver._build_model
+
+    def build(problem, *args):
+        captured.append(dict(problem.hints))
+        return original(problem, *args)
+
+    monkeypatch.setattr(solver, "_build_model", build)
+    monkeypatch.setattr(solver, "solve_cache", SolveCache(0))
+    return captured
+
+
+def test_previous_month_day_keeps_weekday():
+    for day in (1, 15, 28, 29, 30):
+        source = _previous_month_day(2025, 9, day)
+        assert source.month == 8
+        assert source.weekday() == date(2025, 9, day).weekday()
+
+
+def test_solver_hints_from_previous_run(monkeypatch):
+    session = build_session()
+    nurses = _seed_hint_scenario(session)
+    session.add(
+        MonthlyRequirement(
+            year=2025,
+            month=9,
+            day=4,
+            service_code="M1",
+            shift_code="M1",
+            required_count=1,
+        )
+    )
+    session.commit()
+    captured = _capture_hints(monkeypatch)
+
+    first, _, _, _ = generate_schedule(session, 2025, 9)
+    generate_schedule(session, 2025, 9)
+    assert captured[0] == {}
+    assert list(captured[1].values()) == [first[0].nurse_id]
+    assert first[0].nurse_id in {nurse.id for nurse in nurses}
+
+
+def test_solver_hints_from_previous_month_weekday(monkeypatch):
+    session = build_session()
+    nurses = _seed_hint_scenario(session)
+    # 2025-08-07 and 2025-09-04 are both Thursdays.
+    session.add(
+        ScheduleEntry(
+            nurse_id=nurses[2].id,
+            year=2025,
+            month=8,
+            day=7,
+            service_code="M1",
+            shift_code="M1",
+        )
+    )
+    session.add(
+        MonthlyRequirement(
+            year=2025,
+            month=9,
+            day=4,
+            service_code="M1",
+            shift_code="M1",
+            required_count=1,
+        )
+    )
+    session.commit()
+    captured = _capture_hints(monkeypatch)
+
+    generate_schedule(session, 2025, 9)
+    assert list(captured[0].values()) == [nurses[2].id]
+
+    generate_schedule(session, 2025, 9, warm_start=False)
+    assert captured[1] == {}
+
+
+def test_shift_pair_table_matches_pairwise_rules():
+    session = build_session()
+    for code, shift_type, start, end in (
+        ("M1", "M", 480, 840),
+        ("T1", "T", 840, 1200),
+        ("L1", "L", 480, 1200),
+        ("N1", "N", 1200, 1920),
+    ):
+        session.add(
+            Shift(
+                code=code,
+                label=code,
+                shift_type=shift_type,
+                start_minute=start,
+                end_minute=end,
+            )
+        )
+    session.commit()
+    shifts = shift_catalogue(session)
+
+    table = _shift_pair_table(shifts.shifts, 11 * 60)
+    assert _shift_pair_table(shifts.shifts, 11 * 60) is table
+    contratado = Nurse(name="Ivo", category="CONTRATADO")
+    rv = Nurse(name="Joana", category="RV_TEMPO_INTEIRO")
+    for first in shifts.values():
+        for second in shifts.values():
+            pair = (first.code, second.code)
+            assert (second.code in table.rest_conflicts[first.code]) == (
+                not _has_minimum_rest(first.code, second.code, 11 * 60, shifts)
+            )
+            assert (pair in table.overlaps) == _shifts_overlap(first, second)
+            for nurse, double_class in ((contratado, "MT"), (rv, "ANY")):
+                assert (pair in table.double_blocked[double_class]) == (
+                    not _allows_double_shift(
+                        nurse, first.shift_type, second.shift_type
+                    )
+                )
+
+
+def test_double_shift_rules_group_slots_by_shift_code():
+    session = build_session()
+    for code, shift_type, start, end in (
+        ("M1", "M", 480, 840),
+        ("T1", "T", 840, 1200),
+        ("L1", "L", 480, 1200),
+    ):
+        session.add(
+            Shift(
+                code=code,
+                label=code,
+                shift_type=shift_type,
+                start_minute=start,
+                end_minute=end,
+            )
+        )
+    session.add(Nurse(name="Joana", category="RV_TEMPO_INTEIRO"))
+    session.add_all(
+        MonthlyRequirement(
+            year=2025,
+            month=9,
+            day=4,
+            service_code=service,
+            shift_code=shift,
+            required_count=1,
+        )
+        for service, shift in (
+            ("A", "M1"),
+            ("B", "M1"),
+            ("A", "L1"),
+            ("B", "L1"),
+            ("A", "T1"),
+        )
+    )
+    session.commit()
+    problem = solver.prepare_schedule(session, 2025, 9, warm_start=False).problem
+    built = solver._build_model(problem)
+
+    codes = {
+        var.Index(): built.slots[slot_idx].shift_code
+        for slot_idx, pair_list in built.slot_candidate_vars.items()
+        for _, var in pair_list
+    }
+    groups = sorted(
+        sorted(codes[literal] for literal in constraint.at_most_one.literals)
+        for constraint in built.model.Proto().constraints
+        if constraint.HasField("at_most_one")
+        and set(constraint.at_most_one.literals) <= set(codes)
+    )
+    # One constraint per clashing code pair, whatever the number of services.
+    assert groups == [["L1", "L1", "M1", "M1"], ["L1", "L1", "T1"]]
+
+
+def test_add_conjunction_matches_logical_and():
+    for values in product((0, 1), repeat=3):
+        model = cp_model.CpModel()
+        literals = [model.NewBoolVar(f"l{idx}") for idx in range(3)]
+        target = model.NewBoolVar("target")
+        _add_conjunction(model, target, literals)
+        for literal, value in zip(literals, values):
+            model.Add(literal == value)
+        cp_solver = cp_model.CpSolver()
+        assert cp_solver.Solve(model) == cp_model.OPTIMAL
+        assert cp_solver.Value(target) == int(all(values))
+
+
+def test_aggregate_slots_merges_copies_of_a_requirement():
+    slots = [
+        Slot(0, 1, "Piso 1", "M1", 420, 1),
+        Slot(1, 1, "Piso 1", "M1", 420, 1),
+        Slot(2, 1, "Piso 1", "T1", 420, 1),
+        Slot(3, 2, "Piso 1", "M1", 420, 1),
+    ]
+    aggregated = _aggregate_slots(slots)
+    assert [(slot.index, slot.count) for slot in aggregated] == [(0, 2), (2, 1), (3, 1)]
+
+
+def test_aggregated_formulation_reports_shortfall_per_slot():
+    session = build_session()
+    nurses = _seed_hint_scenario(session)
+    session.add(
+        MonthlyRequirement(
+            year=2025,
+            month=9,
+            day=3,
+            service_code="M1",
+            shift_code="M1",
+            required_count=4,
+        )
+    )
+    session.commit()
+
+    assignments, unfilled, _, _ = generate_schedule(
+        session, 2025, 9, formulation="aggregated"
+    )
+    assert sorted(entry.nurse_id for entry in assignments) == sorted(
+        nurse.id for nurse in nurses
+    )
+    assert [(item["day"], item["shift_code"]) for item in unfilled] == [(3, "M1")]
+
+
+def test_generate_schedule_records_phase_profile():
+    session = build_session()
+    _seed_hint_scenario(session)
+    session.add(
+        MonthlyRequirement(
+            year=2025,
+            month=9,
+            day=4,
+            service_code="M1",
+            shift_code="M1",
+            required_count=1,
+        )
+    )
+    session.commit()
+
+    profiler = SolveProfiler()
+    generate_schedule(session, 2025, 9, decompose=False, profiler=profiler)
+    summary = profiler.summary()
+    phases = {phase["phase"]: phase for phase in summary["phases"]}
+    assert list(phases)[:3] == ["load", "eligibility", "problem"]
+    assert summary["slots"] == 1
+    assert phases["model_variables"]["variables"] > 0
+    assert sum(phase.get("constraints", 0) for phase in phases.values()) > 0
+    assert {"solve", "persist", "hour_balances", "stats"} <= set(phases)
+    assert summary["total_seconds"] >= sum(
+        phase["seconds"] for phase in summary["phases"]
+    ) - 1e-3
+    assert "CpSolverResponse" in summary["response_stats"][0]
+
+
+def test_month_solver_profile_sets_budget_and_is_reported():
+    session = build_session()
+    _seed_hint_scenario(session)
+    session.add(
+        MonthlyRequirement(
+            year=2025,
+            month=9,
+            day=4,
+            service_code="M1",
+            shift_code="M1",
+            required_count=1,
+        )
+    )
+    config = solver.get_or_create_month_config(session, 2025, 9)
+    config.solver_profile = "custom"
+    config.solver_settings = {"time_limit_seconds": 3, "num_workers": 2}
+    session.commit()
+
+    assert solver.solver_profile(config) == SolverProfile(
+        "custom",
+        3.0,
+        2,
+        SOLVER_PROFILES["balanced"]["relative_gap"],
+        SOLVER_PROFILES["balanced"]["no_improvement_seconds"],
+    )
+    config.solver_profile = "fast"
+    session.commit()
+    fast = solver.solver_profile(config)
+    assert fast.time_limit_seconds == SOLVER_PROFILES["fast"]["time_limit_seconds"]
+    assert fast.num_workers == solver.available_cpu_count()
+
+    profiler = SolveProfiler()
+    generate_schedule(session, 2025, 9, profiler=profiler)
+    diagnostics = SolveDiagnostics(**profiler.summary())
+    assert diagnostics.profile.name == "fast"
+    assert diagnostics.profile.relative_gap == SOLVER_PROFILES["fast"]["relative_gap"]
+
+
+def test_solver_settings_are_checked_and_stored_limits_clamped():
+    assert solver.invalid_solver_settings(
+        {"time_limit_seconds": 3, "num_workers": 2, "relative_gap": 0.01}
+    ) == []
+    assert solver.invalid_solver_settings(
+        {
+            "time_limit_seconds": 0,
+            "num_workers": 1.5,
+            "relative_gap": 1,
+            "no_improvement_seconds": -1,
+        }
+    ) == ["time_limit_seconds", "num_workers", "relative_gap", "no_improvement_seconds"]
+    assert solver.invalid_solver_settings(
+        {"time_limit_seconds": "fast", "relative_gap": float("nan")}
+    ) == ["time_limit_seconds", "relative_gap"]
+
+    config = solver.get_or_create_month_config(build_session(), 2025, 9)
+    config.solver_profile = "custom"
+    config.solver_settings = {"time_limit_seconds": -5}
+    assert solver.solver_profile(config).time_limit_seconds > 0
+
+
+def test_fallback_schedule_keeps_rest_after_nights(monkeypatch):
+    session = build_session()
+    session.add_all(
+        [
+            Shift(
+                code=code,
+                label=code,
+                shift_type=code[0],
+                start_minute=start,
+                end_minute=end,
+            )
+            for code, start, end in (("M1", 480, 840), ("N1", 1200, 1920))
+        ]
+    )
+    nurses = [
+        Nurse(
+            name=name,
+            category="CONTRATADO",
+            services_permitted=["M1", "N1"],
+            can_work_night=True,
+        )
+        for name in ("Kiko", "Lara")
+    ]
+    session.add_all(nurses)
+    session.add_all(
+        [
+            MonthlyRequirement(
+                year=2025,
+                month=9,
+                day=day,
+                service_code=code,
+                shift_code=code,
+                required_count=count,
+            )
+            for day, code, count in ((3, "N1", 1), (4, "M1", 2))
+        ]
+    )
+    session.commit()
+    monkeypatch.setattr(
+        solver,
+        "solve_problem",
+        lambda *args, **kwargs: SolveOutcome(status=cp_model.INFEASIBLE),
+    )
+
+    prepared = solver.prepare_schedule(session, 2025, 9)
+    assert len(construct_schedule(prepared.problem)) == 2
+    assignments, unfilled, _, _ = generate_schedule(session, 2025, 9)
+    by_day = {
+        (entry.day, entry.shift_code): entry.nurse_id
+        for entry in assignments
+        if entry.source == "auto"
+    }
+    night_nurse = by_day[(3, "N1")]
+    assert by_day[(4, "M1")] != night_nurse
+    assert [(item["day"], item["shift_code"]) for item in unfilled] == [(4, "M1")]
+    assert any(
+        entry.nurse_id == night_nurse and entry.day == 4 and entry.source == "auto_rest"
+        for entry in assignments
+    )
+
+
+
+def test_constructed_hint_is_the_first_solution():
+    session = memory_session()
+    build_synthetic_hospital(session, 30, 2025, 9, seed=1)
+    problem = solver.prepare_schedule(session, 2025, 9, warm_start=False).problem
+    built = solver._build_model(problem)
+    proto = built.model.Proto()
+    # Auxiliary variables are hinted too, so the hint is a whole solution.
+    assert set(proto.solution_hint.vars) == set(range(len(proto.variables)))
+
+    events = []
+    stop = threading.Event()
+
+    def first_only(event):
+        events.append(event)
+        stop.set()
+
+    outcome = solver._solve_model(built, first_only, stop, num_workers=2, time_limit=20)
+    assert outcome.status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    assert events[0]["elapsed_seconds"] < 0.5
+    assert outcome.assigned == construct_schedule(problem)
+
+def test_previous_month_tail_carries_rest_and_work_runs():
+    session = build_session()
+    session.add_all(
+        Shift(
+            code=code,
+            label=code,
+            shift_type=code[0],
+            start_minute=start,
+            end_minute=end,
+        )
+        for code, start, end in (("M1", 480, 840), ("N1", 1200, 1920))
+    )
+    after_night, long_run, rested = (
+        Nurse(name=name, category="CONTRATADO", services_permitted=["M1"])
+        for name in ("Marta", "Nuno", "Olga")
+    )
+    session.add_all([after_night, long_run, rested])
+    session.flush()
+    session.add(
+        ScheduleEntry(
+            nurse_id=after_night.id,
+            year=2025,
+            month=8,
+            day=31,
+            service_code="N1",
+            shift_code="N1",
+        )
+    )
+    for day in range(26, 32):
+        session.add(
+            ScheduleEntry(
+                nurse_id=long_run.id,
+                year=2025,
+                month=8,
+                day=day,
+                service_code="M1",
+                shift_code="M1",
+            )
+        )
+    session.add(
+        MonthlyRequirement(
+            year=2025,
+            month=9,
+            day=1,
+            service_code="M1",
+            shift_code="M1",
+            required_count=2,
+        )
+    )
+    session.commit()
+
+    prepared = solver.prepare_schedule(session, 2025, 9)
+    assert sorted(prepared.problem.previous_tail) == sorted(
+        [(after_night.id, 0, "N1")]
+        + [(long_run.id, day, "M1") for day in range(-5, 1)]
+    )
+    assignments, unfilled, _, _ = generate_schedule(session, 2025, 9)
+    assert [entry.nurse_id for entry in assignments] == [rested.id]
+    assert len(unfilled) == 1
+
+
+def test_solution_pool_keeps_drafts_that_can_be_promoted(monkeypatch):
+    session = build_session()
+    _seed_hint_scenario(session)
+    for day in (4, 11):
+        session.add(
+            MonthlyRequirement(
+                year=2025,
+                month=9,
+                day=day,
+                service_code="M1",
+                shift_code="M1",
+                required_count=1,
+            )
+        )
+    session.commit()
+    monkeypatch.setattr(solver, "SOLUTION_POOL_SIZE", 3)
+
+    generate_schedule(session, 2025, 9, decompose=False)
+    drafts = list(session.scalars(select(ScheduleDraft).order_by(ScheduleDraft.rank)))
+    assert [draft.rank for draft in drafts] == [0, 1, 2]
+    assert len({tuple(map(tuple, draft.entries)) for draft in drafts}) == 3
+    assert schedule_draft_diff(session, drafts[0]) == ([], [])
+    added, removed = schedule_draft_diff(session, drafts[1])
+    assert added and removed
+
+    assignments, unfilled, _, stats = promote_schedule_draft(session, drafts[1])
+    assert sorted(
+        [entry.nurse_id, entry.day, entry.service_code, entry.shift_code]
+        for entry in assignments
+    ) == sorted(drafts[1].entries)
+    assert not unfilled
+    assert schedule_draft_diff(session, drafts[1]) == ([], [])
+    assert schedule_draft_diff(session, drafts[0], drafts[1]) == (removed, added)
+    worked = {entry.nurse_id for entry in assignments}
+    assert {stat["nurse_id"] for stat in stats if stat["actual_minutes"]} == worked
+
+
+def test_solution_pool_shares_the_time_limit():
+    assert solver._pool_reserve(1, 20) == 0
+    assert solver._pool_reserve(3, 20) == 2 * solver.POOL_SEARCH_SECONDS
+    assert solver._pool_reserve(3, 4) == 4 * solver.POOL_BUDGET_SHARE
+
+    session = build_session()
+    _seed_hint_scenario(session)
+    for day in (4, 11):
+        session.add(
+            MonthlyRequirement(
+                year=2025,
+                month=9,
+                day=day,
+                service_code="M1",
+                shift_code="M1",
+                required_count=1,
+            )
+        )
+    session.commit()
+    built = solver._build_model(solver.prepare_schedule(session, 2025, 9).problem)
+    search = solver._run_search(built, None, None, 1, 5)
+    cp_solver = search.solver
+    assert search.status == cp_model.OPTIMAL
+    outcome = SolveOutcome(status=search.status, objective=cp_solver.ObjectiveValue())
+    # Past the deadline no alternative search is started.
+    assert not solver._alternative_solutions(
+        built, cp_solver, outcome, 2, 1, deadline=time.monotonic()
+    )
+    assert solver._alternative_solutions(built, cp_solver, outcome, 2, 1)
+
+
+def test_simulate_schedule_leaves_database_untouched():
+    session = build_session()
+    nurses = _seed_hint_scenario(session)
+    for day in (4, 11):
+        session.add(
+            MonthlyRequirement(
+                year=2025,
+                month=9,
+                day=day,
+                service_code="M1",
+                shift_code="M1",
+                required_count=1,
+            )
+        )
+    nurses[0].hour_balance_minutes = 120
+    session.commit()
+
+    newcomer = Nurse(name="Rui", category="CONTRATADO", services_permitted=["M1"])
+    base, replaced, extra = simulate_schedule(
+        session,
+        2025,
+        9,
+        variants=[
+            ScheduleVariant(),
+            ScheduleVariant(
+                name="replaced",
+                add_nurses=[newcomer],
+                remove_nurse_ids=[nurse.id for nurse in nurses],
+                constraints={(-1, 11): "INDISPONIVEL"},
+            ),
+            ScheduleVariant(name="extra", requirement_counts={(18, "M1", "M1"): 1}),
+        ],
+        time_limit=5,
+    )
+
+    assert not session.new and not session.dirty
+    for model in (ScheduleEntry, MonthConfig, NurseMonthStat):
+        assert session.scalars(select(model)).first() is None
+    assert nurses[0].hour_balance_minutes == 120
+
+    assert base.status in {"OPTIMAL", "FEASIBLE"}
+    assert sorted(cell[1] for cell in base.added) == [4, 11]
+    assert base.removed == []
+    assert {stat["nurse_id"] for stat in base.stats} == {nurse.id for nurse in nurses}
+
+    assert replaced.added == [(-1, 4, "M1", "M1")]
+    assert [(item["day"], item["service_code"]) for item in replaced.unfilled] == [
+        (11, "M1")
+    ]
+    rui = next(stat for stat in replaced.stats if stat["nurse_id"] == -1)
+    assert rui["actual_minutes"] == 360
+    assert rui["bank_minutes"] == rui["delta_minutes"]
+
+    assert sorted(cell[1] for cell in extra.added) == [4, 11, 18]
+
+
+def test_repeat_generate_reuses_cached_outcome(monkeypatch):
+    session = build_session()
+    _seed_hint_scenario(session)
+    requirement = MonthlyRequirement(
+        year=2025, month=9, day=4, service_code="M1", shift_code="M1", required_count=1
+    )
+    session.add(requirement)
+    session.commit()
+    monkeypatch.setattr(solver, "solve_cache", SolveCache(2))
+    solves = []
+    original = solver.solve_problem
+
+    def solve(problem, *args, **kwargs):
+        solves.append(problem.slots)
+        return original(problem, *args, **kwargs)
+
+    monkeypatch.setattr(solver, "solve_problem", solve)
+
+    first, _, _, first_stats = generate_schedule(session, 2025, 9)
+    profiler = SolveProfiler()
+    again, _, _, again_stats = generate_schedule(session, 2025, 9, profiler=profiler)
+    assert len(solves) == 1
+    assert "cache" in {phase["phase"] for phase in profiler.summary()["phases"]}
+    assert [(entry.nurse_id, entry.day) for entry in again] == [
+        (entry.nurse_id, entry.day) for entry in first
+    ]
+    assert again_stats == first_stats
+
+    requirement.required_count = 2
+    session.commit()
+    generate_schedule(session, 2025, 9)
+    assert len(solves) == 2
+    assert len(solver.solve_cache) == 2
+
+
+def test_staged_objective_fixes_coverage_before_fairness(monkeypatch):
+    session = build_session()
+    _seed_hint_scenario(session)
+    for day, count in ((4, 2), (5, 1), (6, 3)):
+        session.add(
+            MonthlyRequirement(
+                year=2025,
+                month=9,
+                day=day,
+                service_code="M1",
+                shift_code="M1",
+                required_count=count,
+            )
+        )
+    session.commit()
+    monkeypatch.setattr(solver, "solve_cache", SolveCache(0))
+
+    problem = solver.prepare_schedule(session, 2025, 9).problem
+    built = solver._build_model(problem)
+    assert [stage for stage, _ in built.stage_objectives] == ["coverage", "fairness"]
+    weighted = solver._solve_model(solver._build_model(problem), time_limit=5)
+    staged = solver._solve_model(built, time_limit=5, staged=True)
+    assert staged.status == weighted.status == cp_model.OPTIMAL
+    assert len(staged.unfilled) == len(weighted.unfilled) == 0
+    assert staged.objective >= weighted.objective
+    # Every stage was solved to optimality, so the summed stage bounds are tight.
+    assert staged.best_bound == staged.objective
+
+    events = []
+    assignments, unfilled, _, _ = generate_schedule(
+        session, 2025, 9, progress=events.append, objective="staged"
+    )
+    assert len(assignments) == 6 and not unfilled
+    stages = [event["stage"] for event in events]
+    assert stages[0] == 1 and stages == sorted(stages)
+    assert len(set(stages)) > 1
+    solutions = [event["solution"] for event in events]
+    assert solutions == list(range(1, len(events) + 1))
+
+
+def test_generate_dumps_replayable_model(monkeypatch, tmp_path):
+    session = build_session()
+    _seed_hint_scenario(session)
+    requirement = MonthlyRequirement(
+        year=2025, month=9, day=4, service_code="M1", shift_code="M1", required_count=1
+    )
+    session.add(requirement)
+    session.commit()
+    monkeypatch.setattr(solver, "MODEL_DUMP_DIR", tmp_path)
+
+    generate_schedule(session, 2025, 9, dump_model=True)
+    (path,) = tmp_path.glob("*.pb")
+    model = cp_model.CpModel()
+    model.Proto().ParseFromString(path.read_bytes())
+    assert model.Validate() == ""
+    sidecar = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+    for index, meta in sidecar["variables"].items():
+        name = model.Proto().variables[int(index)].name
+        if meta["kind"] == "assign":
+            assert name == f"x_{meta['slot']}_{meta['nurse_id']}"
+            assert str(meta["nurse_id"]) in sidecar["nurses"]
+        else:
+            assert name == f"slot_{meta['slot']}_unfilled"
+    assert cp_model.CpSolver().Solve(model) in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+
+def test_infeasible_month_reports_conflicting_rule():
+    session = build_session()
+    session.add(
+        Shift(code="N1", label="N1", shift_type="N", start_minute=1200, end_minute=1920)
+    )
+    capped = Nurse(
+        name="Ana", category="CONTRATADO", services_permitted=["N1"], max_noites_mes=1
+    )
+    other = Nurse(name="Bia", category="CONTRATADO", services_permitted=["N1"])
+    session.add_all([capped, other])
+    session.flush()
+    # Two locked nights already exceed a cap of one night a month.
+    for day in (2, 9):
+        session.add(
+            ScheduleEntry(
+                nurse_id=capped.id,
+                year=2025,
+                month=9,
+                day=day,
+                service_code="N1",
+                shift_code="N1",
+                locked=True,
+            )
+        )
+    for day in (5, 16):
+        session.add(
+            MonthlyRequirement(
+                year=2025,
+                month=9,
+                day=day,
+                service_code="N1",
+                shift_code="N1",
+                required_count=1,
+            )
+        )
+    session.commit()
+
+    prepared = solver.prepare_schedule(session, 2025, 9)
+    assert solver.explain_infeasibility(prepared.problem) == [
+        ("night_cap", capped.id, None)
+    ]
+
+    assignments, _, violations, _ = generate_schedule(session, 2025, 9, decompose=False)
+    assert "Ana: regra impossível de cumprir (máximo de noites no mês)" in violations
+    assert {
+        entry.day for entry in assignments if entry.nurse_id == other.id
+    } >= {5, 16}
+
+
+def test_persist_entries_adds_rest_after_nights():
+    session = build_session()
+    session.add(
+        Shift(code="N1", label="N1", shift_type="N", start_minute=1200, end_minute=1920)
+    )
+    nurses = [Nurse(name=name, category="CONTRATADO") for name in ("Ines", "Jorge")]
+    session.add_all(nurses)
+    session.commit()
+    first, second = (nurse.id for nurse in nurses)
+
+    created = _persist_entries(
+        session,
+        [
+            _entry_row(first, 2025, 9, 3, "N1", "N1"),
+            _entry_row(first, 2025, 9, 30, "N1", "N1"),
+            _entry_row(second, 2025, 9, 5, "N1", "N1"),
+        ],
+        {(second, 6)},
+        2025,
+        9,
+    )
+    assert all(entry.id for entry in created)
+    stored = {
+        (entry.nurse_id, entry.day, entry.source)
+        for entry in session.scalars(select(ScheduleEntry))
+    }
+    assert stored == {(entry.nurse_id, entry.day, entry.source) for entry in created}
+    assert stored == {
+        (first, 3, "auto"),
+        (first, 4, "auto_rest"),
+        (first, 30, "auto"),
+        (second, 5, "auto"),
+    }
+
+
+def test_hour_balances_upsert_month_stats_in_bulk():
+    session = build_session()
+    session.add(
+        Shift(code="M1", label="M1", shift_type="M", start_minute=480, end_minute=840)
+    )
+    nurses = [
+        Nurse(
+            name="Luis", category="CONTRATADO", weekly_hours=40, hour_balance_minutes=60
+        ),
+        Nurse(name="Marta", category="CONTRATADO", weekly_hours=40),
+    ]
+    session.add_all(nurses)
+    session.flush()
+    luis, marta = nurses
+    session.add(
+        NurseMonthStat(nurse_id=luis.id, year=2025, month=9, delta_minutes=-100)
+    )
+    session.commit()
+    stale = session.scalar(select(NurseMonthStat))
+
+    entries = [
+        ScheduleEntry(
+            nurse_id=luis.id,
+            year=2025,
+            month=9,
+            day=1,
+            service_code="M1",
+            shift_code="M1",
+        )
+    ]
+    _update_hour_balances(session, nurses, entries, 2025, 9, {})
+    session.commit()
+
+    # September 2025 has 22 business days of 8h; one 6h shift was worked.
+    target = 22 * 8 * 60
+    stats = {stat.nurse_id: stat for stat in session.scalars(select(NurseMonthStat))}
+    assert len(stats) == 2
+    assert stats[luis.id] is stale
+    assert (stale.target_minutes, stale.actual_minutes) == (target, 360)
+    assert stats[marta.id].delta_minutes == -target
+    assert luis.hour_balance_minutes == 60 + 100 + 360 - target
+    assert marta.hour_balance_minutes == -target
+
+    _revert_month_stats(session, 2025, 9, [luis.id])
+    session.commit()
+    session.expire_all()
+    assert luis.hour_balance_minutes == 160
+    assert marta.hour_balance_minutes == -target
@@ -60,6 +60,7 @@ const I18N = {
     "nav.chat": "Chat",
     "nav.admin": "Admin",
     "dashboard.generate": "Gerar horário",
+    "dashboard.stop_generate": "Aceitar solução atual",
     "dashboard.export_schedule": "Exportar horário",
     "dashboard.export_constraints": "Exportar disponibilidades",
     "dashboard.needs": "Necessidades",
@@ -260,6 +261,11 @@ const I18N = {
     "label.rule_max_hours": "Máx. horas/semana (Contratado)",
     "label.rule_target_hours": "Target horas/semana",
     "label.rule_rest_hours": "Horas mínimas de descanso",
+    "label.rule_solver_profile": "Perfil do solver",
+    "solver_profile.fast": "Rápido",
+    "solver_profile.balanced": "Equilibrado",
+    "solver_profile.thorough": "Exaustivo",
+    "solver_profile.custom": "Personalizado",
     "label.rule_hard_requests": "Pedidos de folga = regra hard",
     "label.rule_prefer_folga_nd": "Privilegiar folga após sequência N + D",
     "label.shift_settings_title": "Horários dos turnos",
@@ -317,6 +323,7 @@ const I18N = {
     "label.save_shift_failed": "Não foi possível guardar o turno.",
     "label.create_service_failed": "Não foi possível criar o serviço.",
     "label.schedule_generating": "A gerar...",
+    "label.schedule_unfilled": "vagas por preencher",
     "label.schedule_updated": "Horário atualizado.",
     "label.reject_reason": "Motivo da rejeição",
     "label.available_short": "Tudo disp.",
@@ -408,6 +415,7 @@ const I18N = {
     "nav.chat": "Chat",
     "nav.admin": "Admin",
     "dashboard.generate": "Generate schedule",
+    "dashboard.stop_generate": "Accept current solution",
     "dashboard.export_schedule": "Export schedule",
     "dashboard.export_constraints": "Export availability",
     "dashboard.needs": "Needs",
@@ -608,6 +616,11 @@ const I18N = {
     "label.rule_max_hours": "Max hours/week (Contract)",
     "label.rule_target_hours": "Target hours/week",
     "label.rule_rest_hours": "Minimum rest hours",
+    "label.rule_solver_profile": "Solver profile",
+    "solver_profile.fast": "Fast",
+    "solver_profile.balanced": "Balanced",
+    "solver_profile.thorough": "Thorough",
+    "solver_profile.custom": "Custom",
     "label.rule_hard_requests": "Leave requests = hard rule",
     "label.rule_prefer_folga_nd": "Prefer rest after N + D sequence",
     "label.shift_settings_title": "Shift times",
@@ -665,6 +678,7 @@ const I18N = {
     "label.save_shift_failed": "Could not save the shift.",
     "label.create_service_failed": "Could not create the service.",
     "label.schedule_generating": "Generating...",
+    "label.schedule_unfilled": "unfilled slots",
     "label.schedule_updated": "Schedule updated.",
     "label.reject_reason": "Rejection reason",
     "label.available_short": "All avail.",
@@ -1585,6 +1599,7 @@ function applyTranslations() {
   setText("#chat h2", "section.chat");
   setText("#admin h2", "section.admin");
   setText("#generateBtn", "dashboard.generate");
+  setText("#stopGenerateBtn", "dashboard.stop_generate");
   setText("#exportScheduleBtn", "dashboard.export_schedule");
   setText("#exportScheduleBtnMenu", "dashboard.export_schedule");
   setText("#exportConstraintsBtn", "dashboard.export_constraints");
@@ -1819,6 +1834,9 @@ function bindActions() {
     .getElementById("fillMyUnavailableBtn")
     ?.addEventListener("click", () => fillMyAvailability("INDISPONIVEL"));
   document.getElementById("generateBtn").addEventListener("click", generate);
+  document
+    .getElementById("stopGenerateBtn")
+    .addEventListener("click", stopGenerate);
   const handleScheduleExport = async () => {
     const format = await chooseExportFormat();
     if (!format) return;
@@ -4466,6 +4484,8 @@ function renderRulesForm() {
     state.config.target_hours_week;
   document.getElementById("configRestHours").value =
     state.config.min_rest_hours ?? 11;
+  document.getElementById("configSolverProfile").value =
+    state.config.solver_profile || "balanced";
   document.getElementById("configPedidosHard").checked =
     state.config.pedidos_folga_hard;
   document.getElementById("configPreferFolgaND").checked =
@@ -4513,6 +4533,7 @@ async function saveRulesConfig(event) {
         document.getElementById("configTargetHoras").value
       ),
       min_rest_hours: Number(document.getElementById("configRestHours").value),
+      solver_profile: document.getElementById("configSolverProfile").value,
       pedidos_folga_hard: document.getElementById("configPedidosHard").checked,
       prefer_folga_after_nd: document.getElementById("configPreferFolgaND").checked,
       penalty_weights: penalties,
@@ -5309,15 +5330,36 @@ function renderViolationsList() {
 async function generate() {
   if (!canEditSchedule()) return;
   const status = document.getElementById("generationStatus");
+  const stopButton = document.getElementById("stopGenerateBtn");
   status.textContent = t("label.schedule_generating", "A gerar...");
   try {
-    const result = await httpJson(`/api/schedule/generate?${groupQuery()}`, {
+    let job = await httpJson(`/api/schedule/generate?${groupQuery()}`, {
       method: "POST",
       body: JSON.stringify({
         year: state.year,
         month: state.month,
       }),
     });
+    state.generateJobId = job.id;
+    stopButton.classList.remove("hidden");
+    while (job.status === "PENDING" || job.status === "RUNNING") {
+      let text = `${t("label.schedule_generating", "A gerar...")} ${Math.round(
+        (job.progress || 0) * 100
+      )}%`;
+      if (job.last_progress) {
+        text += ` · ${job.last_progress.unfilled} ${t(
+          "label.schedule_unfilled",
+          "vagas por preencher"
+        )}`;
+      }
+      status.textContent = text;
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      job = await httpJson(`/api/schedule/jobs/${job.id}`);
+    }
+    if (job.status !== "DONE" || !job.result) {
+      throw new Error(job.error || job.message || "Erro inesperado");
+    }
+    const result = job.result;
     state.scheduleEntries = result.entries;
     state.unfilled = result.unfilled || [];
     state.violations = result.violations || [];
@@ -5330,9 +5372,19 @@ async function generate() {
     status.textContent = t("label.schedule_updated", "Horário atualizado.");
   } catch (error) {
     status.textContent = error.message;
+  } finally {
+    state.generateJobId = null;
+    stopButton.classList.add("hidden");
   }
 }
 
+async function stopGenerate() {
+  if (!state.generateJobId) return;
+  await httpJson(`/api/schedule/jobs/${state.generateJobId}/stop`, {
+    method: "POST",
+  });
+}
+
 async function refreshMonthData() {
   updateCurrentPeriodLabel();
   const tasks = [loadSchedule(), loadHolidays()];